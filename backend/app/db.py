@@ -1,9 +1,14 @@
 import os
+import re
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
 from fastapi import Query
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 
 
 # ------------------------------------------------------------
@@ -26,16 +31,319 @@ DATABASE_URL_IN = os.environ.get("DATABASE_URL_IN", _sqlite_url(IN_DB_PATH))
 
 
 # ------------------------------------------------------------
-# Engines + Sessions
+# Connection profiles
 # ------------------------------------------------------------
-connect_args_us = {"check_same_thread": False} if DATABASE_URL_US.startswith("sqlite") else {}
-connect_args_in = {"check_same_thread": False} if DATABASE_URL_IN.startswith("sqlite") else {}
+# PRAGMAs run on every new DBAPI connection of an engine, by role:
+#   api  - request handlers: query_only, large mmap + page cache (reads never touch the file lock)
+#   jobs - writers (CLI jobs, scheduler, on-demand refresh): WAL + synchronous=NORMAL, so API
+#          readers are not blocked while a job writes
+API_MMAP_MB = int(os.getenv("API_MMAP_MB", "1024"))
+API_CACHE_KIB = int(os.getenv("API_CACHE_KIB", "65536"))
+JOBS_CACHE_KIB = int(os.getenv("JOBS_CACHE_KIB", "65536"))
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
 
-engine_us = create_engine(DATABASE_URL_US, connect_args=connect_args_us, pool_pre_ping=True)
-engine_in = create_engine(DATABASE_URL_IN, connect_args=connect_args_in, pool_pre_ping=True)
+SQLITE_PRAGMAS = {
+    "api": (
+        "PRAGMA query_only=ON",
+        f"PRAGMA mmap_size={API_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA cache_size=-{API_CACHE_KIB}",
+        "PRAGMA temp_store=MEMORY",
+        f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    ),
+    "jobs": (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{JOBS_CACHE_KIB}",
+        f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    ),
+}
+
+# QueuePool sizing per role: FastAPI runs sync endpoints on a 40-thread pool, so the API
+# profile keeps enough connections for concurrent chart requests
+POOL_SETTINGS = {
+    "api": {
+        "pool_size": int(os.getenv("API_POOL_SIZE", "20")),
+        "max_overflow": int(os.getenv("API_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("API_POOL_TIMEOUT", "30")),
+    },
+    "jobs": {
+        "pool_size": int(os.getenv("JOBS_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("JOBS_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("JOBS_POOL_TIMEOUT", "30")),
+    },
+}
+
+
+def apply_pragmas(dbapi_conn, role: str) -> None:
+    cur = dbapi_conn.cursor()
+    try:
+        for stmt in SQLITE_PRAGMAS[role]:
+            cur.execute(stmt)
+    finally:
+        cur.close()
+
+
+def make_engine(url: str, role: str = "jobs"):
+    """
+    Engine for one market DB with the role's pool sizing and, for SQLite, its PRAGMAs.
+    No pool_pre_ping: a local SQLite connection can't go stale, the ping was a wasted round trip.
+    """
+    if role not in SQLITE_PRAGMAS:
+        raise ValueError(f"unknown engine role: {role!r}")
+
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True, **POOL_SETTINGS[role])
+
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **POOL_SETTINGS[role])
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        apply_pragmas(dbapi_conn, role)
+
+    return engine
+
+
+def release_engine(engine) -> None:
+    """
+    End of a job run: close the pool, then fold the WAL back into the .db and switch it to
+    journal_mode=DELETE, so the file uploaded as a snapshot is self-contained.
+    """
+    engine.dispose()
+    path = engine.url.database
+    if not engine.url.drivername.startswith("sqlite") or not path or path == ":memory:":
+        return
+    con = sqlite3.connect(path)
+    try:
+        con.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        con.execute("PRAGMA journal_mode=DELETE")
+    except sqlite3.OperationalError as e:
+        # another process still has the file open; everything is committed either way
+        print(f"[db] left {path} in WAL mode ({e})")
+    finally:
+        con.close()
+
+
+# ------------------------------------------------------------
+# Engine registry (hot-swappable snapshots)
+# ------------------------------------------------------------
+# Each market DB is served by a generation: one jobs + one api engine for one installed
+# snapshot version (the ETag file sync_latest_db_from_r2 writes next to the .db). When that
+# file changes, new sessions go to a fresh generation and the old one's pools are disposed
+# once its last session is closed, so the daily snapshot is picked up without a restart.
+#
+# Hot swap is enabled by the API process (main.py). There a generation opens the snapshot
+# through its own hard link, data/.versions/<db>.<etag>.db: os.replace gives the .db path a
+# new inode, and the link keeps every generation on its own file and its own -wal/-shm.
+# CLI jobs keep a single generation on the .db path itself.
+HOT_SWAP_CHECK_SECONDS = float(os.getenv("HOT_SWAP_CHECK_SECONDS", "5"))
+ROLES = ("jobs", "api")
+
+
+def _market_key(market: str) -> str:
+    m = (market or "US").strip().upper()
+    return "INDIA" if m in {"INDIA", "IN", "IND", "NSE"} else "US"
+
+
+def _db_file(url: str) -> Path | None:
+    if not url.startswith("sqlite"):
+        return None
+    path = make_url(url).database
+    return Path(path) if path and path != ":memory:" else None
+
+
+def snapshot_version(db_file: Path | None) -> str | None:
+    """ETag of the installed snapshot (see utils/r2_sync.py), or None."""
+    if db_file is None:
+        return None
+    try:
+        return (db_file.parent / f".{db_file.name}.etag").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _unlink_db(path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.unlink(f"{path}{suffix}")
+        except OSError:
+            pass  # missing, or still open (Windows): pruned at the next start
+
+
+def _version_link(db_file: Path, version: str) -> Path:
+    """Hard link to the installed .db for this version (reused when it is the same file)."""
+    tag = re.sub(r"[^A-Za-z0-9]", "", version)[:16] or "local"
+    link = db_file.parent / ".versions" / f"{db_file.stem}.{tag}{db_file.suffix}"
+    link.parent.mkdir(parents=True, exist_ok=True)
+    if link.exists() and not os.path.samefile(link, db_file):
+        _unlink_db(link)
+    if not link.exists():
+        os.link(db_file, link)
+    return link
+
+
+class TrackedSession(Session):
+    """Session that tells its generation when it is closed (first close only)."""
+
+    generation = None
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            gen, self.generation = self.generation, None
+            if gen is not None:
+                gen.release()
+
+
+class EngineGeneration:
+    def __init__(self, market: str, version: str | None, url: str, link: Path | None = None):
+        self.market = market
+        self.version = version
+        self.link = link
+        self.engines = {role: make_engine(url, role=role) for role in ROLES}
+        self._makers = {
+            role: sessionmaker(autocommit=False, autoflush=False, bind=e, class_=TrackedSession)
+            for role, e in self.engines.items()
+        }
+        self.in_flight = 0
+        self.retired = False
+        self._disposed = False
+        self._lock = threading.Lock()
+
+    def session(self, role: str) -> Session:
+        db = self._makers[role]()
+        with self._lock:
+            self.in_flight += 1
+        db.generation = self
+        return db
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            drained = self.retired and self.in_flight == 0
+        if drained:
+            self.dispose()
+
+    def retire(self) -> None:
+        with self._lock:
+            self.retired = True
+            drained = self.in_flight == 0
+        if drained:
+            self.dispose()
+
+    def dispose(self) -> None:
+        with self._lock:
+            if self._disposed:
+                return
+            self._disposed = True
+
+        from .services.sqlite_reader import dispose_read_pool
+
+        for e in self.engines.values():
+            e.dispose()
+        path = self.engines["api"].url.database
+        if path:
+            dispose_read_pool(os.path.abspath(path))
+        if self.link is not None:
+            _unlink_db(self.link)
+        print(f"[db] {self.market}: disposed generation {self.version}")
+
+
+class EngineRegistry:
+    def __init__(self, urls: dict[str, str]):
+        self.urls = urls
+        self.hot_swap = False
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._checked_at: dict[str, float] = {}
+        self._current = {m: EngineGeneration(m, snapshot_version(_db_file(u)), u) for m, u in urls.items()}
+
+    def current(self, market: str) -> EngineGeneration:
+        m = _market_key(market)
+        if self.hot_swap and time.monotonic() - self._checked_at.get(m, 0.0) >= HOT_SWAP_CHECK_SECONDS:
+            self.refresh(m)
+        return self._current[m]
+
+    def session(self, market: str, role: str = "jobs") -> Session:
+        m = _market_key(market)
+        self.current(m)
+        with self._lock:  # a swap can't retire (and dispose) the generation in between
+            return self._current[m].session(role)
+
+    def engine(self, market: str, role: str = "jobs"):
+        return self.current(market).engines[role]
+
+    def refresh(self, market: str | None = None) -> list[str]:
+        """Open a new generation for each market whose snapshot version changed; returns those markets."""
+        if not self.hot_swap:
+            return []
+
+        swapped = []
+        with self._swap_lock:
+            for m in [_market_key(market)] if market else list(self.urls):
+                self._checked_at[m] = time.monotonic()
+                db_file = _db_file(self.urls[m])
+                version = snapshot_version(db_file)
+                old = self._current[m]
+                if version is None or (version == old.version and old.link is not None):
+                    continue
+
+                try:
+                    link = _version_link(db_file, version)
+                except OSError as e:
+                    print(f"[db] {m}: cannot link snapshot {version} ({e}); keeping {old.version}")
+                    continue
+
+                new = EngineGeneration(m, version, _sqlite_url(link), link=link)
+                with self._lock:
+                    self._current[m] = new
+                print(f"[db] {m}: serving snapshot {version} (previous {old.version}, in flight {old.in_flight})")
+                old.retire()
+                swapped.append(m)
+        return swapped
+
+    def prune_versions(self) -> None:
+        """Remove version links no current generation uses (left by a previous process)."""
+        keep = {g.link for g in self._current.values() if g.link is not None}
+        for url in self.urls.values():
+            db_file = _db_file(url)
+            vdir = db_file.parent / ".versions" if db_file is not None else None
+            if vdir is None or not vdir.is_dir():
+                continue
+            for p in vdir.glob(f"{db_file.stem}.*{db_file.suffix}"):
+                if p not in keep:
+                    _unlink_db(p)
+
+
+registry = EngineRegistry({"US": DATABASE_URL_US, "INDIA": DATABASE_URL_IN})
+
+
+def enable_hot_swap() -> None:
+    """API process: serve every market through a version link and follow ETag changes from now on."""
+    registry.hot_swap = True
+    registry.refresh()
+    registry.prune_versions()
+
+
+def refresh_engines() -> list[str]:
+    """Pick up newly installed snapshots now (after a sync) instead of at the next check."""
+    return registry.refresh()
+
+
+# Initial generation: the only one outside the API process. Code that must follow hot swaps
+# uses get_engine_by_market() / the session helpers below.
+engine_us = registry.engine("US")
+engine_in = registry.engine("INDIA")
+
+
+def SessionUS() -> Session:
+    return registry.session("US", "jobs")
+
+
+def SessionIN() -> Session:
+    return registry.session("INDIA", "jobs")
 
-SessionUS = sessionmaker(autocommit=False, autoflush=False, bind=engine_us)
-SessionIN = sessionmaker(autocommit=False, autoflush=False, bind=engine_in)
 
 # Backward compatibility (old code may import SessionLocal)
 SessionLocal = SessionUS
@@ -59,14 +367,14 @@ def get_db():
 
 def get_db_market(market: str = Query(default="US")):
     """
-    Market-aware DB selector:
+    Market-aware DB selector (read-only api engines):
       - "India", "INDIA", "IN" -> India DB
       - everything else -> US DB
     """
     m = (market or "US").strip().lower()
     is_india = m in {"india", "in", "ind", "nse"}
 
-    db = SessionIN() if is_india else SessionUS()
+    db = registry.session("INDIA" if is_india else "US", "api")
     try:
         yield db
     finally:
@@ -77,10 +385,17 @@ def get_session_by_market(market: str):
     CLI/script helper (non-FastAPI):
     Returns a Session() bound to the requested market DB.
     """
-    m = (market or "US").strip().upper()
+    return registry.session(market, "jobs")
 
-    if m in {"INDIA", "IN", "IND", "NSE"}:
-        return SessionIN()
 
-    # default US
-    return SessionUS()
+def get_engine_by_market(market: str):
+    return registry.engine(market)
+
+
+def get_session_for_file(db_path: str | Path, role: str = "jobs"):
+    """
+    Session on an arbitrary SQLite file (shard staging copies).
+    Caller closes the session and disposes db.get_bind() when done with the file.
+    """
+    engine = make_engine(_sqlite_url(Path(db_path)), role=role)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Query
 
 from .fundamentals import compute_and_cache_fundamentals
+from .symbol_usage import record_view
 
 router = APIRouter()
 
@@ -12,10 +13,13 @@ def get_fundamentals(
     refresh: int = Query(0, description="1 to force refresh (bypass cache)"),
 ):
     try:
-        return compute_and_cache_fundamentals(
+        resp = compute_and_cache_fundamentals(
             market=market,
             symbol=symbol,
             force_refresh=bool(refresh),
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if resp.get("market_cap") is not None:
+        record_view(market, symbol)
+    return resp
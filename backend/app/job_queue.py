@@ -0,0 +1,333 @@
+# backend/app/job_queue.py
+#
+# Small SQLite-backed job queue for on-demand price downloads (/api/refresh, /api/rebuild_prices).
+# Routes enqueue and return a job id; worker threads in the API process run the downloads, so
+# Yahoo backoff never ties up the FastAPI threadpool. Poll GET /api/jobs/{id} for progress.
+#
+# Lives in its own DB file: the market DBs are replaced by the daily R2 snapshot.
+#
+# Several processes may share jobs.db (a second uvicorn worker, an overlapping deploy): a claimed
+# job records its owner and a heartbeat, and only jobs whose lease expired (owner gone) are
+# requeued.
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime
+
+from .db import DATA_DIR
+
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", str(DATA_DIR / "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# finished jobs are kept this long for polling, then pruned
+KEEP_FINISHED_DAYS = 7
+
+# a running job whose owner hasn't heartbeated for this long is considered orphaned
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+HEARTBEAT_SECONDS = max(1.0, JOB_LEASE_SECONDS / 4)
+
+# this process (host:pid plus a per-boot id, so a recycled pid is never mistaken for us)
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+KINDS = ("refresh", "rebuild")
+ACTIVE_STATES = ("queued", "running")
+
+_wake = threading.Event()
+_workers: list[threading.Thread] = []
+_workers_lock = threading.Lock()
+
+
+# ============================================================
+# DB helpers
+# ============================================================
+def _db_connect() -> sqlite3.Connection:
+    dirp = os.path.dirname(JOBS_DB_PATH)
+    if dirp:
+        os.makedirs(dirp, exist_ok=True)
+    # autocommit; writes that must be atomic use BEGIN IMMEDIATE explicitly
+    con = sqlite3.connect(JOBS_DB_PATH, timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+def init_jobs_db() -> None:
+    con = _db_connect()
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS refresh_jobs (
+      id           INTEGER PRIMARY KEY AUTOINCREMENT,
+      kind         TEXT NOT NULL,
+      market       TEXT NOT NULL,
+      symbol       TEXT NOT NULL,
+      state        TEXT NOT NULL,
+      progress     TEXT,
+      rows         INTEGER,
+      error        TEXT,
+      requests     INTEGER NOT NULL DEFAULT 1,
+      created_at   TEXT NOT NULL,
+      started_at   TEXT,
+      finished_at  TEXT,
+      owner        TEXT,
+      heartbeat_at TEXT
+    );
+    """)
+    # jobs.db files created before leases existed
+    have = {r["name"] for r in con.execute("PRAGMA table_info(refresh_jobs)")}
+    for col in ("owner", "heartbeat_at"):
+        if col not in have:
+            con.execute(f"ALTER TABLE refresh_jobs ADD COLUMN {col} TEXT")
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS ix_refresh_jobs_active ON refresh_jobs (market, symbol, state)"
+    )
+    con.close()
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def _norm_market(market: str) -> str:
+    m = (market or "US").strip().upper()
+    return "INDIA" if m in {"INDIA", "IN", "IND", "NSE"} else "US"
+
+
+def _row_to_dict(row) -> dict | None:
+    return dict(row) if row is not None else None
+
+
+# ============================================================
+# Public API
+# ============================================================
+def enqueue(kind: str, market: str, symbol: str) -> tuple[dict, bool]:
+    """
+    Queue a job, coalescing with an active one for the same (market, symbol):
+      - same kind, or a rebuild already active -> that job is returned (a rebuild covers a refresh)
+      - rebuild requested while a refresh is still *queued* -> the queued job is upgraded
+      - rebuild requested while a refresh is *running* -> a new rebuild job is queued
+    Returns (job, coalesced).
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown job kind: {kind}")
+    market, symbol = _norm_market(market), symbol.strip().upper()
+    start_workers()
+
+    con = _db_connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        active = con.execute(
+            f"""
+            SELECT * FROM refresh_jobs
+            WHERE market = ? AND symbol = ? AND state IN {ACTIVE_STATES}
+            ORDER BY id
+            """,
+            (market, symbol),
+        ).fetchall()
+
+        target = None
+        for job in active:
+            if job["kind"] == kind or job["kind"] == "rebuild":
+                target = job
+                break
+            if kind == "rebuild" and job["state"] == "queued":
+                con.execute("UPDATE refresh_jobs SET kind = 'rebuild' WHERE id = ?", (job["id"],))
+                target = job
+                break
+
+        if target is not None:
+            con.execute("UPDATE refresh_jobs SET requests = requests + 1 WHERE id = ?", (target["id"],))
+            job_id, coalesced = target["id"], True
+        else:
+            cur = con.execute(
+                """
+                INSERT INTO refresh_jobs (kind, market, symbol, state, progress, created_at)
+                VALUES (?, ?, ?, 'queued', 'queued', ?)
+                """,
+                (kind, market, symbol, _now_iso()),
+            )
+            job_id, coalesced = cur.lastrowid, False
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+    _wake.set()
+    return get_job(job_id), coalesced
+
+
+def get_job(job_id: int) -> dict | None:
+    con = _db_connect()
+    try:
+        return _row_to_dict(con.execute("SELECT * FROM refresh_jobs WHERE id = ?", (job_id,)).fetchone())
+    finally:
+        con.close()
+
+
+def set_progress(job_id: int, progress: str, rows: int | None = None) -> None:
+    con = _db_connect()
+    try:
+        con.execute(
+            "UPDATE refresh_jobs SET progress = ?, rows = COALESCE(?, rows) WHERE id = ?",
+            (progress, rows, job_id),
+        )
+    finally:
+        con.close()
+
+
+def _requeue_expired(con: sqlite3.Connection) -> int:
+    """Requeue running jobs whose owner stopped heartbeating (crashed or killed process)."""
+    cur = con.execute(
+        """
+        UPDATE refresh_jobs SET state = 'queued', progress = 'requeued (lease expired)', owner = NULL
+        WHERE state = 'running'
+          AND (heartbeat_at IS NULL OR heartbeat_at < strftime('%Y-%m-%dT%H:%M:%SZ', 'now', ?))
+        """,
+        (f"-{JOB_LEASE_SECONDS} seconds",),
+    )
+    return cur.rowcount
+
+
+def _claim_next() -> dict | None:
+    con = _db_connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        _requeue_expired(con)
+        row = con.execute("SELECT * FROM refresh_jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is not None:
+            now = _now_iso()
+            con.execute(
+                """
+                UPDATE refresh_jobs
+                SET state = 'running', progress = 'starting', started_at = ?, owner = ?, heartbeat_at = ?
+                WHERE id = ?
+                """,
+                (now, OWNER_ID, now, row["id"]),
+            )
+        con.execute("COMMIT")
+        return _row_to_dict(row)
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def _finish(job_id: int, state: str, rows: int | None = None, error: str | None = None) -> None:
+    con = _db_connect()
+    try:
+        con.execute(
+            """
+            UPDATE refresh_jobs
+            SET state = ?, progress = ?, rows = COALESCE(?, rows), error = ?, finished_at = ?
+            WHERE id = ?
+            """,
+            (state, state, rows, error, _now_iso(), job_id),
+        )
+    finally:
+        con.close()
+
+
+def _heartbeat() -> int:
+    """Extend the lease of every job this process is running."""
+    con = _db_connect()
+    try:
+        cur = con.execute(
+            "UPDATE refresh_jobs SET heartbeat_at = ? WHERE state = 'running' AND owner = ?",
+            (_now_iso(), OWNER_ID),
+        )
+        return cur.rowcount
+    finally:
+        con.close()
+
+
+def _recover_and_prune() -> None:
+    """
+    Startup: requeue running jobs whose lease expired (their process is gone; otherwise
+    enqueue() would keep coalescing new requests onto a job nobody runs) and prune old
+    finished jobs. Jobs another live process is running keep heartbeating and are left alone.
+    """
+    con = _db_connect()
+    try:
+        n = _requeue_expired(con)
+        if n:
+            print(f"[jobs] requeued {n} orphaned job(s)")
+        con.execute(
+            """
+            DELETE FROM refresh_jobs
+            WHERE state IN ('done', 'failed') AND finished_at < strftime('%Y-%m-%dT%H:%M:%SZ', 'now', ?)
+            """,
+            (f"-{KEEP_FINISHED_DAYS} days",),
+        )
+    finally:
+        con.close()
+
+
+# ============================================================
+# Workers
+# ============================================================
+def _run_job(job: dict) -> int:
+    # late import: jobs pulls in yfinance/pandas and the price services
+    from .jobs import rebuild_symbol_prices, refresh_symbol_prices
+
+    def progress(msg, rows=None):
+        set_progress(job["id"], msg, rows)
+
+    if job["kind"] == "rebuild":
+        return rebuild_symbol_prices(job["market"], job["symbol"], progress=progress)
+    return refresh_symbol_prices(job["market"], job["symbol"], progress=progress)
+
+
+def _worker_loop(poll_s: float = 5.0) -> None:
+    while True:
+        try:
+            job = _claim_next()
+        except Exception as e:
+            print(f"[jobs] claim failed: {e}")
+            job = None
+
+        if job is None:
+            _wake.wait(poll_s)
+            _wake.clear()
+            continue
+
+        t0 = time.perf_counter()
+        try:
+            rows = _run_job(job)
+            _finish(job["id"], "done", rows=rows)
+            print(f"[jobs] #{job['id']} {job['kind']} {job['market']}:{job['symbol']} rows={rows} "
+                  f"in {time.perf_counter() - t0:.1f}s")
+        except Exception as e:
+            traceback.print_exc()
+            _finish(job["id"], "failed", error=str(e)[:500])
+
+
+def _heartbeat_loop() -> None:
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        try:
+            _heartbeat()
+        except Exception as e:
+            print(f"[jobs] heartbeat failed: {e}")
+
+
+def start_workers(n: int | None = None) -> None:
+    """Idempotent: starts the worker threads once per process."""
+    n = JOB_WORKERS if n is None else n
+    with _workers_lock:
+        if _workers:
+            return
+        init_jobs_db()
+        _recover_and_prune()
+        for i in range(max(1, n)):
+            t = threading.Thread(target=_worker_loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+        threading.Thread(target=_heartbeat_loop, name="job-heartbeat", daemon=True).start()
+    print(f"[jobs] {len(_workers)} worker(s) on {JOBS_DB_PATH} (owner {OWNER_ID})")
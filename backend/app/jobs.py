@@ -1,7 +1,18 @@
+from datetime import timedelta
+
 from sqlalchemy.orm import Session
-from .db import SessionLocal
+from .db import SessionLocal, get_session_by_market
 from .models import Stock
 from .services.price_loader import refresh_recent
+from .services.price_cache import mark_dirty
+from .services.price_service import download_prices, latest_price_date, rebuild_prices, upsert_prices
+
+# on-demand refresh re-reads this many days before the latest stored bar (patches late NULL fixes)
+REFRESH_OVERLAP_DAYS = 7
+
+
+def _no_progress(msg, rows=None):
+    pass
 
 
 def refresh_all_watchlist(days: int = 7):
@@ -28,3 +39,49 @@ def refresh_all_watchlist(days: int = 7):
 
     finally:
         db.close()
+
+
+def refresh_symbol_prices(market: str, symbol: str, progress=_no_progress) -> int:
+    """
+    Job behind /api/refresh: only the missing range after the stored watermark
+    (full history if the symbol has no bars yet).
+    """
+    db: Session = get_session_by_market(market)
+    try:
+        last = latest_price_date(db, symbol)
+        start = last - timedelta(days=REFRESH_OVERLAP_DAYS) if last else None
+        db.rollback()  # don't hold a read snapshot open during the download
+
+        progress(f"downloading from {start.isoformat() if start else 'full history'}")
+        df = download_prices(symbol, start=start)
+
+        progress("writing", len(df))
+        n = upsert_prices(db, symbol, df)
+        if n:
+            mark_dirty(market, symbol)
+        return n
+    finally:
+        db.close()
+
+
+def rebuild_symbol_prices(market: str, symbol: str, progress=_no_progress) -> int:
+    """
+    Job behind /api/rebuild_prices: full download first (no DB work meanwhile),
+    then an atomic staged swap (see price_service.rebuild_prices).
+    """
+    progress("downloading full history")
+    df = download_prices(symbol)
+    if df.empty:
+        print(f"⚠️ Rebuild {market}:{symbol}: download returned no rows, stored history kept")
+        return 0
+
+    progress("swapping", len(df))
+    db: Session = get_session_by_market(market)
+    try:
+        n = rebuild_prices(db, symbol, df)
+        if n:
+            mark_dirty(market, symbol)
+        print(f"✅ Rebuilt {market}:{symbol} rows={n}")
+        return n
+    finally:
+        db.close()
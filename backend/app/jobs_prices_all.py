@@ -1,11 +1,44 @@
 # backend/app/jobs_prices_all.py
 
+from datetime import datetime, timedelta
+
 from sqlalchemy import select
 from .models import Symbol
-from .services.price_loader import backfill_symbols, refresh_recent
+from .services.price_loader import (
+    backfill_start,
+    backfill_symbols,
+    refresh_recent,
+    refresh_incremental,
+    reload_history,
+)
+from .services.corporate_actions import make_action_detector, mark_reloaded, pending_action_symbols
+from .services.market_calendar import expected_last_session
+from .services.refresh_planner import build_plan, format_plan, write_plan_csv
+from .services.sharding import finish_shard_run, shard_symbols, start_shard_run
+from .services.backfill_progress import pending_symbols, progress_summary, record_batch, reset_progress
+from .services.symbol_health import (
+    DEACTIVATE_AFTER_EMPTY_RUNS,
+    due_symbols,
+    failure_summary,
+    make_failure_hook,
+)
+from .services.time_budget import RunBudget, resume_symbols, save_checkpoint
+from .symbol_usage import by_popularity, load_view_counts
 
 
-def _get_active_symbols(db, market: str, limit: int | None = None, offset: int = 0) -> list[str]:
+def _get_active_symbols(
+    db,
+    market: str,
+    limit: int | None = None,
+    offset: int = 0,
+    views: dict[str, int] | None = None,
+    first: list[str] | None = None,
+) -> list[str]:
+    """
+    Active symbols, alphabetical; with `views` (see symbol_usage) most viewed first, so
+    limit/offset slice the popularity order. `first` (leftovers of a run that hit its time
+    budget) go ahead of equally viewed symbols.
+    """
     q = (
         select(Symbol.symbol)
         .where(Symbol.market == market)
@@ -13,6 +46,14 @@ def _get_active_symbols(db, market: str, limit: int | None = None, offset: int =
         .order_by(Symbol.symbol.asc())
     )
 
+    if views or first:
+        symbols = [r[0] for r in db.execute(q).all()]
+        if first:
+            active, lead = set(symbols), set(first)
+            symbols = [s for s in first if s in active] + [s for s in symbols if s not in lead]
+        symbols = by_popularity(symbols, views)
+        return symbols[offset:] if limit is None else symbols[offset:offset + limit]
+
     if limit is not None:
         q = q.limit(limit).offset(offset)
 
@@ -20,33 +61,191 @@ def _get_active_symbols(db, market: str, limit: int | None = None, offset: int =
     return [r[0] for r in rows]
 
 
-def run_backfill(db, market: str, years: int = 10, limit: int | None = None, offset: int = 0):
-    symbols = _get_active_symbols(db, market=market, limit=limit, offset=offset)
-    print(f"[backfill] market={market} symbols={len(symbols)} years={years} offset={offset} limit={limit}")
+def _load_views(market: str, usage_db: str | None) -> dict[str, int]:
+    views = load_view_counts(market, usage_db)
+    if views:
+        top = sorted(views.items(), key=lambda kv: -kv[1])[:5]
+        print(f"[priority] market={market} viewed={len(views)} top={top}")
+    else:
+        print(f"[priority] market={market} no view counts, alphabetical order")
+    return views
+
+
+def run_backfill(
+    db,
+    market: str,
+    years: int = 10,
+    limit: int | None = None,
+    offset: int = 0,
+    restart: bool = False,
+    max_attempts: int = 3,
+):
+    """
+    Resumable backfill: symbols already covered in backfill_progress are skipped, and each
+    batch's checkpoint is committed together with its bars, so the job can be killed and
+    re-run at any moment. --limit/--offset slice the *pending* list.
+    """
+    if restart:
+        n = reset_progress(db)
+        print(f"[backfill] restart: cleared {n} progress rows")
+
+    symbols = _get_active_symbols(db, market=market)
+    pending = pending_symbols(db, symbols, backfill_start(years), max_attempts=max_attempts)
+    pending = pending[offset:] if limit is None else pending[offset:offset + limit]
+
+    print(
+        f"[backfill] market={market} active={len(symbols)} pending={len(pending)} "
+        f"years={years} offset={offset} limit={limit}"
+    )
 
     n = backfill_symbols(
         db,
-        symbols,
+        pending,
         years=years,
-        batch_size=5,     # keep small for yfinance
-        sleep_s=2.0,      # tune if rate-limited
+        batch_size=5,     # first-run seed; the AIMD pacer takes over from the persisted state
+        sleep_s=2.0,
+        on_batch=record_batch,
     )
 
-    print(f"[backfill] upserted rows={n}")
+    print(f"[backfill] upserted rows={n} progress={progress_summary(db)}")
     return n
 
 
-def run_daily_refresh(db, market: str, days: int = 7, limit: int | None = None, offset: int = 0):
-    symbols = _get_active_symbols(db, market=market, limit=limit, offset=offset)
-    print(f"[daily] market={market} symbols={len(symbols)} days={days} offset={offset} limit={limit}")
+# incremental daily re-reads this many calendar days before each watermark, so every stale
+# symbol has stored bars to compare against (split/dividend detection)
+DAILY_OVERLAP_DAYS = 5
 
-    n = refresh_recent(
-        db,
-        symbols,
-        days=days,
-        batch_size=30,    # daily can be larger than backfill
-        sleep_s=1.0,
+# cap on full-history reloads per run; the rest stay pending for the next run
+MAX_RELOADS_PER_RUN = 200
+
+
+def run_daily_refresh(
+    db,
+    market: str,
+    days: int = 7,
+    limit: int | None = None,
+    offset: int = 0,
+    incremental: bool = True,
+    deactivate_after: int = DEACTIVATE_AFTER_EMPTY_RUNS,
+    overlap_days: int = DAILY_OVERLAP_DAYS,
+    max_reloads: int = MAX_RELOADS_PER_RUN,
+    shards: int = 1,
+    shard_index: int = 0,
+    usage_db: str | None = None,
+    deadline: float | None = None,
+):
+    """
+    Daily refresh over active symbols that are due (see symbol_health): symbols still inside
+    their retry back-off are skipped, and ones empty for `deactivate_after` runs get
+    symbols.is_active = False, so _get_active_symbols shrinks to tickers that actually trade.
+
+    Overlapping bars are checked for splits/dividends (see corporate_actions); affected symbols
+    are then reloaded in full, up to `max_reloads` per run (0 = detect only).
+
+    shards > 1: only this worker's deterministic slice of the symbols (see services/sharding.py).
+
+    Symbols are refreshed most viewed first (API view counts from `usage_db`, default
+    symbol_usage.USAGE_DB_PATH), so a run cut short leaves only rarely viewed tickers stale.
+
+    deadline (epoch seconds, see services/time_budget.py): stop taking new batches once the next
+    one would not fit; what is left is recorded in refresh_checkpoints and goes first next run.
+    """
+    started_at = datetime.utcnow()
+    budget = RunBudget(deadline) if deadline is not None else None
+
+    views = _load_views(market, usage_db)
+    leftover = resume_symbols(db, market)
+    active = shard_symbols(
+        _get_active_symbols(db, market=market, limit=limit, offset=offset, views=views, first=leftover),
+        shards,
+        shard_index,
+    )
+    symbols = due_symbols(db, active)
+    mode = "incremental" if incremental else "window"
+    print(
+        f"[daily] market={market} symbols={len(symbols)} waiting_retry={len(active) - len(symbols)} "
+        f"days={days} offset={offset} limit={limit} mode={mode}"
+        + (f" shard={shard_index}/{shards}" if shards > 1 else "")
+        + (f" leftover={len(leftover)}" if leftover else "")
+        + (f" budget={budget.remaining():.0f}s" if budget is not None else "")
     )
 
-    print(f"[daily] upserted rows={n}")
+    hook = make_failure_hook(deactivate_after=deactivate_after)
+    detector = make_action_detector()
+    if incremental:
+        # exchange calendar: weekends/holidays/pre-settle runs find every symbol current
+        expected = expected_last_session(market)
+        n = refresh_incremental(
+            db,
+            symbols,
+            days=days,
+            batch_size=30,    # first-run seed; daily can be larger than backfill
+            sleep_s=1.0,
+            overlap_days=overlap_days,
+            expected_last=expected,
+            end=expected + timedelta(days=1),
+            on_batch=hook,
+            before_write=detector,
+            budget=budget,
+        )
+    else:
+        n = refresh_recent(
+            db, symbols, days=days, batch_size=30, sleep_s=1.0, on_batch=hook, before_write=detector, budget=budget
+        )
+
+    print(f"[daily] upserted rows={n} outcomes={hook.stats} failures={failure_summary(db)}")
+    print(f"[daily] corporate actions detected={detector.stats}")
+
+    if max_reloads and not (budget is not None and budget.stopped_early):
+        reload = by_popularity(shard_symbols(pending_action_symbols(db), shards, shard_index), views)[:max_reloads]
+        if reload:
+            print(f"[daily] full-history reload for {len(reload)} symbols with splits/dividends")
+            n_skipped = len(budget.skipped) if budget is not None else 0
+            n += reload_history(db, reload, on_batch=mark_reloaded, budget=budget)
+            if budget is not None:
+                del budget.skipped[n_skipped:]  # unreloaded symbols simply stay 'pending'
+
+    save_checkpoint(
+        db, market, mode, started_at, n, budget=budget, shard_index=shard_index if shards > 1 else None
+    )
+    if budget is not None and budget.stopped_early:
+        print(f"[daily] stopped at the time budget: {len(set(budget.skipped))} symbols left for the next run")
     return n
+
+
+def run_daily_shard(db, market: str, shards: int, shard_index: int, **kwargs):
+    """
+    One sharded worker: run_daily_refresh on this slice, bracketed by a shard_runs row in the
+    (staging) DB so merge_staging knows what to fold back and that the run finished.
+    """
+    run_id = start_shard_run(db, market, shards, shard_index)
+    n = run_daily_refresh(db, market, shards=shards, shard_index=shard_index, **kwargs)
+    finish_shard_run(db, run_id, n)
+    return n
+
+
+def run_refresh_plan(
+    db,
+    market: str,
+    days: int = 7,
+    overlap_days: int = DAILY_OVERLAP_DAYS,
+    limit: int | None = None,
+    offset: int = 0,
+    out: str | None = None,
+    usage_db: str | None = None,
+):
+    """
+    Dry run of the incremental daily refresh: no network calls, prints what would be fetched
+    and the estimated number of Yahoo requests. out= writes the (symbol, start, end) list as CSV.
+    """
+    views = _load_views(market, usage_db)
+    active = _get_active_symbols(db, market=market, limit=limit, offset=offset, views=views)
+    symbols = due_symbols(db, active)
+
+    plan = build_plan(db, market, symbols, days=days, overlap_days=overlap_days)
+    print(format_plan(plan) + f" waiting_retry={len(active) - len(symbols)}")
+
+    if out:
+        write_plan_csv(plan, out)
+        print(f"[plan] wrote {len(plan['requests'])} requests to {out}")
+    return plan
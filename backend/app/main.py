@@ -5,8 +5,11 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .db import enable_hot_swap
 from .routes import router
 from .scheduler import start_scheduler
+from .job_queue import start_workers
+from .symbol_usage import flush_views, start_usage_flusher
 from app.utils.r2_sync import sync_all_latest_dbs
 
 from .fundamentals_routes import router as fundamentals_router
@@ -30,7 +33,15 @@ def startup():
     data_dir = project_root / "backend" / "data"
 
     sync_all_latest_dbs(local_data_dir=str(data_dir))
+    enable_hot_swap()  # later snapshots are picked up without a restart
     start_scheduler()
+    start_workers()
+    start_usage_flusher()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    flush_views()
 
 
 app.add_middleware(
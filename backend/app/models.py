@@ -60,6 +60,159 @@ class DailyBar(Base):
     )
 
 
+class PacingState(Base):
+    """
+    Last known-good Yahoo operating point per job (see services/yf_pacing.py).
+    Lives in the market DB so it travels with the R2 snapshot between runs.
+    """
+    __tablename__ = "pacing_state"
+
+    key = Column(String, primary_key=True)  # "backfill" / "daily"
+    batch_size = Column(Integer, nullable=False)
+    sleep_s = Column(Float, nullable=False)
+
+    successes = Column(BigInteger, nullable=False, default=0)
+    throttles = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class BackfillProgress(Base):
+    """
+    Per-symbol checkpoint for the resumable backfill (see services/backfill_progress.py).
+    Written in the same transaction as the symbol's bars.
+    """
+    __tablename__ = "backfill_progress"
+
+    symbol = Column(String, primary_key=True)
+    state = Column(String, nullable=False)  # done / empty / failed / retry
+
+    requested_from = Column(Date, nullable=True)  # start of the window that was asked for
+    start_date = Column(Date, nullable=True)  # covered range (real bars written)
+    end_date = Column(Date, nullable=True)
+    rows = Column(Integer, nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    updated_at = Column(
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class SymbolFailure(Base):
+    """
+    Dead-letter entry for symbols that keep failing in the daily refresh
+    (see services/symbol_health.py). Deleted again on the next successful fetch.
+    """
+    __tablename__ = "symbol_failures"
+
+    symbol = Column(String, primary_key=True)
+
+    consecutive_empty = Column(Integer, nullable=False, default=0)  # runs in a row with no bars
+    consecutive_errors = Column(Integer, nullable=False, default=0)  # batch/network errors in a row
+    total_failures = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+
+    last_failure_at = Column(DateTime, nullable=True)
+    next_retry_at = Column(DateTime, nullable=True)  # skipped by the daily refresh until then
+    deactivated_at = Column(DateTime, nullable=True)  # when symbols.is_active was cleared
+
+    updated_at = Column(
+        DateTime, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+class CorporateActionEvent(Base):
+    """
+    Split/dividend detected by the daily refresh: Yahoo's adj_close/close ratio (or close)
+    for already-stored bars changed (see services/corporate_actions.py).
+    'pending' events get a full-history reload, then turn 'reloaded'.
+    """
+    __tablename__ = "corporate_action_events"
+
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, index=True, nullable=False)
+
+    kind = Column(String, nullable=False)  # split | dividend
+    ref_date = Column(Date, nullable=True)  # oldest overlapping bar (the one compared)
+    close_ratio = Column(Float, nullable=True)  # new close / stored close
+    adj_ratio = Column(Float, nullable=True)  # new (adj_close/close) / stored (adj_close/close)
+
+    state = Column(String, nullable=False, default="pending")  # pending | reloaded
+    detected_at = Column(DateTime, server_default=func.now(), nullable=False)
+    reloaded_at = Column(DateTime, nullable=True)
+
+
+class BarQuarantine(Base):
+    """
+    Downloaded bars rejected by the ingest quality gate (see services/bar_quality.py),
+    kept with the reason instead of reaching daily_bars and the charts.
+    """
+    __tablename__ = "bar_quarantine"
+
+    id = Column(Integer, primary_key=True)
+    symbol = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=True)
+    adj_close = Column(Float, nullable=True)
+    volume = Column(BigInteger, nullable=True)
+    source = Column(String, nullable=True)
+
+    reason = Column(String, nullable=False)  # non_positive | high_low | neg_volume | spike
+    times_seen = Column(Integer, nullable=False, default=1)
+    first_seen_at = Column(DateTime, server_default=func.now(), nullable=False)
+    last_seen_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("symbol", "date", name="uq_bar_quarantine_symbol_date"),
+    )
+
+
+class ShardRun(Base):
+    """
+    One sharded daily-refresh worker run, recorded in its staging DB (see services/sharding.py).
+    The merge step only folds in rows touched since started_at, for finished runs.
+    """
+    __tablename__ = "shard_runs"
+
+    id = Column(Integer, primary_key=True)
+    market = Column(String, nullable=False)
+    shards = Column(Integer, nullable=False)
+    shard_index = Column(Integer, nullable=False)
+    rows = Column(Integer, nullable=True)
+    started_at = Column(DateTime, nullable=False)  # DB clock (CURRENT_TIMESTAMP), like updated_at
+    finished_at = Column(DateTime, nullable=True)
+
+
+class RefreshCheckpoint(Base):
+    """
+    Outcome of one daily-refresh run (see services/time_budget.py). A run that hit its
+    --time-budget lists the symbols it never fetched; the next run takes them first among
+    equally viewed symbols.
+    """
+    __tablename__ = "refresh_checkpoints"
+
+    id = Column(Integer, primary_key=True)
+    market = Column(String, index=True, nullable=False)
+    mode = Column(String, nullable=False)  # incremental | window
+    shard_index = Column(Integer, nullable=True)
+
+    budget_s = Column(Float, nullable=True)  # None = no budget
+    stopped_early = Column(Boolean, nullable=False, default=False)
+    batches = Column(Integer, nullable=False, default=0)
+    rows = Column(Integer, nullable=False, default=0)
+    remaining = Column(Integer, nullable=False, default=0)
+    remaining_symbols = Column(String, nullable=True)  # comma-separated
+
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
 # -------------------------------------------------------------------
 # Backward-compatible aliases (your routes/services expect these names)
 # -------------------------------------------------------------------
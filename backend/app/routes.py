@@ -1,15 +1,14 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import delete, func, text
+from sqlalchemy import func, text
 import pandas as pd
 
 from .db import get_db_market
+from .job_queue import enqueue, get_job
+from .symbol_usage import record_view
 from .models import Stock, PriceDaily
-from .services.price_service import (
-    get_prices_from_db,
-    download_prices,
-    upsert_prices,
-)
+from .services.price_cache import cached_columns, columns_to_rows
+from .services.price_service import get_prices_from_db
 from .services.indicator_service import add_indicators
 from .services.dcf_service import run_dcf
 
@@ -17,9 +16,9 @@ router = APIRouter()
 
 
 def _table_exists(db: Session, table_name: str) -> bool:
-    # SQLite-friendly table existence check
+    # SQLite-friendly table existence check (daily_bars is a view on compact DBs)
     row = db.execute(
-        text("SELECT name FROM sqlite_master WHERE type='table' AND name=:t"),
+        text("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=:t"),
         {"t": table_name},
     ).fetchone()
     return row is not None
@@ -85,29 +84,44 @@ def watchlist(
     return []
 
 
-@router.post("/refresh")
+def _job_response(job: dict, coalesced: bool) -> dict:
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "market": job["market"],
+        "symbol": job["symbol"],
+        "status": job["state"],
+        "coalesced": coalesced,
+    }
+
+
+@router.post("/refresh", status_code=202)
 def refresh(
     symbol: str,
     market: str = Query(default="US"),
-    db: Session = Depends(get_db_market),
 ):
-    df = download_prices(symbol)
-    inserted = upsert_prices(db, symbol, df)
-    return {"market": market, "symbol": symbol, "inserted_or_updated": inserted}
+    # incremental download (missing range after the stored watermark) runs on a job worker
+    job, coalesced = enqueue("refresh", market, symbol)
+    return _job_response(job, coalesced)
 
 
-@router.post("/rebuild_prices")
+@router.post("/rebuild_prices", status_code=202)
 def rebuild_prices(
     symbol: str,
     market: str = Query(default="US"),
-    db: Session = Depends(get_db_market),
 ):
-    db.execute(delete(PriceDaily).where(PriceDaily.symbol == symbol))
-    db.commit()
+    # full download + staged swap on a job worker; the old history stays readable until
+    # the swap commits, and a failed download leaves it untouched
+    job, coalesced = enqueue("rebuild", market, symbol)
+    return _job_response(job, coalesced)
+
 
-    df = download_prices(symbol)
-    count = upsert_prices(db, symbol, df)
-    return {"market": market, "symbol": symbol, "reloaded_rows": count}
+@router.get("/jobs/{job_id}")
+def job_status(job_id: int):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
 
 
 @router.get("/prices")
@@ -121,7 +135,10 @@ def prices(
     days is treated as 'limit' here (1 row per day).
     """
     limit = max(5, min(int(days or 380), 5000))
-    rows = get_prices_from_db(db, symbol, limit=limit)
+    cols = cached_columns(market, symbol, limit=limit)
+    rows = columns_to_rows(cols) if cols is not None else get_prices_from_db(db, symbol, limit=limit)
+    if rows:
+        record_view(market, symbol)
     return {"market": market, "symbol": symbol, "rows": rows}
 
 
@@ -136,9 +153,11 @@ def indicators(
     selected = [x.strip() for x in (indicators or "").split(",") if x.strip()]
 
     limit = max(50, min(int(days or 800), 5000))
-    rows = get_prices_from_db(db, symbol, limit=limit)
+    cols = cached_columns(market, symbol, limit=limit)
+    rows = columns_to_rows(cols) if cols is not None else get_prices_from_db(db, symbol, limit=limit)
     if not rows:
         return {"market": market, "symbol": symbol, "rows": []}
+    record_view(market, symbol)
 
     df = pd.DataFrame(rows)
     df["date"] = pd.to_datetime(df["date"])
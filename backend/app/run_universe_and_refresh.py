@@ -1,10 +1,226 @@
 # backend/app/run_universe_and_refresh.py
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import sys
+import time
+import traceback
 
-from .db import Base, engine_us, engine_in, get_session_by_market
+from pathlib import Path
+
+from .db import (
+    DATA_DIR,
+    Base,
+    engine_us,
+    engine_in,
+    get_engine_by_market,
+    get_session_by_market,
+    get_session_for_file,
+    release_engine,
+)
 from .jobs_universe import load_universe
-from .jobs_prices_all import run_backfill, run_daily_refresh
+from .jobs_prices_all import run_backfill, run_daily_refresh, run_daily_shard, run_refresh_plan
+from .services.sharding import merge_staging, prepare_staging
+from .services.bhavcopy_loader import ingest_bhavcopy
+from .services.compact_bars import migrate as migrate_compact
+from .services.price_cache import build_price_cache
+from .services.flatfile_importer import import_flat_files
+from .services.yf_pacing import set_rate_share
+
+
+# with --time-budget, local shard workers stop this much earlier so the merge still fits
+SHARD_MERGE_RESERVE_S = 300
+
+
+class _PrefixedStream:
+    """Line-prefixing stdout/stderr wrapper, so parallel markets' logs stay readable."""
+
+    def __init__(self, stream, prefix: str):
+        self._stream = stream
+        self._prefix = prefix
+        self._at_line_start = True
+
+    def write(self, text):
+        out = []
+        for line in text.splitlines(keepends=True):
+            if self._at_line_start:
+                out.append(self._prefix)
+            out.append(line)
+            self._at_line_start = line.endswith("\n")
+        self._stream.write("".join(out))
+        self._stream.flush()
+        return len(text)
+
+    def flush(self):
+        self._stream.flush()
+
+
+def _prefix_output(prefix: str) -> None:
+    # wrap the original streams: a pool worker may run more than one task
+    sys.stdout = _PrefixedStream(sys.__stdout__, prefix)
+    sys.stderr = _PrefixedStream(sys.__stderr__, prefix)
+
+
+def _daily_kwargs(args) -> dict:
+    return dict(
+        days=args.days,
+        limit=args.limit,
+        offset=args.offset,
+        incremental=(args.mode == "incremental"),
+        deactivate_after=args.deactivate_after,
+        overlap_days=args.overlap_days,
+        max_reloads=args.max_reloads,
+        usage_db=args.usage_db,
+        deadline=args.deadline,
+    )
+
+
+def _run_shard_worker(args, m: str, shard_index: int, path: str) -> int:
+    _prefix_output(f"<{m}#{shard_index}> ")
+    set_rate_share(args.shards)  # N local processes share one IP's Yahoo rate
+    kwargs = _daily_kwargs(args)
+    if kwargs["deadline"] is not None:
+        kwargs["deadline"] -= SHARD_MERGE_RESERVE_S
+    db = get_session_for_file(path)
+    try:
+        return run_daily_shard(db, m, args.shards, shard_index, **kwargs)
+    finally:
+        db.close()
+        db.get_bind().dispose()
+
+
+def _run_sharded_daily(args, m: str, db) -> dict:
+    """
+    Local sharded daily: N staging copies of the market DB, one worker process per shard,
+    then one merge pass back into the market DB. Staging files are removed after a clean merge.
+    """
+    src = get_engine_by_market(m).url.database
+    staging_dir = Path(args.staging_dir)
+    paths = [
+        prepare_staging(src, staging_dir / f"{m.lower()}-shard{i}-of-{args.shards}.db")
+        for i in range(args.shards)
+    ]
+    print(f"[daily] market={m} shards={args.shards} staging={staging_dir}")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.shards, mp_context=ctx) as pool:
+        futures = [pool.submit(_run_shard_worker, args, m, i, str(p)) for i, p in enumerate(paths)]
+        rows = [f.result() for f in futures]
+
+    totals = merge_staging(db, paths)
+    print(f"[merge] market={m} {totals}")
+    if totals["skipped"] == 0:
+        for p in paths:
+            p.unlink()
+    return {"rows": sum(rows), **totals}
+
+
+def _run_market(args, m: str, n_markets: int, prefix: bool = False) -> dict:
+    """
+    Run args.cmd for one market. Never raises: returns {market, status, secs, result, error}
+    so sequential and parallel runs produce the same summary.
+    """
+    if prefix:
+        _prefix_output(f"<{m}> ")
+
+    t0 = time.perf_counter()
+    result = None
+    db = get_session_by_market(m)
+    try:
+        if args.cmd == "universe":
+            print(f"[universe] market={m}")
+            result = load_universe(db, market=m)
+
+        elif args.cmd == "backfill":
+            print(f"[backfill] market={m} years={args.years} limit={args.limit} offset={args.offset}")
+            result = run_backfill(
+                db,
+                market=m,
+                years=args.years,
+                limit=args.limit,
+                offset=args.offset,
+                restart=args.restart,
+                max_attempts=args.max_attempts,
+            )
+
+        elif args.cmd == "daily":
+            print(f"[daily] market={m} days={args.days} limit={args.limit} offset={args.offset} mode={args.mode}")
+            if args.shards > 1 and args.shard_index is None:
+                result = _run_sharded_daily(args, m, db)
+            elif args.shards > 1:
+                result = run_daily_shard(db, m, args.shards, args.shard_index, **_daily_kwargs(args))
+            else:
+                result = run_daily_refresh(db, market=m, **_daily_kwargs(args))
+
+        elif args.cmd == "merge":
+            result = merge_staging(db, args.paths)
+            print(f"[merge] market={m} {result}")
+
+        elif args.cmd == "plan":
+            out = args.out
+            if out and n_markets > 1:
+                out = out.replace(".csv", "") + f"_{m.lower()}.csv"
+            plan = run_refresh_plan(
+                db,
+                market=m,
+                days=args.days,
+                overlap_days=args.overlap_days,
+                limit=args.limit,
+                offset=args.offset,
+                out=out,
+                usage_db=args.usage_db,
+            )
+            result = {k: plan[k] for k in ("stale", "estimated_requests")}
+
+        elif args.cmd == "compact":
+            print(f"[compact] market={m} revert={args.revert}")
+            result = migrate_compact(get_engine_by_market(m), revert=args.revert)
+            print(f"[compact] market={m} {result}")
+
+        elif args.cmd == "cache":
+            result = build_price_cache(m, get_engine_by_market(m).url.database)
+            result = {k: result[k] for k in ("rows", "symbols", "build_s")}
+
+        elif args.cmd == "bhavcopy":
+            series = tuple(x.strip() for x in args.series.split(",") if x.strip())
+            result = ingest_bhavcopy(db, args.path, series=series, known_only=args.known_only)
+
+        elif args.cmd == "import":
+            print(f"[import] market={m} path={args.path}")
+            result = import_flat_files(
+                db,
+                args.path,
+                market=m,
+                fmt=args.format,
+                chunk_rows=args.chunk_rows,
+                known_only=args.known_only,
+                source=args.source,
+                defer_indexes=args.defer_indexes,
+            )
+
+    except Exception as e:
+        traceback.print_exc()
+        return {"market": m, "status": "failed", "secs": time.perf_counter() - t0, "result": None, "error": str(e)[:300]}
+    finally:
+        db.close()
+
+    return {"market": m, "status": "ok", "secs": time.perf_counter() - t0, "result": result, "error": None}
+
+
+def _run_markets(args, markets: list[str]) -> list[dict]:
+    """
+    One process per market with --parallel (separate DB files, Yahoo pacers and yfinance
+    state), otherwise one after the other. "spawn" so children never inherit open SQLite
+    connections from the parent.
+    """
+    if not (args.parallel and len(markets) > 1):
+        return [_run_market(args, m, len(markets)) for m in markets]
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=len(markets), mp_context=ctx) as pool:
+        futures = [pool.submit(_run_market, args, m, len(markets), True) for m in markets]
+        return [f.result() for f in futures]
 
 
 def main():
@@ -17,6 +233,12 @@ def main():
         help="Which market DB to use",
     )
 
+    parser.add_argument(
+        "--parallel",
+        action="store_true",
+        help="with --market ALL: run each market in its own process (independent Yahoo pacing)",
+    )
+
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     sub.add_parser("universe")
@@ -25,38 +247,144 @@ def main():
     p_backfill.add_argument("--years", type=int, default=10)
     p_backfill.add_argument("--limit", type=int, default=None)
     p_backfill.add_argument("--offset", type=int, default=0)
+    p_backfill.add_argument("--restart", action="store_true", help="forget backfill_progress and start over")
+    p_backfill.add_argument("--max-attempts", type=int, default=3, help="give up on empty/failed symbols after N tries")
 
     p_daily = sub.add_parser("daily")
     p_daily.add_argument("--days", type=int, default=7)
     p_daily.add_argument("--limit", type=int, default=None)
     p_daily.add_argument("--offset", type=int, default=0)
+    p_daily.add_argument(
+        "--mode",
+        choices=["incremental", "window"],
+        default="incremental",
+        help="incremental = only missing range per symbol (skips current ones); window = always last --days",
+    )
+    p_daily.add_argument(
+        "--deactivate-after",
+        type=int,
+        default=5,
+        help="mark a symbol inactive after N consecutive empty runs (0 = never)",
+    )
+    p_daily.add_argument(
+        "--overlap-days",
+        type=int,
+        default=5,
+        help="incremental mode: re-read N days before each watermark (split/dividend detection)",
+    )
+    p_daily.add_argument(
+        "--max-reloads",
+        type=int,
+        default=200,
+        help="full-history reloads for detected splits/dividends per run (0 = detect only)",
+    )
+
+    p_daily.add_argument(
+        "--usage-db",
+        default=None,
+        help="API view counts (usage.db) for most-viewed-first ordering; default: USAGE_DB_PATH",
+    )
+
+    p_daily.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="minutes: stop taking new batches before this runs out (in-flight work is written, "
+        "leftovers are checkpointed and go first next run)",
+    )
+
+    p_plan = sub.add_parser("plan", help="dry-run the incremental daily refresh (no network calls)")
+    p_plan.add_argument("--days", type=int, default=7)
+    p_plan.add_argument("--overlap-days", type=int, default=5)
+    p_plan.add_argument("--limit", type=int, default=None)
+    p_plan.add_argument("--offset", type=int, default=0)
+    p_plan.add_argument("--out", default=None, help="write the (market, symbol, start, end) list to this CSV")
+    p_plan.add_argument("--usage-db", default=None, help="API view counts for most-viewed-first ordering")
+
+    p_daily.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="split the symbols into N deterministic slices (crc32), one worker per slice",
+    )
+    p_daily.add_argument(
+        "--shard-index",
+        type=int,
+        default=None,
+        help="run only slice i against this DB (one machine per shard; fold back with 'merge'). "
+        "Without it, --shards N runs N local processes on staging copies and merges them",
+    )
+    p_daily.add_argument("--staging-dir", default=str(DATA_DIR / "shards"), help="where local shard copies go")
+
+    p_merge = sub.add_parser("merge", help="fold finished shard staging DBs into the market DB")
+    p_merge.add_argument("paths", nargs="+", help="staging .db files from 'daily --shards N --shard-index i'")
+
+    p_compact = sub.add_parser(
+        "compact",
+        help="convert daily_bars to the compact WITHOUT ROWID layout (daily_bars stays as a view)",
+    )
+    p_compact.add_argument("--revert", action="store_true", help="convert a compact DB back to the legacy table")
+
+    sub.add_parser("cache", help="rebuild the columnar price cache the API reads (services/price_cache.py)")
+
+    p_bhav = sub.add_parser("bhavcopy", help="bulk-load NSE bhavcopy file(s) into the India DB")
+    p_bhav.add_argument("path", help="a bhavcopy .csv/.zip or a directory of them")
+    p_bhav.add_argument("--series", default="EQ", help="comma-separated series to keep ('' = all)")
+    p_bhav.add_argument("--known-only", action="store_true", help="only symbols already in the symbols table")
+
+    p_import = sub.add_parser("import", help="bulk-load EOD history from local CSV/Parquet flat files")
+    p_import.add_argument("path", help="a .csv/.csv.gz/.parquet file or a directory of them")
+    p_import.add_argument("--format", choices=["csv", "parquet"], default=None, help="default: by file extension")
+    p_import.add_argument("--chunk-rows", type=int, default=500_000)
+    p_import.add_argument("--known-only", action="store_true", help="only tickers that map to the symbols table")
+    p_import.add_argument("--source", default="flatfile", help="value stored in daily_bars.source")
+    p_import.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="drop secondary daily_bars indexes during the load and rebuild them at the end",
+    )
 
     args = parser.parse_args()
 
+    # one wall-clock deadline shared by every market/shard process
+    time_budget = getattr(args, "time_budget", None)
+    args.deadline = time.time() + max(time_budget, 0) * 60 if time_budget is not None else None
+
     markets = ["INDIA", "US"] if args.market == "ALL" else [args.market]
 
+    if args.cmd == "merge" and len(markets) > 1:
+        parser.error("merge needs a single --market (staging DBs are per market)")
+    if args.cmd == "daily" and args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+        parser.error("--shard-index must be in [0, --shards)")
+
+    if args.cmd == "bhavcopy":
+        if "INDIA" not in markets:
+            parser.error("bhavcopy only applies to --market INDIA")
+        markets = ["INDIA"]
+
     if "INDIA" in markets:
         Base.metadata.create_all(bind=engine_in)
     if "US" in markets:
         Base.metadata.create_all(bind=engine_us)
 
-    for m in markets:
-        db = get_session_by_market(m)
-        try:
-            if args.cmd == "universe":
-                print(f"[universe] market={m}")
-                load_universe(db, market=m)
-
-            elif args.cmd == "backfill":
-                print(f"[backfill] market={m} years={args.years} limit={args.limit} offset={args.offset}")
-                run_backfill(db, market=m, years=args.years, limit=args.limit, offset=args.offset)
+    try:
+        results = _run_markets(args, markets)
+    finally:
+        # jobs engines run in WAL mode; leave self-contained .db files for the snapshot upload
+        for m in markets:
+            release_engine(get_engine_by_market(m))
 
-            elif args.cmd == "daily":
-                print(f"[daily] market={m} days={args.days} limit={args.limit} offset={args.offset}")
-                run_daily_refresh(db, market=m, days=args.days, limit=args.limit, offset=args.offset)
+    print(f"[summary] cmd={args.cmd} parallel={bool(args.parallel and len(markets) > 1)}")
+    for r in results:
+        line = f"[summary] market={r['market']} status={r['status']} secs={r['secs']:.1f}"
+        if r.get("result") is not None:
+            line += f" result={r['result']}"
+        if r.get("error"):
+            line += f" error={r['error']}"
+        print(line)
 
-        finally:
-            db.close()
+    if any(r["status"] != "ok" for r in results):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,19 @@
 import os
 from apscheduler.schedulers.background import BackgroundScheduler
+from .db import DATA_DIR
 from .jobs import refresh_all_watchlist
+from .utils.r2_sync import sync_all_latest_dbs
+
+# poll R2 for a new daily snapshot; the API switches to it without a restart (0 = off)
+SNAPSHOT_SYNC_MINUTES = int(os.getenv("SNAPSHOT_SYNC_MINUTES", "60"))
+
+
+def sync_snapshots():
+    try:
+        sync_all_latest_dbs(local_data_dir=str(DATA_DIR), daily_guard=False)
+    except Exception as e:
+        print(f"[scheduler] snapshot sync failed: {e}")
+
 
 def start_scheduler():
     # Disable scheduler unless explicitly enabled
@@ -11,5 +24,7 @@ def start_scheduler():
 
     sched = BackgroundScheduler(timezone="America/New_York")
     sched.add_job(refresh_all_watchlist, "cron", hour=2, minute=10)
+    if SNAPSHOT_SYNC_MINUTES > 0:
+        sched.add_job(sync_snapshots, "interval", minutes=SNAPSHOT_SYNC_MINUTES)
     sched.start()
     print("[scheduler] started")
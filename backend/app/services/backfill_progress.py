@@ -0,0 +1,147 @@
+# backend/app/services/backfill_progress.py
+
+from datetime import date, timedelta
+
+from sqlalchemy import delete, func, select
+
+from ..models import BackfillProgress
+from .bar_writer import sql_date
+from .price_loader import _is_rate_limit_msg
+
+
+# Written through BulkBarWriter.execute_many -> same transaction as the bars it describes.
+# Covered range is widened (never shrunk) across attempts. Only symbol-level outcomes
+# (done/empty/failed) count as an attempt; 'retry' (batch errors, throttling) does not, so a
+# few rate-limited runs can't push valid symbols past max_attempts.
+UPSERT_PROGRESS_SQL = """
+INSERT INTO backfill_progress (symbol, state, requested_from, start_date, end_date, rows, attempts, last_error, updated_at)
+VALUES (?1, ?2, ?3, ?4, ?5, ?6, CASE WHEN ?2 = 'retry' THEN 0 ELSE 1 END, ?7, CURRENT_TIMESTAMP)
+ON CONFLICT(symbol) DO UPDATE SET
+    state = excluded.state,
+    requested_from = CASE
+        WHEN excluded.state = 'done' THEN excluded.requested_from
+        ELSE backfill_progress.requested_from
+    END,
+    start_date = min(coalesce(backfill_progress.start_date, excluded.start_date),
+                     coalesce(excluded.start_date, backfill_progress.start_date)),
+    end_date = max(coalesce(backfill_progress.end_date, excluded.end_date),
+                   coalesce(excluded.end_date, backfill_progress.end_date)),
+    rows = coalesce(excluded.rows, backfill_progress.rows),
+    attempts = backfill_progress.attempts + excluded.attempts,
+    last_error = excluded.last_error,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def batch_coverage(cols: dict[str, list]) -> dict[str, tuple[date, date, int]]:
+    """
+    symbol -> (first_date, last_date, rows) over real bars (close not NULL) of one batch.
+    """
+    out: dict[str, list] = {}
+    for sym, d, close in zip(cols.get("symbol") or [], cols.get("date") or [], cols.get("close") or []):
+        if close is None:
+            continue
+        cur = out.get(sym)
+        if cur is None:
+            out[sym] = [d, d, 1]
+        else:
+            if d < cur[0]:
+                cur[0] = d
+            if d > cur[1]:
+                cur[1] = d
+            cur[2] += 1
+    return {s: (v[0], v[1], v[2]) for s, v in out.items()}
+
+
+# reason recorded for symbols price_loader can't turn into a Yahoo ticker (never requested)
+UNMAPPABLE_MSG = "unmappable: no Yahoo ticker"
+
+
+def progress_params(item: dict) -> list[tuple]:
+    """
+    Checkpoint rows for one pipeline item (see price_loader._run_batches on_batch).
+    """
+    requested_from = sql_date(item["start"])
+    err = item.get("error")
+    unmappable = set(item.get("unmappable") or ())
+
+    params = [
+        (s, "failed", requested_from, None, None, None, UNMAPPABLE_MSG) for s in item["symbols"] if s in unmappable
+    ]
+    symbols = [s for s in item["symbols"] if s not in unmappable]
+
+    if err is not None:
+        # download/write failure of the whole batch: says nothing about the symbols
+        msg = str(err)[:500]
+        return params + [(s, "retry", requested_from, None, None, None, msg) for s in symbols]
+
+    coverage = batch_coverage(item.get("cols") or {})
+    yf_errors = item.get("yf_errors") or {}
+    for s in symbols:
+        cov = coverage.get(s)
+        if cov is None:
+            msg = yf_errors.get(s, "no data returned")[:500]
+            state = "retry" if _is_rate_limit_msg(msg) else "empty"
+            params.append((s, state, requested_from, None, None, 0, msg))
+        else:
+            first, last, n = cov
+            params.append((s, "done", requested_from, sql_date(first), sql_date(last), n, None))
+    return params
+
+
+def record_batch(writer, item: dict) -> None:
+    """on_batch hook for backfill_symbols."""
+    writer.execute_many(UPSERT_PROGRESS_SQL, progress_params(item))
+
+
+def pending_symbols(
+    db,
+    symbols: list[str],
+    requested_from: date,
+    max_attempts: int = 3,
+    slack_days: int = 31,
+) -> list[str]:
+    """
+    Symbols that still need a backfill, in the caller's order:
+      - never attempted
+      - done, but for a window starting more than `slack_days` after `requested_from`
+        (the window start moves forward daily; that alone shouldn't re-trigger a backfill)
+      - retry (batch error / throttled), or empty/failed with attempts < max_attempts
+    """
+    cutoff = requested_from + timedelta(days=slack_days)
+    rows = db.execute(
+        select(
+            BackfillProgress.symbol,
+            BackfillProgress.state,
+            BackfillProgress.requested_from,
+            BackfillProgress.attempts,
+        )
+    ).all()
+    progress = {r[0]: r for r in rows}
+
+    out = []
+    for s in symbols:
+        p = progress.get(s)
+        if p is None:
+            out.append(s)
+            continue
+        _, state, req_from, attempts = p
+        if state == "done":
+            if req_from is None or req_from > cutoff:
+                out.append(s)
+        elif (attempts or 0) < max_attempts:
+            out.append(s)
+    return out
+
+
+def reset_progress(db) -> int:
+    n = db.execute(delete(BackfillProgress)).rowcount
+    db.commit()
+    return n
+
+
+def progress_summary(db) -> dict[str, int]:
+    rows = db.execute(
+        select(BackfillProgress.state, func.count()).group_by(BackfillProgress.state)
+    ).all()
+    return {state: n for state, n in rows}
@@ -0,0 +1,136 @@
+# backend/app/services/bar_quality.py
+#
+# Ingest-time quality gate for daily bars, between normalization and the upsert.
+# Every rule is a numpy expression over the whole batch; clean batches pass through untouched.
+#
+#   empty        no close (yfinance placeholder rows for dates a ticker didn't trade) -> dropped
+#   non_positive open/high/low/close <= 0                                            -> quarantined
+#   high_low     high < low                                                           -> quarantined
+#   neg_volume   volume < 0                                                           -> quarantined
+#   spike        close jumps >= SPIKE_RATIO x (or <= 1/x) vs. the previous bar and
+#                back vs. the next one (or is the newest bar)                        -> quarantined
+
+import numpy as np
+
+from .bar_writer import sql_date
+
+
+SPIKE_RATIO = 50.0
+
+REASONS = ("non_positive", "high_low", "neg_volume", "spike")
+
+# Re-seen bad bars (the daily overlap) update the existing entry instead of piling up.
+# Params: (symbol, date, open, high, low, close, adj_close, volume, source, reason)
+QUARANTINE_SQL = """
+INSERT INTO bar_quarantine (symbol, date, open, high, low, close, adj_close, volume, source, reason,
+                            times_seen, first_seen_at, last_seen_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+ON CONFLICT(symbol, date) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    adj_close = excluded.adj_close,
+    volume = excluded.volume,
+    source = excluded.source,
+    reason = excluded.reason,
+    times_seen = bar_quarantine.times_seen + 1,
+    last_seen_at = CURRENT_TIMESTAMP
+"""
+
+_COLUMNS = ("symbol", "date", "open", "high", "low", "close", "adj_close", "volume", "source")
+
+
+def _floats(values) -> np.ndarray:
+    return np.array(values, dtype=float)  # None -> nan
+
+
+def _spikes(sym: np.ndarray, close: np.ndarray, spike_ratio: float = SPIKE_RATIO) -> np.ndarray:
+    """
+    Isolated close jumps within each symbol's run of rows (rows are ticker-major, date-sorted,
+    as produced by price_loader._normalize_yf_columns).
+    """
+    n = len(close)
+    if n < 2:
+        return np.zeros(n, dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = close[1:] / close[:-1]
+    same = sym[1:] == sym[:-1]
+    jump = same & ((ratio >= spike_ratio) | (ratio <= 1.0 / spike_ratio))
+
+    # row i jumped vs. row i-1 ...
+    jump_in = np.concatenate(([False], jump))
+    # ... and jumps back vs. row i+1 (or has no successor in its symbol)
+    jump_out = np.concatenate((jump, [False]))
+    has_next = np.concatenate((same, [False]))
+    return jump_in & (jump_out | ~has_next)
+
+
+class QualityGate:
+    """
+    Per-run gate: check(cols) -> (clean_cols, quarantine_params). Counters accumulate in .stats.
+    """
+
+    def __init__(self, spike_ratio: float = SPIKE_RATIO):
+        self.spike_ratio = spike_ratio
+        self.stats = {"checked": 0, "passed": 0, "empty": 0, "quarantined": 0}
+        self.stats.update({r: 0 for r in REASONS})
+
+    def check(self, cols: dict[str, list]) -> tuple[dict[str, list], list[tuple]]:
+        n = len(cols.get("symbol") or [])
+        self.stats["checked"] += n
+        if n == 0:
+            return cols, []
+
+        o, h, l, c = (_floats(cols[k]) for k in ("open", "high", "low", "close"))
+        v = _floats(cols["volume"])
+        sym = np.asarray(cols["symbol"], dtype=object)
+
+        empty = np.isnan(c)
+        with np.errstate(invalid="ignore"):
+            ohlc = np.column_stack((o, h, l, c))
+            reasons = {
+                "non_positive": (ohlc <= 0).any(axis=1),
+                "high_low": h < l,
+                "neg_volume": v < 0,
+            }
+        # spikes are judged on real bars only, so placeholder rows don't split a symbol's run
+        real = ~empty
+        spike = np.zeros(n, dtype=bool)
+        spike[real] = _spikes(sym[real], c[real], self.spike_ratio)
+        reasons["spike"] = spike
+
+        bad = np.zeros(n, dtype=bool)
+        reason_of = np.empty(n, dtype=object)
+        for name in REASONS:
+            hit = reasons[name] & ~bad & ~empty
+            reason_of[hit] = name
+            bad |= hit
+            self.stats[name] += int(hit.sum())
+
+        n_empty, n_bad = int(empty.sum()), int(bad.sum())
+        self.stats["empty"] += n_empty
+        self.stats["quarantined"] += n_bad
+        self.stats["passed"] += n - n_empty - n_bad
+
+        if not n_empty and not n_bad:
+            return cols, []
+
+        keep = ~(empty | bad)
+        clean = {k: [x for x, ok in zip(vals, keep) if ok] for k, vals in cols.items()}
+
+        quarantine = []
+        for i in np.flatnonzero(bad):
+            row = [cols[k][i] for k in _COLUMNS]
+            row[1] = sql_date(row[1])
+            quarantine.append((*row, reason_of[i]))
+        return clean, quarantine
+
+    def summary(self) -> str:
+        s = self.stats
+        reasons = " ".join(f"{r}={s[r]}" for r in REASONS if s[r])
+        return (
+            f"checked={s['checked']} passed={s['passed']} empty={s['empty']} "
+            f"quarantined={s['quarantined']}" + (f" ({reasons})" if reasons else "")
+        )
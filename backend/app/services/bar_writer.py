@@ -0,0 +1,277 @@
+# backend/app/services/bar_writer.py
+
+from datetime import date, datetime
+import os
+import time
+
+from .compact_bars import (
+    COMPACT_INSERT_SQL,
+    COMPACT_UPDATE_SQL,
+    CompactIds,
+    is_compact,
+)
+
+
+# Page cache for job writers (KiB). daily_bars carries several indexes; keeping their hot
+# pages in memory is what makes large imports fast.
+BULK_CACHE_KIB = int(os.getenv("BULK_CACHE_KIB", "262144"))
+
+# Column order of the prepared statement (and of the column dicts from price_loader)
+BAR_COLUMNS = ("symbol", "date", "open", "high", "low", "close", "adj_close", "volume", "source")
+
+# A stored bar is only rewritten when open/high/low/close/adj_close/volume differ; an identical
+# re-download leaves the row (and its updated_at) untouched, so the nightly overlap window
+# doesn't churn the WAL or the R2 snapshot.
+UPSERT_BARS_SQL = """
+INSERT INTO daily_bars (symbol, date, open, high, low, close, adj_close, volume, source)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol, date) DO UPDATE SET
+    open = excluded.open,
+    high = excluded.high,
+    low = excluded.low,
+    close = excluded.close,
+    adj_close = excluded.adj_close,
+    volume = excluded.volume,
+    source = excluded.source,
+    updated_at = CURRENT_TIMESTAMP
+WHERE daily_bars.open IS NOT excluded.open
+   OR daily_bars.high IS NOT excluded.high
+   OR daily_bars.low IS NOT excluded.low
+   OR daily_bars.close IS NOT excluded.close
+   OR daily_bars.adj_close IS NOT excluded.adj_close
+   OR daily_bars.volume IS NOT excluded.volume
+"""
+
+# Insert-only: bars already stored are left alone. For sources without adjusted prices
+# (e.g. NSE bhavcopy), which must not overwrite Yahoo's split/dividend-adjusted OHLC.
+INSERT_MISSING_BARS_SQL = """
+INSERT INTO daily_bars (symbol, date, open, high, low, close, adj_close, volume, source)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(symbol, date) DO NOTHING
+"""
+
+def sql_date(d) -> str:
+    """
+    Same text format SQLAlchemy's Date type writes to SQLite (YYYY-MM-DD).
+    """
+    if isinstance(d, datetime):
+        d = d.date()
+    if isinstance(d, date):
+        return d.isoformat()
+    return str(d)[:10]
+
+
+def bar_params(rows) -> list[tuple]:
+    """
+    Build executemany() parameter tuples from either
+      - a column dict {column: list} (price_loader._normalize_yf_columns), or
+      - a list of row dicts.
+    """
+    if isinstance(rows, dict):
+        n = len(rows.get("symbol") or [])
+        cols = [rows.get(c) or [None] * n for c in BAR_COLUMNS]
+        if cols[1] and not isinstance(cols[1][0], str):  # importers may pass ready ISO strings
+            cols[1] = [sql_date(d) for d in cols[1]]
+        return list(zip(*cols))
+
+    out = []
+    for r in rows or []:
+        vals = [r.get(c) for c in BAR_COLUMNS]
+        vals[1] = sql_date(vals[1])
+        out.append(tuple(vals))
+    return out
+
+
+class BulkBarWriter:
+    """
+    Raw sqlite3 bulk upsert path for daily_bars.
+
+    - one prepared INSERT ... ON CONFLICT(symbol, date) DO UPDATE via executemany()
+    - unchanged bars are skipped; inserted / updated / unchanged are counted per writer
+    - one transaction per writer (or per `commit_every` rows)
+    - compact DBs (see compact_bars.py) are written straight into bars_compact: INSERT ... DO
+      NOTHING, then an UPDATE of changed bars, with symbol/source ids cached per writer
+    - optional job tuning: journal_mode=WAL + synchronous=NORMAL while the writer is open,
+      restored (and checkpointed) on close so the .db file stays self-contained for snapshots
+
+    Uses its own pooled DBAPI connection from the session's engine, so callers keep passing
+    their Session unchanged.
+
+        with BulkBarWriter(db, commit_every=50_000, tune=True) as w:
+            w.write(cols)
+        print(w.summary())
+    """
+
+    def __init__(
+        self,
+        db,
+        commit_every: int | None = None,
+        chunk_size: int = 5000,
+        tune: bool = False,
+        label: str = "bulk",
+        upsert_sql: str = UPSERT_BARS_SQL,
+    ):
+        self.commit_every = commit_every
+        self.upsert_sql = upsert_sql
+        self.chunk_size = max(1, int(chunk_size))
+        self.label = label
+
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.commits = 0
+        self.write_secs = 0.0  # time spent inside executemany/commit only
+        self._pending = 0
+        self._t0 = time.perf_counter()
+        self._elapsed = None
+        self._restore_journal = None
+
+        self.conn = db.get_bind().raw_connection()
+        self.cur = self.conn.cursor()
+
+        self.compact = is_compact(self.cur)
+        if self.compact:
+            if upsert_sql not in (UPSERT_BARS_SQL, INSERT_MISSING_BARS_SQL):
+                raise ValueError("custom upsert_sql is not supported on a compact daily_bars layout")
+            self._ids = CompactIds(self.cur)
+            # insert-only writers skip the update pass
+            self._update_sql = COMPACT_UPDATE_SQL if upsert_sql == UPSERT_BARS_SQL else None
+
+        if tune:
+            self._tune()
+
+    # ---------- setup / teardown ----------
+    def _tune(self):
+        try:
+            prev = self.cur.execute("PRAGMA journal_mode").fetchone()[0]
+            mode = self.cur.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if str(mode).lower() == "wal" and str(prev).lower() != "wal":
+                self._restore_journal = prev
+            self.cur.execute("PRAGMA synchronous=NORMAL")
+            self.cur.execute(f"PRAGMA cache_size=-{BULK_CACHE_KIB}")
+        except Exception as e:
+            print(f"[{self.label}] could not apply WAL/synchronous pragmas: {e}")
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.commit()
+            if self._restore_journal:
+                try:
+                    self.cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    self.cur.execute(f"PRAGMA journal_mode={self._restore_journal}")
+                except Exception as e:
+                    # another connection still has the file open; data is committed either way
+                    print(f"[{self.label}] left journal_mode=WAL ({e})")
+        finally:
+            self._elapsed = time.perf_counter() - self._t0
+            self.cur.close()
+            self.conn.close()  # back to the pool
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.rollback()
+        self.close()
+        return False
+
+    # ---------- writes ----------
+    def write(self, rows) -> int:
+        params = bar_params(rows)
+        if not params:
+            return 0
+
+        t0 = time.perf_counter()
+        if self.compact:
+            inserted, updated = self._write_compact(params)
+        else:
+            inserted, updated = self._write_rowid(params)
+        self.write_secs += time.perf_counter() - t0
+
+        n = len(params)
+        self.rows += n
+        self.inserted += inserted
+        self.updated += updated
+        self._pending += n
+
+        if self.commit_every and self._pending >= self.commit_every:
+            self.commit()
+
+        return n
+
+    def _write_rowid(self, params: list[tuple]) -> tuple[int, int]:
+        # rowids only grow, so rows above the pre-write max are this call's inserts;
+        # executemany's rowcount counts inserts + updates that passed the change check
+        before = self.cur.execute("SELECT COALESCE(MAX(rowid), 0) FROM daily_bars").fetchone()[0]
+        changed = 0
+        for i in range(0, len(params), self.chunk_size):
+            self.cur.executemany(self.upsert_sql, params[i:i + self.chunk_size])
+            changed += max(self.cur.rowcount, 0)
+        inserted = self.cur.execute("SELECT COUNT(*) FROM daily_bars WHERE rowid > ?", (before,)).fetchone()[0]
+        return inserted, max(changed - inserted, 0)
+
+    def _write_compact(self, params: list[tuple]) -> tuple[int, int]:
+        compact = self._ids.params(params, int(time.time()))
+        inserted = updated = 0
+        for i in range(0, len(compact), self.chunk_size):
+            chunk = compact[i:i + self.chunk_size]
+            self.cur.executemany(COMPACT_INSERT_SQL, chunk)
+            inserted += max(self.cur.rowcount, 0)
+            if self._update_sql is not None:
+                self.cur.executemany(self._update_sql, chunk)
+                updated += max(self.cur.rowcount, 0)
+        return inserted, updated
+
+    def execute_many(self, sql: str, params: list[tuple]) -> None:
+        """
+        Extra statements (progress/bookkeeping) in the same transaction as the bars,
+        so a crash can never record work whose bars were not committed.
+        """
+        if params:
+            t0 = time.perf_counter()
+            self.cur.executemany(sql, params)
+            self.write_secs += time.perf_counter() - t0
+            self._pending = max(self._pending, 1)
+
+    def rollback(self):
+        """Keep what was already committed; drop the half-written tail."""
+        if self.conn is not None:
+            self.conn.rollback()
+            self._pending = 0
+
+    def commit(self):
+        if self.conn is None or not self._pending:
+            return
+        t0 = time.perf_counter()
+        self.conn.commit()
+        self.write_secs += time.perf_counter() - t0
+        self.commits += 1
+        self._pending = 0
+
+    # ---------- stats ----------
+    @property
+    def elapsed(self) -> float:
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._t0
+
+    @property
+    def rows_per_sec(self) -> float:
+        """Write throughput (excludes time spent downloading between writes)."""
+        return self.rows / self.write_secs if self.write_secs > 0 else 0.0
+
+    @property
+    def unchanged(self) -> int:
+        return max(self.rows - self.inserted - self.updated, 0)
+
+    def counts(self) -> dict[str, int]:
+        return {"inserted": self.inserted, "updated": self.updated, "unchanged": self.unchanged}
+
+    def summary(self) -> str:
+        return (
+            f"[{self.label}] rows={self.rows} inserted={self.inserted} updated={self.updated} "
+            f"unchanged={self.unchanged} commits={self.commits} "
+            f"wall={self.elapsed:.1f}s write={self.write_secs:.2f}s rows/s={self.rows_per_sec:,.0f}"
+        )
@@ -0,0 +1,165 @@
+# backend/app/services/bhavcopy_loader.py
+#
+# Bulk-load NSE daily bhavcopy files into daily_bars (India DB).
+# One file = OHLCV for the whole exchange on one date, instead of thousands of Yahoo calls.
+#
+# Supported layouts (auto-detected from the header; .csv or zipped .csv):
+#   - legacy   cmDDMMMYYYYbhav.csv              SYMBOL, SERIES, OPEN, HIGH, LOW, CLOSE, TOTTRDQTY, TIMESTAMP
+#   - full     sec_bhavdata_full_DDMMYYYY.csv   SYMBOL, SERIES, DATE1, OPEN_PRICE, ..., CLOSE_PRICE, TTL_TRD_QNTY
+#   - UDiFF    BhavCopy_NSE_CM_0_0_0_YYYYMMDD_F_0000.csv
+#                                               TckrSymb, SctySrs, TradDt, OpnPric, ..., ClsPric, TtlTradgVol
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from ..models import Symbol
+from .bar_writer import INSERT_MISSING_BARS_SQL, BulkBarWriter
+from .price_loader import _nan_to_none
+
+
+SOURCE = "bhavcopy"
+
+# our column -> accepted header names (first match wins)
+_ALIASES = {
+    "symbol": ("SYMBOL", "TckrSymb"),
+    "series": ("SERIES", "SctySrs"),
+    "date": ("TIMESTAMP", "DATE1", "TradDt"),
+    "open": ("OPEN", "OPEN_PRICE", "OpnPric"),
+    "high": ("HIGH", "HIGH_PRICE", "HghPric"),
+    "low": ("LOW", "LOW_PRICE", "LwPric"),
+    "close": ("CLOSE", "CLOSE_PRICE", "ClsPric"),
+    "volume": ("TOTTRDQTY", "TTL_TRD_QNTY", "TtlTradgVol"),
+}
+
+_DATE_FORMATS = ("%d-%b-%Y", "%Y-%m-%d", "%d-%m-%Y", "%Y%m%d")
+
+_FILE_PATTERNS = ("*.csv", "*.CSV", "*.zip", "*.ZIP")
+
+
+def _pick_columns(df: pd.DataFrame) -> dict[str, str]:
+    present = {c.strip(): c for c in df.columns}
+    picked = {}
+    for ours, names in _ALIASES.items():
+        for n in names:
+            if n in present:
+                picked[ours] = present[n]
+                break
+    missing = [c for c in ("symbol", "date", "close") if c not in picked]
+    if missing:
+        raise ValueError(f"not a bhavcopy file (missing {missing}); columns={list(df.columns)[:12]}")
+    return picked
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    s = values.astype(str).str.strip()
+    for fmt in _DATE_FORMATS:
+        parsed = pd.to_datetime(s, format=fmt, errors="coerce")
+        if parsed.notna().all():
+            return parsed
+    return pd.to_datetime(s, errors="coerce", dayfirst=True)
+
+
+def _numeric(df: pd.DataFrame, col: str | None) -> np.ndarray:
+    if col is None:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def read_bhavcopy(path: str | Path, series: tuple[str, ...] = ("EQ",)) -> dict[str, list]:
+    """
+    Parse one bhavcopy file into the column dict used by BulkBarWriter.
+    Symbols follow load_india_universe's convention (RELIANCE -> RELIANCE.NS).
+    adj_close is left NULL (bhavcopy prices are unadjusted).
+    """
+    df = pd.read_csv(path, dtype=str, skipinitialspace=True)
+    cols = _pick_columns(df)
+
+    if series and "series" in cols:
+        wanted = {x.upper() for x in series}
+        df = df[df[cols["series"]].str.strip().str.upper().isin(wanted)]
+
+    dates = _parse_dates(df[cols["date"]])
+    sym = df[cols["symbol"]].str.strip()
+    close = _numeric(df, cols["close"])
+
+    keep = (dates.notna() & sym.notna() & (sym != "")).to_numpy() & ~np.isnan(close)
+    df, dates, sym = df[keep], dates[keep], sym[keep]
+
+    n = len(df)
+    return {
+        "symbol": (sym + ".NS").tolist(),
+        "date": list(pd.DatetimeIndex(dates).date),
+        "open": _nan_to_none(_numeric(df, cols.get("open"))),
+        "high": _nan_to_none(_numeric(df, cols.get("high"))),
+        "low": _nan_to_none(_numeric(df, cols.get("low"))),
+        "close": _nan_to_none(_numeric(df, cols["close"])),
+        "adj_close": [None] * n,
+        "volume": _nan_to_none(_numeric(df, cols.get("volume")), as_int=True),
+        "source": [SOURCE] * n,
+    }
+
+
+def find_bhavcopy_files(path: str | Path) -> list[Path]:
+    """A single file, or every csv/zip in a directory (sorted by name)."""
+    p = Path(path)
+    if p.is_file():
+        return [p]
+    if not p.is_dir():
+        raise FileNotFoundError(f"bhavcopy path not found: {p}")
+    files = {f for pat in _FILE_PATTERNS for f in p.glob(pat)}
+    return sorted(files)
+
+
+def _filter_known(cols: dict[str, list], known: set[str]) -> dict[str, list]:
+    keep = [i for i, s in enumerate(cols["symbol"]) if s in known]
+    return {k: [v[i] for i in keep] for k, v in cols.items()}
+
+
+def ingest_bhavcopy(
+    db,
+    path: str | Path,
+    series: tuple[str, ...] = ("EQ",),
+    known_only: bool = False,
+    commit_every: int | None = None,
+) -> int:
+    """
+    Bulk-load one bhavcopy file or a directory of them into daily_bars (source='bhavcopy').
+    known_only=True restricts to symbols already in the symbols table (market INDIA).
+    Only missing (symbol, date) bars are inserted: NSE prices are unadjusted, so bars already
+    stored (Yahoo's adjusted history) are never overwritten (see INSERT_MISSING_BARS_SQL).
+    """
+    files = find_bhavcopy_files(path)
+    print(f"[bhavcopy] files={len(files)} series={','.join(series) or '*'} known_only={known_only}")
+
+    known = None
+    if known_only:
+        known = {r[0] for r in db.execute(select(Symbol.symbol).where(Symbol.market == "INDIA")).all()}
+
+    total = 0
+    with BulkBarWriter(
+        db, commit_every=commit_every, tune=True, label="bhavcopy:write", upsert_sql=INSERT_MISSING_BARS_SQL
+    ) as writer:
+        for i, f in enumerate(files, 1):
+            try:
+                cols = read_bhavcopy(f, series=series)
+            except Exception as e:
+                print(f"[bhavcopy] skip {f.name}: {e}")
+                continue
+
+            if known is not None:
+                cols = _filter_known(cols, known)
+
+            n = writer.write(cols)
+            total += n
+            # one commit per file keeps a directory load restartable file-by-file
+            if commit_every is None:
+                writer.commit()
+
+            if i % 50 == 0 or i == len(files):
+                print(f"[bhavcopy] {i}/{len(files)} files, rows={total}")
+
+    print(writer.summary())
+    return total
@@ -0,0 +1,331 @@
+# backend/app/services/compact_bars.py
+#
+# Optional compact daily-bar layout (run_universe_and_refresh --market X compact).
+#
+#   bars_compact  (symbol_id, day) WITHOUT ROWID: the primary key *is* the table, so a symbol's
+#                 history sits in contiguous pages and there is no separate rowid/index copy
+#   bar_symbols   symbol text <-> small integer id
+#   bar_sources   source text <-> small integer id
+#
+# day = days since 1970-01-01, updated_at = unix seconds. No surrogate id, created_at or
+# secondary indexes (the legacy table carries three overlapping ones).
+#
+# daily_bars becomes a VIEW with the legacy columns, so readers (ORM DailyBar, /api/prices,
+# the workflow's status step) keep working unchanged. Plain INSERT/DELETE on the view go
+# through INSTEAD OF triggers; upserts can't target a view, so the bulk paths (BulkBarWriter,
+# the shard merge, price_service) switch to the statements below when is_compact() is true.
+
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# view id = symbol_id * ID_DAY_SPAN + day (unique, stable, fits ORM identity)
+ID_DAY_SPAN = 100_000
+
+COMPACT_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS bar_symbols (
+      id      INTEGER PRIMARY KEY,
+      symbol  TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bar_sources (
+      id    INTEGER PRIMARY KEY,
+      name  TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bars_compact (
+      symbol_id   INTEGER NOT NULL,
+      day         INTEGER NOT NULL,
+      open        REAL,
+      high        REAL,
+      low         REAL,
+      close       REAL,
+      adj_close   REAL,
+      volume      INTEGER,
+      source_id   INTEGER,
+      updated_at  INTEGER NOT NULL,
+      PRIMARY KEY (symbol_id, day)
+    ) WITHOUT ROWID
+    """,
+)
+
+VIEW_DDL = (
+    f"""
+    CREATE VIEW daily_bars AS
+    SELECT b.symbol_id * {ID_DAY_SPAN} + b.day AS id,
+           s.symbol AS symbol,
+           date(b.day * 86400, 'unixepoch') AS date,
+           b.open AS open,
+           b.high AS high,
+           b.low AS low,
+           b.close AS close,
+           b.adj_close AS adj_close,
+           b.volume AS volume,
+           src.name AS source,
+           datetime(b.updated_at, 'unixepoch') AS created_at,
+           datetime(b.updated_at, 'unixepoch') AS updated_at
+    FROM bars_compact b
+    JOIN bar_symbols s ON s.id = b.symbol_id
+    LEFT JOIN bar_sources src ON src.id = b.source_id
+    """,
+    # insert-or-fill: non-NULL new values win, NULLs keep what is stored
+    """
+    CREATE TRIGGER daily_bars_insert INSTEAD OF INSERT ON daily_bars
+    BEGIN
+      INSERT OR IGNORE INTO bar_symbols (symbol) VALUES (NEW.symbol);
+      INSERT OR IGNORE INTO bar_sources (name) SELECT NEW.source WHERE NEW.source IS NOT NULL;
+      INSERT INTO bars_compact (symbol_id, day, open, high, low, close, adj_close, volume, source_id, updated_at)
+      VALUES (
+        (SELECT id FROM bar_symbols WHERE symbol = NEW.symbol),
+        CAST(julianday(NEW.date) - 2440587.5 AS INTEGER),
+        NEW.open, NEW.high, NEW.low, NEW.close, NEW.adj_close, NEW.volume,
+        (SELECT id FROM bar_sources WHERE name = NEW.source),
+        CAST(strftime('%s', 'now') AS INTEGER)
+      )
+      ON CONFLICT(symbol_id, day) DO UPDATE SET
+        open = COALESCE(excluded.open, bars_compact.open),
+        high = COALESCE(excluded.high, bars_compact.high),
+        low = COALESCE(excluded.low, bars_compact.low),
+        close = COALESCE(excluded.close, bars_compact.close),
+        adj_close = COALESCE(excluded.adj_close, bars_compact.adj_close),
+        volume = COALESCE(excluded.volume, bars_compact.volume),
+        source_id = COALESCE(excluded.source_id, bars_compact.source_id),
+        updated_at = excluded.updated_at;
+    END
+    """,
+    """
+    CREATE TRIGGER daily_bars_delete INSTEAD OF DELETE ON daily_bars
+    BEGIN
+      DELETE FROM bars_compact
+      WHERE symbol_id = (SELECT id FROM bar_symbols WHERE symbol = OLD.symbol)
+        AND day = CAST(julianday(OLD.date) - 2440587.5 AS INTEGER);
+    END
+    """,
+)
+
+# BulkBarWriter, compact layout: two passes over the same (symbol_id, day, open, high, low,
+# close, adj_close, volume, source_id, updated_at) params. The INSERT's rowcount is the
+# inserts; the UPDATE only touches bars whose values changed (fresh inserts never match).
+COMPACT_INSERT_SQL = """
+INSERT INTO bars_compact (symbol_id, day, open, high, low, close, adj_close, volume, source_id, updated_at)
+VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10)
+ON CONFLICT(symbol_id, day) DO NOTHING
+"""
+
+COMPACT_UPDATE_SQL = """
+UPDATE bars_compact SET
+    open = ?3, high = ?4, low = ?5, close = ?6, adj_close = ?7, volume = ?8,
+    source_id = ?9, updated_at = ?10
+WHERE symbol_id = ?1 AND day = ?2
+  AND (open IS NOT ?3 OR high IS NOT ?4 OR low IS NOT ?5 OR close IS NOT ?6
+       OR adj_close IS NOT ?7 OR volume IS NOT ?8)
+"""
+
+# sharding.merge_staging, compact layout: ids are per file, so symbols/sources are matched by name
+COMPACT_MERGE_SQL = (
+    ("bar_symbols", "INSERT OR IGNORE INTO bar_symbols (symbol) SELECT symbol FROM {src}.bar_symbols"),
+    ("bar_sources", "INSERT OR IGNORE INTO bar_sources (name) SELECT name FROM {src}.bar_sources"),
+    (
+        "daily_bars",
+        """
+        INSERT INTO bars_compact (symbol_id, day, open, high, low, close, adj_close, volume, source_id, updated_at)
+        SELECT ts.id, b.day, b.open, b.high, b.low, b.close, b.adj_close, b.volume, tsrc.id, b.updated_at
+        FROM {src}.bars_compact b
+        JOIN {src}.bar_symbols ss ON ss.id = b.symbol_id
+        JOIN bar_symbols ts ON ts.symbol = ss.symbol
+        LEFT JOIN {src}.bar_sources ssrc ON ssrc.id = b.source_id
+        LEFT JOIN bar_sources tsrc ON tsrc.name = ssrc.name
+        WHERE b.updated_at >= CAST(strftime('%s', :since) AS INTEGER)
+        ON CONFLICT(symbol_id, day) DO UPDATE SET
+            open = excluded.open,
+            high = excluded.high,
+            low = excluded.low,
+            close = excluded.close,
+            adj_close = excluded.adj_close,
+            volume = excluded.volume,
+            source_id = excluded.source_id,
+            updated_at = excluded.updated_at
+        """,
+    ),
+)
+
+# symbol -> newest day with a real close, straight off the primary key
+COMPACT_WATERMARKS_SQL = """
+SELECT s.symbol, MAX(b.day) FROM bars_compact b
+JOIN bar_symbols s ON s.id = b.symbol_id
+WHERE b.close IS NOT NULL
+GROUP BY b.symbol_id
+"""
+
+
+def is_compact(cur) -> bool:
+    """True when daily_bars is the compatibility view over bars_compact (raw DBAPI cursor/connection)."""
+    row = cur.execute("SELECT type FROM sqlite_master WHERE name = 'daily_bars'").fetchone()
+    return row is not None and row[0] == "view"
+
+
+def db_is_compact(db) -> bool:
+    """is_compact() for a SQLAlchemy Session/Connection."""
+    row = db.execute(text("SELECT type FROM sqlite_master WHERE name = 'daily_bars'")).fetchone()
+    return row is not None and row[0] == "view"
+
+
+def day_number(d) -> int:
+    """date/datetime/'YYYY-MM-DD...' -> days since 1970-01-01."""
+    if isinstance(d, datetime):
+        d = d.date()
+    if not isinstance(d, date):
+        d = date.fromisoformat(str(d)[:10])
+    return d.toordinal() - EPOCH_ORDINAL
+
+
+def day_to_date(day: int) -> date:
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+class CompactIds:
+    """
+    symbol/source text -> id for one writer connection; unseen names are inserted on demand
+    (in the writer's transaction).
+    """
+
+    def __init__(self, cur):
+        self.cur = cur
+        self.symbols = dict(cur.execute("SELECT symbol, id FROM bar_symbols").fetchall())
+        self.sources = dict(cur.execute("SELECT name, id FROM bar_sources").fetchall())
+
+    def _ensure(self, table: str, column: str, cache: dict, names) -> None:
+        missing = sorted({n for n in names if n is not None and n not in cache})
+        if not missing:
+            return
+        self.cur.executemany(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", [(n,) for n in missing])
+        marks = ",".join("?" * len(missing))
+        cache.update(
+            self.cur.execute(f"SELECT {column}, id FROM {table} WHERE {column} IN ({marks})", missing).fetchall()
+        )
+
+    def params(self, bar_rows: list[tuple], updated_at: int) -> list[tuple]:
+        """bar_writer.bar_params tuples -> COMPACT_INSERT_SQL/COMPACT_UPDATE_SQL tuples."""
+        self._ensure("bar_symbols", "symbol", self.symbols, (r[0] for r in bar_rows))
+        self._ensure("bar_sources", "name", self.sources, (r[8] for r in bar_rows))
+        sym, src = self.symbols, self.sources
+        return [
+            (sym[s], day_number(d), o, h, l, c, a, v, src.get(so), updated_at)
+            for s, d, o, h, l, c, a, v, so in bar_rows
+        ]
+
+
+def compact_database(conn) -> dict[str, int]:
+    """
+    In-place migration of a legacy DB (raw sqlite3 connection): copy daily_bars into
+    bars_compact in primary-key order, replace the table (and its indexes) with the view,
+    then VACUUM to give the space back. Returns {"bars", "symbols", "sources"}.
+    """
+    cur = conn.cursor()
+    if is_compact(cur):
+        raise ValueError("daily_bars is already compact")
+
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        for ddl in COMPACT_DDL:
+            cur.execute(ddl)
+        cur.execute("INSERT OR IGNORE INTO bar_symbols (symbol) SELECT DISTINCT symbol FROM daily_bars ORDER BY symbol")
+        cur.execute(
+            "INSERT OR IGNORE INTO bar_sources (name) "
+            "SELECT DISTINCT source FROM daily_bars WHERE source IS NOT NULL ORDER BY source"
+        )
+        cur.execute(
+            """
+            INSERT INTO bars_compact (symbol_id, day, open, high, low, close, adj_close, volume, source_id, updated_at)
+            SELECT s.id, CAST(julianday(d.date) - 2440587.5 AS INTEGER),
+                   d.open, d.high, d.low, d.close, d.adj_close, d.volume, src.id,
+                   COALESCE(CAST(strftime('%s', d.updated_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+            FROM daily_bars d
+            JOIN bar_symbols s ON s.symbol = d.symbol
+            LEFT JOIN bar_sources src ON src.name = d.source
+            WHERE d.date IS NOT NULL
+            ORDER BY s.id, d.date
+            """
+        )
+        bars = cur.rowcount
+        cur.execute("DROP TABLE daily_bars")
+        for ddl in VIEW_DDL:
+            cur.execute(ddl)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    symbols = cur.execute("SELECT COUNT(*) FROM bar_symbols").fetchone()[0]
+    sources = cur.execute("SELECT COUNT(*) FROM bar_sources").fetchone()[0]
+    cur.execute("VACUUM")
+    cur.close()
+    return {"bars": bars, "symbols": symbols, "sources": sources}
+
+
+def expand_database(conn, create_table_sql: list[str]) -> int:
+    """
+    Reverse migration: drop the view/triggers and rebuild a legacy daily_bars table
+    (create_table_sql: the ORM's CREATE TABLE + CREATE INDEX statements). Returns bars copied.
+    The compact tables are dropped afterwards and the file VACUUMed.
+    """
+    cur = conn.cursor()
+    if not is_compact(cur):
+        raise ValueError("daily_bars is not compact")
+
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("ALTER TABLE bars_compact RENAME TO bars_compact_old")
+        cur.execute("DROP VIEW daily_bars")  # drops its triggers too
+        for sql in create_table_sql:
+            cur.execute(sql)
+        cur.execute(
+            """
+            INSERT INTO daily_bars (symbol, date, open, high, low, close, adj_close, volume, source,
+                                    created_at, updated_at)
+            SELECT s.symbol, date(b.day * 86400, 'unixepoch'), b.open, b.high, b.low, b.close,
+                   b.adj_close, b.volume, src.name,
+                   datetime(b.updated_at, 'unixepoch'), datetime(b.updated_at, 'unixepoch')
+            FROM bars_compact_old b
+            JOIN bar_symbols s ON s.id = b.symbol_id
+            LEFT JOIN bar_sources src ON src.id = b.source_id
+            ORDER BY s.symbol, b.day
+            """
+        )
+        bars = cur.rowcount
+        for table in ("bars_compact_old", "bar_symbols", "bar_sources"):
+            cur.execute(f"DROP TABLE {table}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    cur.execute("VACUUM")
+    cur.close()
+    return bars
+
+
+def migrate(engine, revert: bool = False) -> dict[str, int]:
+    """
+    CLI entry (run_universe_and_refresh compact [--revert]) for one market DB engine.
+    Needs exclusive use of the file: no API process or job should have it open.
+    """
+    from ..models import DailyBar
+
+    conn = engine.raw_connection()
+    try:
+        if revert:
+            table = DailyBar.__table__
+            ddl = [str(CreateTable(table).compile(dialect=engine.dialect))]
+            ddl += [str(CreateIndex(ix).compile(dialect=engine.dialect)) for ix in table.indexes]
+            return {"bars": expand_database(conn, ddl)}
+        return compact_database(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,130 @@
+# backend/app/services/corporate_actions.py
+#
+# Split/dividend detection for the daily refresh.
+# Yahoo rewrites the whole adjusted history on a corporate action, but the daily job only
+# re-downloads a few overlapping days. Comparing those overlapping bars with what is stored
+# shows the rewrite:
+#   - split:    close itself changed (Yahoo's close is split-adjusted)
+#   - dividend: close unchanged, but adj_close/close changed
+# Affected symbols get a 'pending' event and a full-history reload (price_loader.reload_history).
+
+import pandas as pd
+from sqlalchemy import select
+
+from ..models import CorporateActionEvent
+from .backfill_progress import batch_coverage
+from .bar_writer import sql_date
+
+
+# Relative change of close or adj_close/close that counts as a corporate action
+# (0.05%: catches ordinary dividends, ignores float noise)
+ACTION_RATIO_TOLERANCE = 5e-4
+
+# One open event per symbol is enough: the reload fixes everything at once.
+# Params: (symbol, kind, ref_date, close_ratio, adj_ratio, symbol)
+RECORD_EVENT_SQL = """
+INSERT INTO corporate_action_events (symbol, kind, ref_date, close_ratio, adj_ratio, state, detected_at)
+SELECT ?, ?, ?, ?, ?, 'pending', CURRENT_TIMESTAMP
+WHERE NOT EXISTS (
+    SELECT 1 FROM corporate_action_events WHERE symbol = ? AND state = 'pending'
+)
+"""
+
+MARK_RELOADED_SQL = """
+UPDATE corporate_action_events SET state = 'reloaded', reloaded_at = CURRENT_TIMESTAMP
+WHERE symbol = ? AND state = 'pending'
+"""
+
+
+def _stored_bars(cur, symbols: list[str], start: str, end: str) -> pd.DataFrame:
+    marks = ",".join("?" * len(symbols))
+    rows = cur.execute(
+        f"""
+        SELECT symbol, date, close, adj_close FROM daily_bars
+        WHERE symbol IN ({marks}) AND date BETWEEN ? AND ?
+        """,
+        (*symbols, start, end),
+    ).fetchall()
+    return pd.DataFrame(rows, columns=["symbol", "date", "close_old", "adj_old"])
+
+
+def detect_actions(cur, cols: dict[str, list], tol: float = ACTION_RATIO_TOLERANCE) -> list[tuple]:
+    """
+    Compare an incoming column dict with the stored bars it overlaps (before it is written).
+    Looks at each symbol's *oldest* overlapping bar: a corporate action rewrites all history,
+    while a late fix of the newest (possibly partial) bar does not reach it.
+    Returns [(symbol, kind, ref_date, close_ratio, adj_ratio)].
+    """
+    if not cols or not cols.get("symbol"):
+        return []
+
+    new = pd.DataFrame({
+        "symbol": cols["symbol"],
+        "date": [sql_date(d) for d in cols["date"]],
+        "close": pd.to_numeric(pd.Series(cols["close"], dtype=object), errors="coerce"),
+        "adj_close": pd.to_numeric(pd.Series(cols["adj_close"], dtype=object), errors="coerce"),
+    }).dropna()
+    if new.empty:
+        return []
+
+    stored = _stored_bars(cur, sorted(new["symbol"].unique()), new["date"].min(), new["date"].max())
+    m = new.merge(stored, on=["symbol", "date"]).dropna()
+    m = m[(m["close"] > 0) & (m["close_old"] > 0) & (m["adj_old"] > 0)]
+    if m.empty:
+        return []
+
+    m = m.sort_values("date").groupby("symbol", sort=False).head(1)
+    close_ratio = m["close"] / m["close_old"]
+    adj_ratio = (m["adj_close"] / m["close"]) / (m["adj_old"] / m["close_old"])
+
+    split = (close_ratio - 1).abs() > tol
+    dividend = ~split & ((adj_ratio - 1).abs() > tol)
+    hit = split | dividend
+
+    return [
+        (sym, "split" if is_split else "dividend", d, float(cr), float(ar))
+        for sym, d, cr, ar, is_split in zip(
+            m["symbol"][hit], m["date"][hit], close_ratio[hit], adj_ratio[hit], split[hit]
+        )
+    ]
+
+
+def make_action_detector(tol: float = ACTION_RATIO_TOLERANCE):
+    """
+    before_write hook for the daily refresh: records detected events in the same transaction
+    as the batch's bars. .stats counts splits/dividends seen this run.
+    """
+    stats = {"split": 0, "dividend": 0}
+
+    def _hook(writer, item):
+        events = detect_actions(writer.cur, item.get("cols") or {}, tol=tol)
+        writer.execute_many(RECORD_EVENT_SQL, [(*e, e[0]) for e in events])
+        for sym, kind, d, cr, ar in events:
+            stats[kind] += 1
+            print(f"[actions] {sym}: {kind} at {d} close_ratio={cr:.4f} adj_ratio={ar:.4f}")
+
+    _hook.stats = stats
+    return _hook
+
+
+def mark_reloaded(writer, item) -> None:
+    """on_batch hook for reload_history: close the events of symbols whose bars came back."""
+    if item.get("error") is not None:
+        return
+    covered = batch_coverage(item.get("cols") or {})
+    writer.execute_many(MARK_RELOADED_SQL, [(s,) for s in item["symbols"] if s in covered])
+
+
+def pending_action_symbols(db, limit: int | None = None) -> list[str]:
+    """Symbols with an open event, oldest detection first."""
+    try:
+        q = (
+            select(CorporateActionEvent.symbol)
+            .where(CorporateActionEvent.state == "pending")
+            .order_by(CorporateActionEvent.detected_at.asc(), CorporateActionEvent.id.asc())
+        )
+        if limit is not None:
+            q = q.limit(limit)
+        return [r[0] for r in db.execute(q).all()]
+    except Exception:
+        return []  # old snapshot without the table
@@ -0,0 +1,137 @@
+# backend/app/services/download_pipeline.py
+
+import queue
+import threading
+import time
+
+
+_DONE = object()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up when the pipeline is stopping (backpressure without deadlock).
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(
+    batches,
+    fetch,
+    normalize,
+    write,
+    sleep_s=0.0,
+    queue_size: int = 2,
+    tag: str = "pipeline",
+) -> dict:
+    """
+    Bounded 3-stage pipeline:
+
+        fetch thread  --q1-->  normalize thread  --q2-->  write (calling thread)
+
+    - batches: iterable of dicts (each is one download unit, e.g. {"symbols", "start", "end"})
+    - fetch(item): network call; sets item["df"]. Rate-limit sleep (`sleep_s`, a float or a
+      callable returning the current delay) applies only here.
+    - normalize(item): sets item["cols"]
+    - write(item): runs on the calling thread, so the SQLite writer connection never changes threads.
+
+    Per-item errors in fetch/normalize are stored in item["error"] and the item still flows to
+    write(), which decides what to record. Queues are bounded (`queue_size`), so a slow writer
+    throttles the fetcher instead of buffering whole markets in memory.
+
+    Returns stage timings {"fetch_s", "normalize_s", "write_s", "items"}.
+    """
+    q1: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    q2: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    stats = {"fetch_s": 0.0, "normalize_s": 0.0, "write_s": 0.0, "items": 0}
+    crashed: list[BaseException] = []
+
+    def _fetch_stage():
+        try:
+            first = True
+            for item in batches:
+                if stop.is_set():
+                    break
+                delay = sleep_s() if callable(sleep_s) else sleep_s
+                if not first and delay > 0:
+                    time.sleep(delay)
+                first = False
+
+                t0 = time.perf_counter()
+                try:
+                    fetch(item)
+                except Exception as e:
+                    item["error"] = e
+                stats["fetch_s"] += time.perf_counter() - t0
+
+                if not _put(q1, item, stop):
+                    break
+        except BaseException as e:  # the batches generator itself failed
+            crashed.append(e)
+            stop.set()
+        finally:
+            _put(q1, _DONE, stop)
+
+    def _normalize_stage():
+        try:
+            while True:
+                item = _get(q1, stop)
+                if item is _DONE:
+                    break
+                if "error" not in item:
+                    t0 = time.perf_counter()
+                    try:
+                        normalize(item)
+                    except Exception as e:
+                        item["error"] = e
+                    stats["normalize_s"] += time.perf_counter() - t0
+                if not _put(q2, item, stop):
+                    break
+        except BaseException as e:
+            crashed.append(e)
+            stop.set()
+        finally:
+            _put(q2, _DONE, stop)
+
+    threads = [
+        threading.Thread(target=_fetch_stage, name=f"{tag}-fetch", daemon=True),
+        threading.Thread(target=_normalize_stage, name=f"{tag}-normalize", daemon=True),
+    ]
+    for t in threads:
+        t.start()
+
+    try:
+        while True:
+            item = _get(q2, stop)
+            if item is _DONE:
+                break
+            t0 = time.perf_counter()
+            write(item)
+            stats["write_s"] += time.perf_counter() - t0
+            stats["items"] += 1
+    finally:
+        # writer failed (or finished): unblock and drain the producer threads
+        stop.set()
+        for t in threads:
+            t.join(timeout=30)
+
+    if crashed:
+        raise crashed[0]
+
+    return stats
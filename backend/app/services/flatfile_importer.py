@@ -0,0 +1,245 @@
+# backend/app/services/flatfile_importer.py
+#
+# Bulk EOD importer: whole-market history from local CSV / Parquet flat files
+# (backfills, disaster recovery) instead of throttled yfinance batches.
+#
+# Expected columns (case/spacing-insensitive aliases):
+#   symbol|ticker, date, open, high, low, close, [adj_close|adj close|adjusted_close], [volume]
+#
+# Files are streamed in chunks; tickers go through price_loader._to_yf_symbol rules
+# (warrants/units/rights dropped, BRK.B ~ BRK-B) and are mapped back to the symbols table.
+
+from pathlib import Path
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from ..models import Symbol
+from .bar_writer import BulkBarWriter
+from .price_loader import _nan_to_none, _to_yf_symbol
+
+
+_ALIASES = {
+    "symbol": ("symbol", "ticker", "sym", "code"),
+    "date": ("date", "timestamp", "day", "tradedate"),
+    "open": ("open",),
+    "high": ("high",),
+    "low": ("low",),
+    "close": ("close",),
+    "adj_close": ("adjclose", "adjustedclose", "adjclosing"),
+    "volume": ("volume", "vol"),
+}
+
+_FILE_PATTERNS = ("*.csv", "*.csv.gz", "*.parquet", "*.pq")
+
+
+def _key(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(name).lower())
+
+
+def _pick_columns(columns) -> dict[str, str]:
+    present = {_key(c): c for c in columns}
+    picked = {}
+    for ours, names in _ALIASES.items():
+        for n in names:
+            if n in present:
+                picked[ours] = present[n]
+                break
+    missing = [c for c in ("symbol", "date", "close") if c not in picked]
+    if missing:
+        raise ValueError(f"flat file is missing {missing}; columns={list(columns)[:12]}")
+    return picked
+
+
+def _file_format(path: Path, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    name = path.name.lower()
+    return "parquet" if name.endswith((".parquet", ".pq")) else "csv"
+
+
+def _iter_chunks(path: Path, fmt: str, chunk_rows: int):
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet import needs pyarrow (pip install pyarrow)") from e
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        # tickers stay text wherever the column is (leading zeros: 000123, 0700.HK)
+        symbol_col = _pick_columns(pd.read_csv(path, nrows=0).columns)["symbol"]
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype={symbol_col: str}, low_memory=False)
+
+
+def find_flat_files(path: str | Path) -> list[Path]:
+    p = Path(path)
+    if p.is_file():
+        return [p]
+    if not p.is_dir():
+        raise FileNotFoundError(f"flat file path not found: {p}")
+    return sorted({f for pat in _FILE_PATTERNS for f in p.glob(pat)})
+
+
+def build_symbol_map(db, market: str | None = None) -> dict[str, str]:
+    """
+    yf-form ticker -> symbols.symbol, so BRK.B / BRK-B in a file both land on the stored BRK.B.
+    """
+    q = select(Symbol.symbol)
+    if market:
+        q = q.where(Symbol.market == market)
+    out = {}
+    for (sym,) in db.execute(q).all():
+        yf_sym = _to_yf_symbol(sym)
+        if yf_sym:
+            out[yf_sym.upper()] = sym
+    return out
+
+
+def _map_tickers(raw: pd.Series, symbol_map: dict[str, str], known_only: bool) -> pd.Series:
+    """
+    Map each *distinct* ticker once (files repeat a ticker thousands of times), then broadcast.
+    Unmappable tickers become NaN and are dropped by validation.
+    """
+    uniq = pd.unique(raw.dropna())
+    mapping = {}
+    for t in uniq:
+        t_str = str(t).strip()
+        yf_sym = _to_yf_symbol(t_str)
+        if not yf_sym:
+            continue
+        known = symbol_map.get(yf_sym.upper())
+        if known:
+            mapping[t] = known
+        elif not known_only:
+            mapping[t] = t_str.upper()
+    return raw.map(mapping)
+
+
+def normalize_chunk(
+    df: pd.DataFrame,
+    symbol_map: dict[str, str],
+    known_only: bool = False,
+    source: str = "flatfile",
+) -> tuple[dict[str, list], int]:
+    """
+    One chunk -> (BulkBarWriter column dict, rejected_rows).
+    A row is kept when it has a mapped symbol, a parseable date and a positive close,
+    and (when both present) high >= low.
+    """
+    cols = _pick_columns(df.columns)
+
+    sym = _map_tickers(df[cols["symbol"]], symbol_map, known_only)
+    dates = pd.to_datetime(df[cols["date"]], errors="coerce")
+    if getattr(dates.dt, "tz", None) is not None:
+        dates = dates.dt.tz_localize(None)
+
+    def num(name):
+        c = cols.get(name)
+        if c is None:
+            return np.full(len(df), np.nan)
+        return pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    o, h, l, c, a, v = num("open"), num("high"), num("low"), num("close"), num("adj_close"), num("volume")
+
+    with np.errstate(invalid="ignore"):
+        ok = sym.notna().to_numpy() & dates.notna().to_numpy() & (c > 0)
+        ok &= ~(~np.isnan(h) & ~np.isnan(l) & (h < l))
+
+    rejected = int(len(df) - ok.sum())
+    n = int(ok.sum())
+
+    out = {
+        "symbol": sym[ok].tolist(),
+        "date": dates[ok].dt.strftime("%Y-%m-%d").tolist(),
+        "open": _nan_to_none(o[ok]),
+        "high": _nan_to_none(h[ok]),
+        "low": _nan_to_none(l[ok]),
+        "close": _nan_to_none(c[ok]),
+        "adj_close": _nan_to_none(a[ok]),
+        "volume": _nan_to_none(v[ok], as_int=True),
+        "source": [source] * n,
+    }
+    return out, rejected
+
+
+def _drop_secondary_indexes(cur) -> list[str]:
+    """
+    Drop daily_bars' plain indexes (keeps the UNIQUE(symbol, date) autoindex ON CONFLICT needs).
+    Returns their DDL so they can be rebuilt once, sorted, after the load.
+    """
+    rows = cur.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='daily_bars' AND sql IS NOT NULL"
+    ).fetchall()
+    for name, _ in rows:
+        cur.execute(f'DROP INDEX IF EXISTS "{name}"')
+    return [sql for _, sql in rows]
+
+
+def _restore_indexes(cur, ddl: list[str]) -> None:
+    for sql in ddl:
+        cur.execute(sql.replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+
+
+def import_flat_files(
+    db,
+    path: str | Path,
+    market: str | None = "US",
+    fmt: str | None = None,
+    chunk_rows: int = 500_000,
+    known_only: bool = False,
+    source: str = "flatfile",
+    commit_every: int | None = 2_000_000,
+    defer_indexes: bool = False,
+) -> dict[str, int]:
+    """
+    Stream CSV/Parquet file(s) into daily_bars through BulkBarWriter.
+    Prints per-chunk progress with rows/s; returns {"rows", "rejected", "files"}.
+
+    defer_indexes=True drops the secondary daily_bars indexes for the load and rebuilds them at
+    the end (roughly doubles insert throughput on large loads; readers lose those indexes meanwhile).
+    """
+    files = find_flat_files(path)
+    symbol_map = build_symbol_map(db, market)
+    print(f"[import] files={len(files)} known_symbols={len(symbol_map)} chunk_rows={chunk_rows} known_only={known_only}")
+
+    totals = {"rows": 0, "rejected": 0, "files": 0}
+    t0 = time.perf_counter()
+
+    with BulkBarWriter(db, commit_every=commit_every, chunk_size=50_000, tune=True, label="import:write") as writer:
+        deferred = _drop_secondary_indexes(writer.cur) if defer_indexes else []
+        try:
+            for f in files:
+                f_fmt = _file_format(f, fmt)
+                try:
+                    for chunk in _iter_chunks(f, f_fmt, chunk_rows):
+                        cols, rejected = normalize_chunk(chunk, symbol_map, known_only=known_only, source=source)
+                        totals["rows"] += writer.write(cols)
+                        totals["rejected"] += rejected
+
+                        secs = time.perf_counter() - t0
+                        print(
+                            f"[import] {f.name}: rows={totals['rows']:,} rejected={totals['rejected']:,} "
+                            f"elapsed={secs:.1f}s rate={totals['rows'] / max(secs, 1e-9):,.0f} rows/s"
+                        )
+                except (ValueError, RuntimeError) as e:
+                    print(f"[import] skip {f.name}: {e}")
+                    continue
+                totals["files"] += 1
+        except BaseException:
+            writer.rollback()  # keep committed chunks only; the index rebuild must not commit the tail
+            raise
+        finally:
+            if deferred:
+                writer.commit()
+                t_idx = time.perf_counter()
+                _restore_indexes(writer.cur, deferred)
+                writer.conn.commit()
+                print(f"[import] rebuilt {len(deferred)} indexes in {time.perf_counter() - t_idx:.1f}s")
+
+    print(writer.summary())
+    return totals
@@ -0,0 +1,133 @@
+# backend/app/services/market_calendar.py
+#
+# Local NYSE / NSE trading calendars (no network, no extra deps).
+# Holiday tables are shipped here and need a yearly update: add the next year's list from
+#   NYSE: https://www.nyse.com/markets/hours-calendars
+#   NSE:  "Holidays" circular for the Capital Market segment
+# Dates outside the tables fall back to plain weekdays.
+
+from datetime import date, datetime, time, timedelta, timezone
+
+
+NYSE_HOLIDAYS = {
+    # 2024
+    date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29),
+    date(2024, 5, 27), date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2),
+    date(2024, 11, 28), date(2024, 12, 25),
+    # 2025 (Jan 9: national day of mourning)
+    date(2025, 1, 1), date(2025, 1, 9), date(2025, 1, 20), date(2025, 2, 17),
+    date(2025, 4, 18), date(2025, 5, 26), date(2025, 6, 19), date(2025, 7, 4),
+    date(2025, 9, 1), date(2025, 11, 27), date(2025, 12, 25),
+    # 2026
+    date(2026, 1, 1), date(2026, 1, 19), date(2026, 2, 16), date(2026, 4, 3),
+    date(2026, 5, 25), date(2026, 6, 19), date(2026, 7, 3), date(2026, 9, 7),
+    date(2026, 11, 26), date(2026, 12, 25),
+    # 2027
+    date(2027, 1, 1), date(2027, 1, 18), date(2027, 2, 15), date(2027, 3, 26),
+    date(2027, 5, 31), date(2027, 6, 18), date(2027, 7, 5), date(2027, 9, 6),
+    date(2027, 11, 25), date(2027, 12, 24),
+}
+
+NSE_HOLIDAYS = {
+    # 2024
+    date(2024, 1, 22), date(2024, 1, 26), date(2024, 3, 8), date(2024, 3, 25),
+    date(2024, 3, 29), date(2024, 4, 11), date(2024, 4, 17), date(2024, 5, 1),
+    date(2024, 5, 20), date(2024, 6, 17), date(2024, 7, 17), date(2024, 8, 15),
+    date(2024, 10, 2), date(2024, 11, 1), date(2024, 11, 15), date(2024, 11, 20),
+    date(2024, 12, 25),
+    # 2025
+    date(2025, 2, 26), date(2025, 3, 14), date(2025, 3, 31), date(2025, 4, 10),
+    date(2025, 4, 14), date(2025, 4, 18), date(2025, 5, 1), date(2025, 8, 15),
+    date(2025, 8, 27), date(2025, 10, 2), date(2025, 10, 21), date(2025, 10, 22),
+    date(2025, 11, 5), date(2025, 12, 25),
+    # 2026
+    date(2026, 1, 26), date(2026, 3, 3), date(2026, 3, 26), date(2026, 3, 31),
+    date(2026, 4, 3), date(2026, 4, 14), date(2026, 5, 1), date(2026, 5, 28),
+    date(2026, 6, 26), date(2026, 9, 14), date(2026, 10, 2), date(2026, 10, 20),
+    date(2026, 11, 10), date(2026, 11, 24), date(2026, 12, 25),
+}
+
+# Local time after which the day's EOD bar is considered available on Yahoo
+# (official close + a buffer for the data to settle)
+_SETTLE_NY = time(17, 0)   # NYSE closes 16:00 ET
+_SETTLE_IST = time(16, 30)  # NSE closes 15:30 IST
+
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def _calendar(market: str) -> str:
+    m = (market or "US").strip().upper()
+    return "NSE" if m in {"INDIA", "IN", "IND", "NSE"} else "NYSE"
+
+
+def _holidays(market: str) -> set[date]:
+    return NSE_HOLIDAYS if _calendar(market) == "NSE" else NYSE_HOLIDAYS
+
+
+def _us_eastern_offset(d: date) -> timedelta:
+    """
+    EST/EDT without tz databases: DST runs from the 2nd Sunday of March to the 1st Sunday
+    of November (US rule since 2007).
+    """
+    def nth_sunday(year, month, n):
+        first = date(year, month, 1)
+        return first + timedelta(days=(6 - first.weekday()) % 7 + 7 * (n - 1))
+
+    dst_start = nth_sunday(d.year, 3, 2)
+    dst_end = nth_sunday(d.year, 11, 1)
+    return timedelta(hours=-4) if dst_start <= d < dst_end else timedelta(hours=-5)
+
+
+def _local_now(market: str, now_utc: datetime) -> datetime:
+    if _calendar(market) == "NSE":
+        return now_utc.astimezone(_IST)
+    offset = _us_eastern_offset(now_utc.date())
+    return now_utc.astimezone(timezone(offset))
+
+
+def is_session(market: str, d: date) -> bool:
+    return d.weekday() < 5 and d not in _holidays(market)
+
+
+def previous_session(market: str, d: date) -> date:
+    """Last session strictly before d."""
+    d -= timedelta(days=1)
+    while not is_session(market, d):
+        d -= timedelta(days=1)
+    return d
+
+
+def next_session(market: str, d: date) -> date:
+    """First session strictly after d."""
+    d += timedelta(days=1)
+    while not is_session(market, d):
+        d += timedelta(days=1)
+    return d
+
+
+def expected_last_session(market: str, now_utc: datetime | None = None) -> date:
+    """
+    Most recent session whose EOD bar should already exist, given the exchange's local time:
+    today if it's a session and past the settle time, otherwise the previous session.
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    if now_utc.tzinfo is None:
+        now_utc = now_utc.replace(tzinfo=timezone.utc)
+
+    local = _local_now(market, now_utc)
+    today = local.date()
+    settle = _SETTLE_IST if _calendar(market) == "NSE" else _SETTLE_NY
+
+    if is_session(market, today) and local.time() >= settle:
+        return today
+    return previous_session(market, today)
+
+
+def sessions_between(market: str, start: date, end: date) -> int:
+    """Number of sessions in [start, end]."""
+    n, d = 0, start
+    while d <= end:
+        if is_session(market, d):
+            n += 1
+        d += timedelta(days=1)
+    return n
@@ -0,0 +1,329 @@
+# backend/app/services/price_cache.py
+#
+# Columnar, memory-mapped copy of each market's daily_bars for the read-heavy API routes.
+# Built after sync_all_latest_dbs installs a snapshot (or with `run_universe_and_refresh cache`):
+#
+#   price_cache/<us|in>/CURRENT             name of the live version directory
+#   price_cache/<us|in>/<version>/
+#       date.npy                            int32 days since 1970-01-01, sorted within a symbol
+#       open/high/low/close/volume.npy      float64, NaN = NULL
+#       index.json                          {"symbols": [...], "offsets": [...]} (len(symbols) + 1)
+#       meta.json                           rows, source DB size/mtime, build start/time
+#
+# A symbol's bars are one contiguous [offsets[i], offsets[i+1]) slice of every array, so
+# /api/prices and /api/indicators read them as numpy views of the mapped files (no ORM, no copy).
+# New versions are written next to the live one and switched by rewriting CURRENT, so readers
+# never see a half-built cache; symbols refreshed on demand after a version's build started
+# (job_queue) are marked dirty and read from SQLite until a later version includes them.
+# The API builds in the background (ensure_price_cache_background): while no current version
+# matches the DB, routes read SQLite.
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from ..db import DATA_DIR
+from .compact_bars import is_compact
+
+
+PRICE_CACHE_DIR = Path(os.getenv("PRICE_CACHE_DIR", str(DATA_DIR / "price_cache")))
+PRICE_CACHE_ENABLED = os.getenv("PRICE_CACHE", "1") == "1"
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+BUILD_CHUNK_ROWS = 500_000
+
+_lock = threading.Lock()
+_loaded: dict[str, tuple[str, "PriceCache"]] = {}
+_dirty: dict[str, dict[str, float]] = {}  # market key -> {symbol: time.time() of the write}
+_building: set[str] = set()
+
+
+def _market_key(market: str) -> str:
+    m = (market or "US").strip().upper()
+    return "in" if m in {"INDIA", "IN", "IND", "NSE"} else "us"
+
+
+def _db_stamp(db_path: str | Path) -> dict:
+    st = os.stat(db_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_current(root: Path) -> str | None:
+    try:
+        return (root / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ============================================================
+# Build
+# ============================================================
+def _bars_queries(con) -> tuple[str, str]:
+    """(row count, bars ordered by symbol then day) for the DB's daily_bars layout."""
+    if is_compact(con):
+        # clustered key order: no sort needed
+        return (
+            "SELECT COUNT(*) FROM bars_compact",
+            """
+            SELECT s.symbol, b.day, b.open, b.high, b.low, b.close, b.volume
+            FROM bars_compact b JOIN bar_symbols s ON s.id = b.symbol_id
+            ORDER BY b.symbol_id, b.day
+            """,
+        )
+    return (
+        "SELECT COUNT(*) FROM daily_bars WHERE date IS NOT NULL",
+        """
+        SELECT symbol, CAST(julianday(date) - 2440587.5 AS INTEGER), open, high, low, close, volume
+        FROM daily_bars WHERE date IS NOT NULL
+        ORDER BY symbol, date
+        """,
+    )
+
+
+def build_price_cache(market: str, db_path: str | Path, cache_dir: str | Path | None = None) -> dict:
+    """
+    Export one market DB into a new cache version and make it current.
+    Returns the version's meta dict.
+    """
+    t0 = time.perf_counter()
+    started_at = time.time()  # writes marked dirty before this are in the export
+    root = Path(cache_dir or PRICE_CACHE_DIR) / _market_key(market)
+    root.mkdir(parents=True, exist_ok=True)
+    version = time.strftime("%Y%m%dT%H%M%S") + f"-{os.getpid()}-{uuid.uuid4().hex[:6]}"  # unique per build
+    tmp = root / f".{version}.tmp"
+    tmp.mkdir()
+
+    stamp = _db_stamp(db_path)
+    con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        count_sql, bars_sql = _bars_queries(con)
+        n = con.execute(count_sql).fetchone()[0]
+        arrays = {"date": np.lib.format.open_memmap(tmp / "date.npy", mode="w+", dtype=np.int32, shape=(n,))}
+        for c in PRICE_COLUMNS:
+            arrays[c] = np.lib.format.open_memmap(tmp / f"{c}.npy", mode="w+", dtype=np.float64, shape=(n,))
+
+        symbols: list[str] = []
+        offsets: list[int] = []
+        pos = 0
+        cur = con.execute(bars_sql)
+        while True:
+            chunk = cur.fetchmany(BUILD_CHUNK_ROWS)
+            if not chunk:
+                break
+            k = min(len(chunk), n - pos)  # rows added since COUNT(*) (shouldn't happen read-only)
+            cols = list(zip(*chunk[:k]))
+
+            sym = np.asarray(cols[0], dtype=object)
+            starts = np.flatnonzero(np.concatenate(([True], sym[1:] != sym[:-1])))
+            for i in starts:
+                if not symbols or symbols[-1] != sym[i]:
+                    symbols.append(sym[i])
+                    offsets.append(pos + int(i))
+
+            arrays["date"][pos:pos + k] = np.asarray(cols[1], dtype=np.int32)
+            for j, c in enumerate(PRICE_COLUMNS, start=2):
+                arrays[c][pos:pos + k] = np.asarray(cols[j], dtype=np.float64)  # None -> NaN
+            pos += k
+        offsets.append(pos)
+    finally:
+        con.close()
+
+    for a in arrays.values():
+        a.flush()
+    del arrays
+
+    meta = {
+        "market": market,
+        "version": version,
+        "rows": pos,
+        "symbols": len(symbols),
+        "source": str(db_path),
+        "source_stamp": stamp,
+        "started_at": started_at,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "build_s": round(time.perf_counter() - t0, 2),
+    }
+    (tmp / "index.json").write_text(json.dumps({"symbols": symbols, "offsets": offsets}), encoding="utf-8")
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    os.replace(tmp, root / version)
+    cur_tmp = root / f"CURRENT.{os.getpid()}.tmp"
+    cur_tmp.write_text(version, encoding="utf-8")
+    os.replace(cur_tmp, root / "CURRENT")
+    _prune(root, keep=version)
+
+    print(f"[price_cache] {market}: {pos} bars / {len(symbols)} symbols -> {root / version} ({meta['build_s']}s)")
+    return meta
+
+
+def _prune(root: Path, keep: str) -> None:
+    """Drop old versions; ones still mapped by a reader (Windows) are retried next build."""
+    for p in root.iterdir():
+        if p.is_dir() and p.name != keep:
+            shutil.rmtree(p, ignore_errors=True)
+
+
+def cache_is_current(market: str, db_path: str | Path, cache_dir: str | Path | None = None) -> bool:
+    root = Path(cache_dir or PRICE_CACHE_DIR) / _market_key(market)
+    version = _read_current(root)
+    if version is None:
+        return False
+    try:
+        meta = json.loads((root / version / "meta.json").read_text(encoding="utf-8"))
+        return meta.get("source_stamp") == _db_stamp(db_path)
+    except (FileNotFoundError, ValueError):
+        return False
+
+
+def ensure_price_cache(market: str, db_path: str | Path, force: bool = False) -> bool:
+    """Rebuild when forced (new snapshot) or when the DB changed since the last build."""
+    if not PRICE_CACHE_ENABLED or not os.path.exists(db_path):
+        return False
+    if not force and cache_is_current(market, db_path):
+        return False
+    build_price_cache(market, db_path)
+    return True
+
+
+def retire_price_cache(market: str, cache_dir: str | Path | None = None) -> None:
+    """Stop serving the current version (it no longer matches the DB): routes read SQLite."""
+    root = Path(cache_dir or PRICE_CACHE_DIR) / _market_key(market)
+    try:
+        os.remove(root / "CURRENT")
+    except FileNotFoundError:
+        pass
+
+
+def ensure_price_cache_background(market: str, db_path: str | Path, force: bool = False) -> threading.Thread | None:
+    """
+    ensure_price_cache on a daemon thread, so API startup and snapshot syncs never wait on the
+    export. A stale version is retired first; routes read SQLite until the new CURRENT is
+    written. Returns the build thread, or None when nothing needs building (or a build for
+    this market is already running; the next sync catches up).
+    """
+    if not PRICE_CACHE_ENABLED or not os.path.exists(db_path):
+        return None
+    if not force and cache_is_current(market, db_path):
+        return None
+    key = _market_key(market)
+    with _lock:
+        if key in _building:
+            return None
+        _building.add(key)
+    retire_price_cache(market)
+
+    def _run():
+        try:
+            build_price_cache(market, db_path)
+        except Exception as e:
+            print(f"[price_cache] {market}: build failed: {e} (routes fall back to SQLite)")
+        finally:
+            with _lock:
+                _building.discard(key)
+
+    t = threading.Thread(target=_run, name=f"price-cache-{key}", daemon=True)
+    t.start()
+    return t
+
+
+# ============================================================
+# Read
+# ============================================================
+class PriceCache:
+    def __init__(self, path: Path):
+        self.path = path
+        idx = json.loads((path / "index.json").read_text(encoding="utf-8"))
+        offs = idx["offsets"]
+        self.index = {s: (offs[i], offs[i + 1]) for i, s in enumerate(idx["symbols"])}
+        self.meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.date = np.load(path / "date.npy", mmap_mode="r")
+        self.cols = {c: np.load(path / f"{c}.npy", mmap_mode="r") for c in PRICE_COLUMNS}
+
+    def columns(self, symbol: str, limit: int | None = None, start=None, end=None) -> dict | None:
+        """
+        Oldest-first views of the symbol's bars (the last `limit` within [start, end]).
+        None if the symbol is not in the cache.
+        """
+        span = self.index.get(symbol)
+        if span is None:
+            return None
+        lo, hi = span
+        dates = self.date[lo:hi]
+        if start is not None:
+            lo += int(np.searchsorted(dates, _day(start), side="left"))
+        if end is not None:
+            hi = span[0] + int(np.searchsorted(dates, _day(end), side="right"))
+        if limit is not None:
+            lo = max(lo, hi - int(limit))
+        lo = min(lo, hi)
+
+        out = {"date": self.date[lo:hi]}
+        out.update({c: a[lo:hi] for c, a in self.cols.items()})
+        return out
+
+
+def _day(d) -> int:
+    return int(np.datetime64(str(d)[:10], "D").astype(np.int64))
+
+
+def columns_to_rows(cols: dict) -> list[dict]:
+    """Same row dicts as price_service.get_prices_from_db (NaN -> None, int volume)."""
+    dates = cols["date"].astype("datetime64[D]").astype(str).tolist()
+    o, h, l, c = ([None if x != x else x for x in cols[k].tolist()] for k in ("open", "high", "low", "close"))
+    v = [None if x != x else int(x) for x in cols["volume"].tolist()]
+    return [
+        {"date": d, "open": o_, "high": h_, "low": l_, "close": c_, "volume": v_}
+        for d, o_, h_, l_, c_, v_ in zip(dates, o, h, l, c, v)
+    ]
+
+
+def get_price_cache(market: str) -> PriceCache | None:
+    """The current cache version for a market (reloaded when CURRENT moves), or None."""
+    if not PRICE_CACHE_ENABLED:
+        return None
+    key = _market_key(market)
+    root = PRICE_CACHE_DIR / key
+    version = _read_current(root)
+    if version is None:
+        return None
+
+    loaded = _loaded.get(key)
+    if loaded is not None and loaded[0] == version:
+        return loaded[1]
+
+    with _lock:
+        loaded = _loaded.get(key)
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        try:
+            cache = PriceCache(root / version)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[price_cache] could not load {root / version}: {e}")
+            return None
+        _loaded[key] = (version, cache)
+        # writes from before this version's export are in it; later ones still need SQLite
+        started = cache.meta.get("started_at")
+        if started is not None and key in _dirty:
+            _dirty[key] = {s: t for s, t in _dirty[key].items() if t >= started}
+        return cache
+
+
+def mark_dirty(market: str, symbol: str) -> None:
+    """Symbol was rewritten in SQLite after the cache was built: serve it from the DB."""
+    with _lock:
+        _dirty.setdefault(_market_key(market), {})[symbol] = time.time()
+
+
+def cached_columns(market: str, symbol: str, limit: int | None = None, start=None, end=None) -> dict | None:
+    """Column views for the routes, or None -> caller reads SQLite."""
+    cache = get_price_cache(market)
+    if cache is None or symbol in _dirty.get(_market_key(market), ()):
+        return None
+    return cache.columns(symbol, limit=limit, start=start, end=end)
@@ -1,12 +1,30 @@
 from datetime import date, timedelta
+import heapq
+import os
 import time
 import random
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
-from sqlalchemy.dialects.sqlite import insert as sqlite_insert
-from sqlalchemy import func  # ✅ important (for updated_at)
+try:
+    from yfinance import shared as yf_shared
+except Exception:  # very old/new yfinance layouts
+    yf_shared = None
+
+from sqlalchemy import func, select, text
+
 from ..models import DailyBar
+from .bar_quality import QUARANTINE_SQL, QualityGate
+from .bar_writer import BAR_COLUMNS, BulkBarWriter
+from .compact_bars import COMPACT_WATERMARKS_SQL, day_to_date, db_is_compact
+from .download_pipeline import run_pipeline
+from .time_budget import DeadlineReached
+from .yf_pacing import load_pacer, save_pacer
+
+
+# Rows per transaction for job writers (None = one transaction per run)
+BULK_COMMIT_EVERY = int(os.getenv("BULK_COMMIT_EVERY", "50000")) or None
 
 
 # --------------------------
@@ -62,11 +80,35 @@ def _build_yf_batch(original_symbols: list[str]):
     return yf_syms, yf_to_orig
 
 
-def _yf_download_with_retry(tickers: list[str], start=None, end=None, max_tries: int = 6):
+def _is_rate_limit_msg(msg: str) -> bool:
+    msg = (msg or "").lower()
+    return (
+        "ratelimit" in msg or "rate limit" in msg or "too many requests" in msg
+        or "crumb" in msg or "unauthorized" in msg or "401" in msg or "429" in msg
+    )
+
+
+def _batch_errors(tickers: list[str]) -> dict[str, str]:
+    """yf symbol -> error message yfinance recorded for it during the last download."""
+    errors = getattr(yf_shared, "_ERRORS", None) or {}
+    return {t: str(errors[t]) for t in tickers if t in errors}
+
+
+def _batch_was_throttled(tickers: list[str]) -> bool:
+    """
+    yf.download() swallows per-ticker failures into yfinance.shared._ERRORS instead of raising;
+    a rate-limit message there means the batch was throttled even though no exception surfaced.
+    """
+    return any(_is_rate_limit_msg(msg) for msg in _batch_errors(tickers).values())
+
+
+def _yf_download_with_retry(tickers: list[str], start=None, end=None, max_tries: int = 6, pacer=None, budget=None):
     """
     Robust download:
     - disable threads (threads trigger faster rate-limits)
     - retry with exponential backoff + jitter on rate-limit / 401-ish errors
+    - report success / throttling to the AIMD pacer (if given)
+    - with a RunBudget, never sleep past its deadline (raises DeadlineReached instead)
     """
     if not tickers:
         return pd.DataFrame()
@@ -85,6 +127,11 @@ def _yf_download_with_retry(tickers: list[str], start=None, end=None, max_tries:
                 progress=False,
                 actions=False,
             )
+            if pacer is not None:
+                if _batch_was_throttled(tickers):
+                    pacer.on_throttle()
+                else:
+                    pacer.on_success()
             return df
 
         except Exception as e:
@@ -92,16 +139,26 @@ def _yf_download_with_retry(tickers: list[str], start=None, end=None, max_tries:
             last_err = e
 
             # Backoff on rate-limit / crumb / unauthorized
-            if "ratelimit" in msg or "too many requests" in msg or "crumb" in msg or "unauthorized" in msg or "401" in msg:
+            if _is_rate_limit_msg(msg):
+                if pacer is not None:
+                    pacer.on_throttle()
                 base = min(20 * (2 ** (attempt - 1)), 600)  # 20s, 40s, 80s...
                 jitter = random.uniform(0, 0.25 * base)
                 sleep_s = base + jitter
+                if budget is not None and not budget.allows_sleep(sleep_s):
+                    reason = f"back-off {sleep_s:.0f}s would cross the deadline"
+                    budget.stop(reason)
+                    raise DeadlineReached(reason) from e
                 print(f"[yfinance] attempt {attempt}/{max_tries} blocked; sleeping {sleep_s:.1f}s ...")
                 time.sleep(sleep_s)
                 continue
 
             # Other errors: small backoff and retry a bit
             sleep_s = min(5 * attempt, 30)
+            if budget is not None and not budget.allows_sleep(sleep_s):
+                reason = f"retry sleep {sleep_s}s would cross the deadline"
+                budget.stop(reason)
+                raise DeadlineReached(reason) from e
             print(f"[yfinance] attempt {attempt}/{max_tries} error: {e}; sleeping {sleep_s}s ...")
             time.sleep(sleep_s)
 
@@ -125,164 +182,517 @@ def _as_py_date(idx) -> date:
         return pd.Timestamp(str(idx)[:10]).date()
 
 
-def _normalize_yf_df(df: pd.DataFrame, yf_to_orig: dict[str, str]) -> list[dict]:
+# yfinance field name -> daily_bars column
+_YF_FIELDS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+_BAR_FIELDS = ("open", "high", "low", "close", "adj_close", "volume")
+
+
+def _empty_columns() -> dict[str, list]:
+    return {c: [] for c in BAR_COLUMNS}
+
+
+def _dates_from_index(index) -> list[date]:
+    """
+    Vectorized version of _as_py_date over a whole index.
+    Falls back to the per-value path for anything pandas can't parse in bulk.
+    """
+    try:
+        return list(pd.DatetimeIndex(index).date)
+    except Exception:
+        return [_as_py_date(idx) for idx in index]
+
+
+def _nan_to_none(values: np.ndarray, as_int: bool = False) -> list:
+    """
+    Convert a float array to a list of Python floats/ints with None for NaN.
     """
-    Normalize yfinance output into DB rows.
+    mask = np.isnan(values)
+    if as_int:
+        out = np.where(mask, 0, values).astype(np.int64).astype(object)
+    else:
+        out = values.astype(object)
+    out[mask] = None
+    return out.tolist()
+
 
-    Handles both MultiIndex orientations:
+def _stack_fields(values: np.ndarray, n_dates: int, n_tickers: int, ticker_level: int) -> np.ndarray:
+    """
+    Reshape the (dates x tickers*fields) block into (tickers*dates x fields),
+    ticker-major, so each ticker's bars stay contiguous (same order as the old per-ticker loop).
+    """
+    n_fields = len(_YF_FIELDS)
+    if ticker_level == 0:
+        # columns are (ticker, field)
+        cube = values.reshape(n_dates, n_tickers, n_fields).transpose(1, 0, 2)
+    else:
+        # columns are (field, ticker)
+        cube = values.reshape(n_dates, n_fields, n_tickers).transpose(2, 0, 1)
+    return cube.reshape(n_tickers * n_dates, n_fields)
+
+
+def _normalize_yf_columns(df: pd.DataFrame, yf_to_orig: dict[str, str]) -> dict[str, list]:
+    """
+    Columnar normalizer: yfinance frame -> {column: list} ready for the upsert layer.
+
+    Same output as _normalize_yf_df (row i of every column == row i there), but the
+    MultiIndex frame is reindexed and reshaped in one pass instead of xs()/iterrows()
+    per ticker. Handles both orientations:
       1) (field, ticker)  -> ticker is level 1
-      2) (ticker, field)  -> ticker is level 0 (common with group_by="ticker" for many tickers)
+      2) (ticker, field)  -> ticker is level 0
     """
-    rows: list[dict] = []
+    cols = _empty_columns()
     if df is None or df.empty:
-        return rows
-
-    def _row(orig_sym: str, d: date, r: pd.Series, cols) -> dict:
-        return {
-            "symbol": orig_sym,
-            "date": d,  # ✅ Python date
-            "open": float(r["Open"]) if "Open" in cols and pd.notna(r.get("Open")) else None,
-            "high": float(r["High"]) if "High" in cols and pd.notna(r.get("High")) else None,
-            "low": float(r["Low"]) if "Low" in cols and pd.notna(r.get("Low")) else None,
-            "close": float(r["Close"]) if "Close" in cols and pd.notna(r.get("Close")) else None,
-            "adj_close": float(r["Adj Close"]) if "Adj Close" in cols and pd.notna(r.get("Adj Close")) else None,
-            "volume": int(r["Volume"]) if "Volume" in cols and pd.notna(r.get("Volume")) else None,
-            "source": "yfinance",
-        }
-
-    # MultiIndex case
+        return cols
+
     if isinstance(df.columns, pd.MultiIndex):
-        lvl0 = df.columns.get_level_values(0)
-        lvl1 = df.columns.get_level_values(1)
+        lvl0 = set(df.columns.get_level_values(0))
+        lvl1 = set(df.columns.get_level_values(1))
 
         tickers = set(yf_to_orig.keys())
-        tickers_in_lvl0 = len(tickers.intersection(set(lvl0))) > 0
-        tickers_in_lvl1 = len(tickers.intersection(set(lvl1))) > 0
+        tickers_in_lvl0 = len(tickers.intersection(lvl0)) > 0
+        tickers_in_lvl1 = len(tickers.intersection(lvl1)) > 0
 
-        # Case A: (field, ticker) => ticker in level 1
         if tickers_in_lvl1 and not tickers_in_lvl0:
-            tickers_in_df = set(lvl1)
-            for yf_sym, orig_sym in yf_to_orig.items():
-                if yf_sym not in tickers_in_df:
-                    continue
-                sub = df.xs(yf_sym, axis=1, level=1, drop_level=True)  # columns become fields
-                cols = sub.columns
-                for idx, r in sub.iterrows():
-                    d = _as_py_date(idx)
-                    rows.append(_row(orig_sym, d, r, cols))
-            return rows
-
-        # Case B: (ticker, field) => ticker in level 0
-        if tickers_in_lvl0:
-            tickers_in_df = set(lvl0)
-            for yf_sym, orig_sym in yf_to_orig.items():
-                if yf_sym not in tickers_in_df:
-                    continue
-                sub = df.xs(yf_sym, axis=1, level=0, drop_level=True)  # columns become fields
-                cols = sub.columns
-                for idx, r in sub.iterrows():
-                    d = _as_py_date(idx)
-                    rows.append(_row(orig_sym, d, r, cols))
-            return rows
-
-        return rows
-
-    # Non-MultiIndex: single ticker flat columns
-    orig_sym = next(iter(yf_to_orig.values()), None)
-    if not orig_sym:
-        return rows
-
-    cols = df.columns
-    for idx, r in df.iterrows():
-        d = _as_py_date(idx)
-        rows.append(_row(orig_sym, d, r, cols))
-
-    return rows
-
-
-def upsert_daily_bars(db, rows: list[dict], batch_size: int = 500):
-    """
-    Batch upserts to avoid SQLite parameter limits.
+            ticker_level, present = 1, lvl1
+        elif tickers_in_lvl0:
+            ticker_level, present = 0, lvl0
+        else:
+            return cols
+
+        yf_syms = [s for s in yf_to_orig if s in present]
+        if ticker_level == 0:
+            wanted = pd.MultiIndex.from_product([yf_syms, _YF_FIELDS])
+        else:
+            wanted = pd.MultiIndex.from_product([_YF_FIELDS, yf_syms])
+
+        block = df.reindex(columns=wanted).to_numpy(dtype=float, na_value=np.nan)
+        n_dates, n_tickers = len(df.index), len(yf_syms)
+        values = _stack_fields(block, n_dates, n_tickers, ticker_level)
+
+        orig_syms = [yf_to_orig[s] for s in yf_syms]
+        dates = _dates_from_index(df.index)
+        cols["symbol"] = [s for s in orig_syms for _ in range(n_dates)]
+        cols["date"] = dates * n_tickers
+    else:
+        # Non-MultiIndex: single ticker flat columns
+        orig_sym = next(iter(yf_to_orig.values()), None)
+        if not orig_sym:
+            return cols
+
+        values = df.reindex(columns=list(_YF_FIELDS)).to_numpy(dtype=float, na_value=np.nan)
+        cols["symbol"] = [orig_sym] * len(df.index)
+        cols["date"] = _dates_from_index(df.index)
+
+    for i, name in enumerate(_BAR_FIELDS):
+        cols[name] = _nan_to_none(values[:, i], as_int=(name == "volume"))
+    cols["source"] = ["yfinance"] * len(cols["date"])
+    return cols
+
+
+def _columns_to_rows(cols: dict[str, list]) -> list[dict]:
+    names = list(cols.keys())
+    return [dict(zip(names, vals)) for vals in zip(*(cols[n] for n in names))]
+
+
+def _normalize_yf_df(df: pd.DataFrame, yf_to_orig: dict[str, str]) -> list[dict]:
+    """
+    Normalize yfinance output into DB rows (list of dicts).
+    Thin wrapper over _normalize_yf_columns for callers that want rows.
+    """
+    return _columns_to_rows(_normalize_yf_columns(df, yf_to_orig))
+
+
+def upsert_daily_bars(db, rows: list[dict] | dict[str, list], batch_size: int = 500):
+    """
+    One-shot bulk upsert (single transaction) through BulkBarWriter.
+    Accepts either row dicts or the column dict from _normalize_yf_columns.
+    batch_size = rows per executemany() call.
     """
     if not rows:
         return 0
 
-    total = 0
-    for i in range(0, len(rows), batch_size):
-        chunk = rows[i:i + batch_size]
-
-        stmt = sqlite_insert(DailyBar).values(chunk)
-        stmt = stmt.on_conflict_do_update(
-            index_elements=["symbol", "date"],
-            set_={
-                "open": stmt.excluded.open,
-                "high": stmt.excluded.high,
-                "low": stmt.excluded.low,
-                "close": stmt.excluded.close,
-                "adj_close": stmt.excluded.adj_close,
-                "volume": stmt.excluded.volume,
-                "source": stmt.excluded.source,
-                "updated_at": func.now(),  # ✅ FIX: real SQL timestamp, not a Python string
+    with BulkBarWriter(db, chunk_size=batch_size) as writer:
+        return writer.write(rows)
+
+
+def _paced_chunks(groups, batch_size: int, pacer=None, rank: dict[str, int] | None = None):
+    """
+    Chunk each (symbols, start, end) group lazily, so an AIMD pacer can resize every batch.
+    Without `rank` the groups are fetched one after another. With `rank` ({symbol: position},
+    lower first) batches of different groups are interleaved: the next batch comes from the
+    group whose next symbol ranks best, so a popular symbol in a later start-date bucket isn't
+    queued behind a whole earlier bucket.
+    """
+    groups = [g for g in groups if len(g[0])]
+    last = len(rank) if rank else 0
+
+    def key(symbol):
+        return rank.get(symbol, last) if rank else 0
+
+    heap = [(key(g[0][0]), gi, 0) for gi, g in enumerate(groups)]
+    heapq.heapify(heap)
+    while heap:
+        _, gi, i = heapq.heappop(heap)
+        symbols, start, end = groups[gi]
+        n = pacer.batch_size if pacer is not None else batch_size
+        yield symbols[i:i + n], start, end
+        i += n
+        if i < len(symbols):
+            heapq.heappush(heap, (key(symbols[i]), gi, i))
+
+
+def plan_batches(groups, batch_size: int, rank: dict[str, int] | None = None) -> list[tuple]:
+    """(symbols, start, end) batches in the order _run_batches would request them at a fixed batch size."""
+    return list(_paced_chunks(groups, batch_size, rank=rank))
+
+
+def _run_batches(
+    db,
+    groups,
+    tag: str,
+    batch_size: int,
+    sleep_s: float,
+    commit_every: int | None,
+    adaptive: bool = False,
+    max_batch: int = 100,
+    on_batch=None,
+    before_write=None,
+    quality: bool = True,
+    budget=None,
+    rank: dict[str, int] | None = None,
+) -> int:
+    """
+    Download -> normalize -> quality gate -> write for each (symbols, start, end) group, pipelined:
+    the fetch thread keeps Yahoo busy while the previous batch is normalized and written.
+    One BulkBarWriter per run; the rate-limit sleep only paces the fetch stage.
+
+    adaptive=True: batch size / delay come from a persisted AIMD PacingController
+    (batch_size / sleep_s are only the first-run seed).
+
+    on_batch(writer, item): called after every batch (ok or failed) on the writer thread;
+    item has "symbols", "start", "end", "unmappable" (symbols with no Yahoo ticker, never
+    requested) and either "cols" or "error".
+    before_write(writer, item): called with "cols" before they are written, so it can still
+    read the stored values they replace (e.g. corporate_actions.make_action_detector).
+
+    quality=True: bars failing bar_quality.QualityGate are dropped (empty placeholders) or
+    moved to bar_quarantine (same transaction as the batch); counters are printed per run.
+
+    budget (time_budget.RunBudget): no new batch starts once the next one would not fit before
+    the deadline; batches already in flight are still written. Symbols never fetched (or given
+    up on at the deadline) end up in budget.skipped, without reaching on_batch.
+
+    rank: interleave the groups' batches by symbol priority (see _paced_chunks).
+    """
+    pacer = None
+    if adaptive:
+        pacer = load_pacer(db, tag, batch_size, sleep_s, max_batch=max_batch)
+
+    if budget is not None:
+        budget.begin()
+
+    def _items():
+        for orig_batch, start, end in _paced_chunks(groups, batch_size, pacer, rank=rank):
+            if budget is not None and not budget.can_start():
+                budget.skipped.extend(orig_batch)
+                continue
+            yf_batch, yf_to_orig = _build_yf_batch(orig_batch)
+            # symbols with no Yahoo ticker still reach on_batch, so health/progress record them
+            mapped = set(yf_to_orig.values())
+            unmappable = [s for s in orig_batch if s not in mapped]
+            yield {
+                "symbols": orig_batch, "yf_batch": yf_batch, "yf_to_orig": yf_to_orig,
+                "unmappable": unmappable, "start": start, "end": end,
             }
+
+    def _fetch(item):
+        if not item["yf_batch"]:
+            item["df"], item["yf_errors"] = pd.DataFrame(), {}
+            return
+        item["df"] = _yf_download_with_retry(
+            item["yf_batch"], start=item["start"], end=item["end"], pacer=pacer, budget=budget
         )
-        db.execute(stmt)
-        db.commit()
-        total += len(chunk)
+        # per-ticker messages yfinance swallowed (delisted vs. rate-limited), keyed by original symbol
+        item["yf_errors"] = {item["yf_to_orig"][t]: msg for t, msg in _batch_errors(item["yf_batch"]).items()}
 
-    return total
+    gate = QualityGate() if quality else None
 
+    def _normalize(item):
+        item["cols"] = _normalize_yf_columns(item.pop("df"), item["yf_to_orig"])
+        if gate is not None:
+            item["cols"], item["quarantine"] = gate.check(item["cols"])
 
-# --------------------------
-# Public APIs
-# --------------------------
-def backfill_symbols(db, symbols: list[str], years: int = 10, batch_size: int = 5, sleep_s: float = 3.0):
+    total_rows = 0
+
+    delay = pacer.current_sleep if pacer is not None else sleep_s
+
+    try:
+        with BulkBarWriter(db, commit_every=commit_every, tune=True, label=f"{tag}:write") as writer:
+            def _write(item):
+                nonlocal total_rows
+                if isinstance(item.get("error"), DeadlineReached):
+                    # not a symbol failure: leave them for the next run
+                    budget.skipped.extend(item["symbols"])
+                    print(f"[{tag}] batch dropped ({len(item['yf_batch'])} tickers): {item['error']}")
+                    return
+                if "error" in item:
+                    print(f"[{tag}] batch failed ({len(item['yf_batch'])} tickers): {item['error']}")
+                else:
+                    if before_write is not None:
+                        try:
+                            before_write(writer, item)
+                        except Exception as e:
+                            print(f"[{tag}] before_write hook failed: {e}")
+                    try:
+                        total_rows += writer.write(item["cols"])
+                        writer.execute_many(QUARANTINE_SQL, item.get("quarantine"))
+                    except Exception as e:
+                        item["error"] = e
+                        print(f"[{tag}] batch write failed ({len(item['yf_batch'])} tickers): {e}")
+
+                if on_batch is not None:
+                    try:
+                        on_batch(writer, item)
+                    except Exception as e:
+                        print(f"[{tag}] on_batch hook failed: {e}")
+
+            stats = run_pipeline(_items(), _fetch, _normalize, _write, sleep_s=delay, tag=tag)
+    finally:
+        # after the writer released its connection (SQLite allows one writer at a time)
+        if pacer is not None:
+            save_pacer(db, tag, pacer)
+            print(f"[{tag}] pacing {pacer.summary()}")
+
+    print(writer.summary())
+    if budget is not None:
+        print(f"[{tag}] budget {budget.summary()}")
+    if gate is not None:
+        print(f"[{tag}] quality {gate.summary()}")
+    print(
+        f"[{tag}] pipeline batches={stats['items']} fetch={stats['fetch_s']:.1f}s "
+        f"normalize={stats['normalize_s']:.1f}s write={stats['write_s']:.1f}s"
+    )
+    return total_rows
+
+
+def _last_weekday_before(d: date) -> date:
+    d = d - timedelta(days=1)
+    while d.weekday() >= 5:  # Sat/Sun
+        d -= timedelta(days=1)
+    return d
+
+
+def load_watermarks(db, symbols: list[str] | None = None) -> dict[str, date]:
     """
-    Backfill N years for all symbols.
-    batch_size kept small to reduce rate-limits.
+    symbol -> MAX(date) of real (non-placeholder) bars, in one grouped query.
     """
-    start = date.today() - timedelta(days=365 * years)
-    end = date.today() + timedelta(days=1)
+    if db_is_compact(db):
+        # day numbers off the clustered key instead of formatting every row through the view
+        rows = db.execute(text(COMPACT_WATERMARKS_SQL)).all()
+        marks = {sym: day_to_date(day) for sym, day in rows if sym and day is not None}
+    else:
+        q = (
+            select(DailyBar.symbol, func.max(DailyBar.date))
+            .where(DailyBar.close.isnot(None))
+            .group_by(DailyBar.symbol)
+        )
+        marks = {sym: d for sym, d in db.execute(q).all() if sym and d}
+
+    if symbols is None:
+        return marks
+    wanted = set(symbols)
+    return {s: d for s, d in marks.items() if s in wanted}
+
+
+def plan_incremental(
+    symbols: list[str],
+    watermarks: dict[str, date],
+    expected_last: date,
+    days: int = 7,
+    overlap_days: int = 0,
+    today: date | None = None,
+) -> tuple[dict[date, list[str]], list[str]]:
+    """
+    Group stale symbols into buckets that share the same download start date.
 
-    total_rows = 0
+    - current (watermark >= expected_last) -> skipped
+    - has data                             -> start = watermark + 1 - overlap_days
+    - no data yet                          -> start = today - days (same as the fixed window)
 
-    for orig_batch in _chunk(symbols, batch_size):
-        yf_batch, yf_to_orig = _build_yf_batch(orig_batch)
-        if not yf_batch:
+    Returns (buckets {start: [symbols]}, skipped_symbols).
+    """
+    today = today or date.today()
+    buckets: dict[date, list[str]] = {}
+    skipped: list[str] = []
+
+    for sym in symbols:
+        wm = watermarks.get(sym)
+        if wm is not None and wm >= expected_last:
+            skipped.append(sym)
             continue
 
-        try:
-            df = _yf_download_with_retry(yf_batch, start=start, end=end)
-            rows = _normalize_yf_df(df, yf_to_orig)
-            total_rows += upsert_daily_bars(db, rows)
-        except Exception as e:
-            print(f"[backfill] batch failed ({len(yf_batch)} tickers): {e}")
+        if wm is None:
+            start = today - timedelta(days=days)
+        else:
+            start = wm + timedelta(days=1 - overlap_days)
 
-        time.sleep(sleep_s)
+        buckets.setdefault(start, []).append(sym)
 
-    return total_rows
+    return buckets, skipped
 
 
-def refresh_recent(db, symbols: list[str], days: int = 7, batch_size: int = 50, sleep_s: float = 1.0):
+# --------------------------
+# Public APIs
+# --------------------------
+def backfill_start(years: int) -> date:
+    return date.today() - timedelta(days=365 * years)
+
+
+def backfill_symbols(
+    db,
+    symbols: list[str],
+    years: int = 10,
+    batch_size: int = 5,
+    sleep_s: float = 3.0,
+    commit_every: int | None = BULK_COMMIT_EVERY,
+    adaptive: bool = True,
+    on_batch=None,
+    budget=None,
+):
+    """
+    Backfill N years for all symbols.
+    batch_size kept small to reduce rate-limits.
+    Writes go through one BulkBarWriter (WAL, commit every `commit_every` rows; None = one txn).
+    adaptive=True: batch_size/sleep_s only seed the persisted AIMD pacer (see yf_pacing.py).
+    on_batch: per-batch hook run inside the write transaction (e.g. backfill_progress checkpoints).
+    budget: optional time_budget.RunBudget (see _run_batches).
+    """
+    start = backfill_start(years)
+    end = date.today() + timedelta(days=1)
+
+    groups = [(symbols, start, end)]
+    return _run_batches(
+        db, groups, "backfill", batch_size, sleep_s, commit_every,
+        adaptive=adaptive, max_batch=50, on_batch=on_batch, budget=budget,
+    )
+
+
+def refresh_recent(
+    db,
+    symbols: list[str],
+    days: int = 7,
+    batch_size: int = 50,
+    sleep_s: float = 1.0,
+    commit_every: int | None = BULK_COMMIT_EVERY,
+    adaptive: bool = True,
+    on_batch=None,
+    before_write=None,
+    budget=None,
+):
     """
     Daily refresh: fetch last N calendar days; upsert into DB.
+    Writes go through one BulkBarWriter (WAL, commit every `commit_every` rows; None = one txn).
+    adaptive=True: batch_size/sleep_s only seed the persisted AIMD pacer (see yf_pacing.py).
     """
     start = date.today() - timedelta(days=days)
     end = date.today() + timedelta(days=1)
 
-    total_rows = 0
+    groups = [(symbols, start, end)]
+    return _run_batches(
+        db, groups, "daily", batch_size, sleep_s, commit_every,
+        adaptive=adaptive, max_batch=200, on_batch=on_batch, before_write=before_write, budget=budget,
+    )
+
+
+def refresh_incremental(
+    db,
+    symbols: list[str],
+    days: int = 7,
+    batch_size: int = 50,
+    sleep_s: float = 1.0,
+    commit_every: int | None = BULK_COMMIT_EVERY,
+    overlap_days: int = 0,
+    expected_last: date | None = None,
+    end: date | None = None,
+    adaptive: bool = True,
+    on_batch=None,
+    before_write=None,
+    budget=None,
+):
+    """
+    Watermark-driven daily refresh:
+      - one grouped MAX(date) query for all symbols
+      - symbols already current for the expected last session are skipped (no Yahoo call)
+      - the rest are bucketed by start date and only the missing range is downloaded
+      - batches of different buckets are interleaved in input order, so callers that pass
+        symbols most-important first (symbol_usage.by_popularity) get them fetched first
+    Symbols with no bars yet fall back to the fixed `days` window.
+    expected_last/end come from the exchange calendar when known (see refresh_planner.py);
+    end is exclusive and defaults to tomorrow.
+    adaptive=True: batch_size/sleep_s only seed the persisted AIMD pacer (see yf_pacing.py).
+    """
+    today = date.today()
+    expected_last = expected_last or _last_weekday_before(today)
+    end = end or today + timedelta(days=1)
+
+    watermarks = load_watermarks(db, symbols)
+    buckets, skipped = plan_incremental(
+        symbols, watermarks, expected_last, days=days, overlap_days=overlap_days, today=today
+    )
+
+    n_requests = sum((len(v) + batch_size - 1) // batch_size for v in buckets.values())
+    print(
+        f"[daily] incremental: expected_last={expected_last} current={len(skipped)} "
+        f"stale={len(symbols) - len(skipped)} buckets={len(buckets)} requests={n_requests}"
+    )
+
+    if not buckets:
+        return 0
 
-    for orig_batch in _chunk(symbols, batch_size):
-        yf_batch, yf_to_orig = _build_yf_batch(orig_batch)
-        if not yf_batch:
-            continue
+    groups = [(buckets[start], start, end) for start in buckets]
+    rank = {s: i for i, s in enumerate(symbols)}
+    return _run_batches(
+        db, groups, "daily", batch_size, sleep_s, commit_every,
+        adaptive=adaptive, max_batch=200, on_batch=on_batch, before_write=before_write, budget=budget,
+        rank=rank,
+    )
+
+
+def reload_history(
+    db,
+    symbols: list[str],
+    years: int = 10,
+    batch_size: int = 5,
+    sleep_s: float = 2.0,
+    commit_every: int | None = BULK_COMMIT_EVERY,
+    adaptive: bool = True,
+    on_batch=None,
+    budget=None,
+):
+    """
+    Re-download the whole stored history of `symbols` (e.g. after a split/dividend rewrote
+    Yahoo's adjusted prices). Each symbol restarts at its oldest stored bar, or `years` back
+    if it has none; symbols sharing a start date share requests.
+    """
+    if not symbols:
+        return 0
 
-        try:
-            df = _yf_download_with_retry(yf_batch, start=start, end=end)
-            rows = _normalize_yf_df(df, yf_to_orig)
-            total_rows += upsert_daily_bars(db, rows)
-        except Exception as e:
-            print(f"[daily] batch failed ({len(yf_batch)} tickers): {e}")
+    q = (
+        select(DailyBar.symbol, func.min(DailyBar.date))
+        .where(DailyBar.symbol.in_(symbols))
+        .group_by(DailyBar.symbol)
+    )
+    first = {sym: d for sym, d in db.execute(q).all()}
+    db.rollback()  # release the read snapshot before the writer starts
 
-        time.sleep(sleep_s)
+    default_start = backfill_start(years)
+    buckets: dict[date, list[str]] = {}
+    for sym in symbols:
+        buckets.setdefault(first.get(sym) or default_start, []).append(sym)
 
-    return total_rows
+    end = date.today() + timedelta(days=1)
+    groups = [(buckets[start], start, end) for start in sorted(buckets)]
+    return _run_batches(
+        db, groups, "reload", batch_size, sleep_s, commit_every,
+        adaptive=adaptive, max_batch=50, on_batch=on_batch, budget=budget,
+    )
@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 import yfinance as yf
+from sqlalchemy import func, select, text
 from sqlalchemy.orm import Session
 from ..models import PriceDaily
+from .compact_bars import day_number, day_to_date, db_is_compact
+from .sqlite_reader import get_read_pool, sqlite_path
 
 
 def _clean_col(c):
@@ -26,8 +30,23 @@ def _to_float(x):
         return None
 
 
-def download_prices(symbol: str) -> pd.DataFrame:
-    df = yf.download(symbol, period="max", interval="1d", progress=False)
+def latest_price_date(db: Session, symbol: str):
+    """MAX(date) of real (close not NULL) bars for symbol, or None."""
+    return (
+        db.query(func.max(PriceDaily.date))
+        .filter(PriceDaily.symbol == symbol, PriceDaily.close.isnot(None))
+        .scalar()
+    )
+
+
+def download_prices(symbol: str, start=None) -> pd.DataFrame:
+    """
+    start=None -> full history (period="max"); otherwise only bars from `start` on.
+    """
+    if start is None:
+        df = yf.download(symbol, period="max", interval="1d", progress=False)
+    else:
+        df = yf.download(symbol, start=start, interval="1d", progress=False)
 
     if df is None or df.empty:
         return pd.DataFrame()
@@ -77,102 +96,263 @@ def download_prices(symbol: str) -> pd.DataFrame:
     return clean
 
 
-def upsert_prices(db: Session, symbol: str, df: pd.DataFrame) -> int:
-    if df is None or df.empty:
-        return 0
+# Insert new bars; on an existing (symbol, date) only fill columns that are still NULL.
+# The WHERE skips the write (and the updated_at bump) when there is nothing to fill.
+FILL_NULLS_SQL = text(
+    """
+    INSERT INTO daily_bars (symbol, date, open, high, low, close, volume, source)
+    VALUES (:symbol, :date, :open, :high, :low, :close, :volume, :source)
+    ON CONFLICT(symbol, date) DO UPDATE SET
+        open = COALESCE(daily_bars.open, excluded.open),
+        high = COALESCE(daily_bars.high, excluded.high),
+        low = COALESCE(daily_bars.low, excluded.low),
+        close = COALESCE(daily_bars.close, excluded.close),
+        volume = COALESCE(daily_bars.volume, excluded.volume),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE (daily_bars.open IS NULL AND excluded.open IS NOT NULL)
+       OR (daily_bars.high IS NULL AND excluded.high IS NOT NULL)
+       OR (daily_bars.low IS NULL AND excluded.low IS NOT NULL)
+       OR (daily_bars.close IS NULL AND excluded.close IS NOT NULL)
+       OR (daily_bars.volume IS NULL AND excluded.volume IS NOT NULL)
+    """
+)
 
-    inserted_or_updated = 0
-
-    for row in df.to_dict(orient="records"):
-        d = row.get("date")
-        if d is None:
-            continue
-
-        new_open = _to_float(row.get("open"))
-        new_high = _to_float(row.get("high"))
-        new_low = _to_float(row.get("low"))
-        new_close = _to_float(row.get("close"))
-        new_vol = _to_float(row.get("volume"))
-
-        # If close is missing, skip
-        if new_close is None:
-            continue
-
-        existing = (
-            db.query(PriceDaily)
-            .filter(PriceDaily.symbol == symbol, PriceDaily.date == d)
-            .first()
-        )
-
-        if not existing:
-            db.add(
-                PriceDaily(
-                    symbol=symbol,
-                    date=d,
-                    open=new_open,
-                    high=new_high,
-                    low=new_low,
-                    close=new_close,
-                    volume=new_vol,
-                )
-            )
-            inserted_or_updated += 1
-
-        else:
-            # Update broken rows that had NaN/None
-            changed = False
-
-            def need_fix(v):
-                return v is None or (isinstance(v, float) and pd.isna(v))
-
-            if need_fix(existing.open) and new_open is not None:
-                existing.open = new_open
-                changed = True
-            if need_fix(existing.high) and new_high is not None:
-                existing.high = new_high
-                changed = True
-            if need_fix(existing.low) and new_low is not None:
-                existing.low = new_low
-                changed = True
-            if need_fix(existing.close) and new_close is not None:
-                existing.close = new_close
-                changed = True
-            if need_fix(existing.volume) and new_vol is not None:
-                existing.volume = new_vol
-                changed = True
-
-            if changed:
-                inserted_or_updated += 1
+# Compact DBs (see compact_bars.py): daily_bars is a view and can't be upserted; its INSERT
+# trigger fills (non-NULL new values win), so upsert_prices sends stored-over-new values.
+FILL_VIEW_SQL = text(
+    """
+    INSERT INTO daily_bars (symbol, date, open, high, low, close, volume, source)
+    VALUES (:symbol, :date, :open, :high, :low, :close, :volume, :source)
+    """
+)
 
-    db.commit()
-    return inserted_or_updated
+_OHLCV = ("open", "high", "low", "close", "volume")
 
 
-def get_prices_from_db(db: Session, symbol: str, limit: int = 1000):
-    rows = (
-        db.query(PriceDaily)
-        .filter(PriceDaily.symbol == symbol)
-        .order_by(PriceDaily.date.desc())
-        .limit(limit)
-        .all()
-    )
-    rows = list(reversed(rows))
+def _numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """date + float OHLCV (bad values -> NaN), rows without a date/close dropped, first row per date kept."""
+    out = pd.DataFrame({"date": pd.to_datetime(df["date"], errors="coerce").dt.date})
+    for c in _OHLCV:
+        out[c] = pd.to_numeric(df[c], errors="coerce") if c in df.columns else float("nan")
+    out = out.dropna(subset=["date", "close"])
+    return out.drop_duplicates(subset="date", keep="first").reset_index(drop=True)
 
-    def clean(x):
-        if x is None:
-            return None
-        if isinstance(x, float) and pd.isna(x):
-            return None
-        return x
 
+def _frame_params(symbol: str, frame: pd.DataFrame) -> list[dict]:
+    vol = frame["volume"].to_numpy(dtype=float)
     return [
         {
-            "date": r.date.isoformat(),
-            "open": clean(r.open),
-            "high": clean(r.high),
-            "low": clean(r.low),
-            "close": clean(r.close),
-            "volume": clean(r.volume),
+            "symbol": symbol,
+            "date": d.isoformat(),
+            "open": _to_float(o),
+            "high": _to_float(h),
+            "low": _to_float(l),
+            "close": _to_float(c),
+            "volume": None if np.isnan(v) else int(v),
+            "source": "yfinance",
         }
-        for r in rows
+        for d, o, h, l, c, v in zip(frame["date"], frame["open"], frame["high"], frame["low"], frame["close"], vol)
     ]
+
+
+def upsert_prices(db: Session, symbol: str, df: pd.DataFrame) -> int:
+    """
+    Set-based merge of a download into daily_bars:
+      - one query loads the symbol's existing bars in the downloaded date range
+      - new dates and "fill a NULL column" fixes are computed in memory
+      - only those rows are sent, as one executemany of FILL_NULLS_SQL
+    Existing non-NULL values are never overwritten. Returns rows inserted or patched.
+    """
+    if df is None or df.empty or "date" not in df.columns:
+        return 0
+
+    new = _numeric_frame(df)
+    if new.empty:
+        return 0
+
+    rows = db.execute(
+        select(PriceDaily.date, *[getattr(PriceDaily, c) for c in _OHLCV])
+        .where(PriceDaily.symbol == symbol)
+        .where(PriceDaily.date.between(new["date"].min(), new["date"].max()))
+    ).all()
+    old = pd.DataFrame(rows, columns=["date", *_OHLCV])
+
+    merged = new.merge(old, on="date", how="left", suffixes=("", "_old"), indicator=True)
+    is_new = (merged["_merge"] == "left_only").to_numpy()
+
+    fixes = np.zeros(len(merged), dtype=bool)
+    for c in _OHLCV:
+        old_vals = pd.to_numeric(merged[f"{c}_old"], errors="coerce")
+        fixes |= (old_vals.isna() & merged[c].notna()).to_numpy()
+
+    todo = merged[is_new | fixes]
+    if todo.empty:
+        return 0
+
+    if db_is_compact(db):
+        todo = todo.copy()
+        for c in _OHLCV:
+            todo[c] = pd.to_numeric(todo[f"{c}_old"], errors="coerce").fillna(todo[c])
+        db.execute(FILL_VIEW_SQL, _frame_params(symbol, todo))
+        db.commit()
+        return len(todo)
+
+    params = _frame_params(symbol, todo)
+    db.execute(FILL_NULLS_SQL, params)
+    db.commit()
+    return len(params)
+
+
+# Per-connection TEMP table: invisible to other connections and never touches the main
+# DB file, so filling it takes no lock readers or the daily job could wait on.
+_STAGING_DDL = text(
+    """
+    CREATE TEMP TABLE IF NOT EXISTS daily_bars_staging (
+        symbol TEXT NOT NULL, date TEXT NOT NULL,
+        open REAL, high REAL, low REAL, close REAL, volume INTEGER, source TEXT
+    )
+    """
+)
+
+_STAGING_INSERT_SQL = text(
+    """
+    INSERT INTO daily_bars_staging (symbol, date, open, high, low, close, volume, source)
+    VALUES (:symbol, :date, :open, :high, :low, :close, :volume, :source)
+    """
+)
+
+_SWAP_SQL = (
+    text("DELETE FROM daily_bars WHERE symbol = :symbol"),
+    text(
+        """
+        INSERT INTO daily_bars (symbol, date, open, high, low, close, volume, source)
+        SELECT symbol, date, open, high, low, close, volume, source
+        FROM daily_bars_staging WHERE symbol = :symbol
+        """
+    ),
+)
+
+
+def rebuild_prices(db: Session, symbol: str, df: pd.DataFrame) -> int:
+    """
+    Replace the symbol's whole history with `df` (already downloaded), atomically:
+    stage the rows in a TEMP table, then delete + INSERT ... SELECT in the same transaction.
+    Readers see either the old history or the new one, never an empty/partial one.
+    An empty download leaves the stored history untouched and returns 0.
+    """
+    if df is None or df.empty or "date" not in df.columns:
+        return 0
+
+    frame = _numeric_frame(df)
+    if frame.empty:
+        return 0
+
+    try:
+        db.execute(_STAGING_DDL)
+        db.execute(text("DELETE FROM daily_bars_staging"))
+        db.execute(_STAGING_INSERT_SQL, _frame_params(symbol, frame))
+
+        for stmt in _SWAP_SQL:
+            db.execute(stmt, {"symbol": symbol})
+        db.execute(text("DROP TABLE daily_bars_staging"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return len(frame)
+
+
+# Read path for the API: raw tuples from a pooled read-only connection (see sqlite_reader.py),
+# one constant statement per layout so each connection prepares it once. The unique
+# (symbol, date) / (symbol_id, day) key serves both the filter and the ORDER BY ... LIMIT.
+_PRICES_SQL = """
+SELECT date, open, high, low, close, volume FROM daily_bars
+WHERE symbol = ? AND date BETWEEN ? AND ?
+ORDER BY date DESC LIMIT ?
+"""
+
+_COMPACT_PRICES_SQL = """
+SELECT day, open, high, low, close, volume FROM bars_compact
+WHERE symbol_id = (SELECT id FROM bar_symbols WHERE symbol = ?) AND day BETWEEN ? AND ?
+ORDER BY day DESC LIMIT ?
+"""
+
+_ROW_KEYS = ("date", *_OHLCV)
+_MIN_DAY, _MAX_DAY = -(10**6), 10**6
+
+
+def _iso(d) -> str | None:
+    return None if d is None else str(d)[:10]
+
+
+def _fetch_bars(db: Session, symbol: str, limit: int | None, start, end) -> tuple[list[tuple], bool] | None:
+    """
+    Newest-first (date or day, open, high, low, close, volume) tuples and whether dates are
+    compact day numbers; None when the session is not on an SQLite file (use the ORM).
+    """
+    path = sqlite_path(db)
+    if path is None:
+        return None
+
+    n = -1 if limit is None else int(limit)
+    with get_read_pool(path).connection() as rc:
+        if rc.compact:
+            lo = _MIN_DAY if start is None else day_number(start)
+            hi = _MAX_DAY if end is None else day_number(end)
+            return rc.execute(_COMPACT_PRICES_SQL, (symbol, lo, hi, n)).fetchall(), True
+        lo = _iso(start) or "0000-01-01"
+        hi = _iso(end) or "9999-12-31"
+        return rc.execute(_PRICES_SQL, (symbol, lo, hi, n)).fetchall(), False
+
+
+def _fetch_bars_orm(db: Session, symbol: str, limit: int | None, start, end) -> list[tuple]:
+    q = select(PriceDaily.date, *[getattr(PriceDaily, c) for c in _OHLCV]).where(PriceDaily.symbol == symbol)
+    if start is not None:
+        q = q.where(PriceDaily.date >= pd.Timestamp(start).date())
+    if end is not None:
+        q = q.where(PriceDaily.date <= pd.Timestamp(end).date())
+    q = q.order_by(PriceDaily.date.desc())
+    if limit is not None:
+        q = q.limit(limit)
+    return [(d.isoformat(), *rest) for d, *rest in db.execute(q).all()]
+
+
+def get_prices_from_db(db: Session, symbol: str, limit: int | None = 1000, start=None, end=None) -> list[dict]:
+    """
+    The latest `limit` bars of symbol (optionally within [start, end]), oldest first, as
+    {date, open, high, low, close, volume} dicts.
+    """
+    fetched = _fetch_bars(db, symbol, limit, start, end)
+    if fetched is None:
+        rows = _fetch_bars_orm(db, symbol, limit, start, end)
+    else:
+        rows, compact = fetched
+        if compact:
+            rows = [(day_to_date(r[0]).isoformat(), *r[1:]) for r in rows]
+
+    rows.reverse()
+    return [dict(zip(_ROW_KEYS, r)) for r in rows]
+
+
+def get_price_columns(db: Session, symbol: str, limit: int | None = 1000, start=None, end=None) -> dict:
+    """
+    Same bars as get_prices_from_db, as oldest-first numpy columns in price_cache's format:
+    date = int32 days since 1970-01-01, open/high/low/close/volume = float64 with NaN for NULL.
+    """
+    fetched = _fetch_bars(db, symbol, limit, start, end)
+    if fetched is None:
+        rows, compact = _fetch_bars_orm(db, symbol, limit, start, end), False
+    else:
+        rows, compact = fetched
+
+    rows.reverse()
+    cols = list(zip(*rows)) or [()] * len(_ROW_KEYS)
+    if compact:
+        dates = np.asarray(cols[0], dtype=np.int32)
+    else:
+        dates = np.asarray(cols[0], dtype="datetime64[D]").astype(np.int32)
+    out = {"date": dates}
+    for c, vals in zip(_OHLCV, cols[1:]):
+        out[c] = np.asarray(vals, dtype=np.float64)  # None -> NaN
+    return out
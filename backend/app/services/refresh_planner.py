@@ -0,0 +1,83 @@
+# backend/app/services/refresh_planner.py
+#
+# Pre-flight planner for the daily refresh: decides, before any network call, which
+# (symbol, start, end) ranges are actually missing given the exchange calendar.
+
+import csv
+from datetime import datetime, timedelta
+
+from ..models import PacingState
+from .market_calendar import expected_last_session
+from .price_loader import load_watermarks, plan_batches, plan_incremental
+
+
+DEFAULT_DAILY_BATCH = 30
+
+
+def _planned_batch_size(db, key: str = "daily") -> int:
+    """Batch size the next run will start with (persisted AIMD state, else the job default)."""
+    try:
+        row = db.get(PacingState, key)
+    except Exception:
+        row = None
+    return int(row.batch_size) if row is not None else DEFAULT_DAILY_BATCH
+
+
+def build_plan(
+    db,
+    market: str,
+    symbols: list[str],
+    days: int = 7,
+    overlap_days: int = 0,
+    batch_size: int | None = None,
+    now_utc: datetime | None = None,
+) -> dict:
+    """
+    Minimal refresh plan for `symbols`:
+      - expected_last: last session whose bar should exist (NYSE/NSE calendar + settle time)
+      - requests: [(symbol, start, end_exclusive)] for stale symbols only, in fetch order
+        (batches of different start dates interleaved by input order, as refresh_incremental does)
+      - estimated_requests: Yahoo calls at `batch_size` symbols per call (buckets don't mix starts)
+    """
+    expected = expected_last_session(market, now_utc)
+    today = (now_utc or datetime.utcnow()).date()
+    end = expected + timedelta(days=1)
+
+    watermarks = load_watermarks(db, symbols)
+    buckets, skipped = plan_incremental(
+        symbols, watermarks, expected, days=days, overlap_days=overlap_days, today=today
+    )
+
+    batch = batch_size or _planned_batch_size(db)
+    rank = {s: i for i, s in enumerate(symbols)}
+    batches = plan_batches([(buckets[start], start, end) for start in buckets], batch, rank=rank)
+    requests = [(s, start, end) for syms, start, end in batches for s in syms]
+
+    return {
+        "market": market,
+        "expected_last": expected,
+        "symbols": len(symbols),
+        "current": len(skipped),
+        "stale": len(requests),
+        "buckets": len(buckets),
+        "batch_size": batch,
+        "estimated_requests": len(batches),
+        "requests": requests,
+    }
+
+
+def format_plan(plan: dict) -> str:
+    return (
+        f"[plan] market={plan['market']} expected_last={plan['expected_last']} "
+        f"symbols={plan['symbols']} current={plan['current']} stale={plan['stale']} "
+        f"buckets={plan['buckets']} batch={plan['batch_size']} est_requests={plan['estimated_requests']}"
+    )
+
+
+def write_plan_csv(plan: dict, path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["market", "symbol", "start", "end"])
+        for sym, start, end in plan["requests"]:
+            w.writerow([plan["market"], sym, start.isoformat(), end.isoformat()])
+
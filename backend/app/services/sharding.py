@@ -0,0 +1,254 @@
+# backend/app/services/sharding.py
+#
+# Horizontal sharding of the daily refresh.
+#   1. every worker refreshes a deterministic slice of the active symbols (crc32(symbol) % N)
+#      against its own staging copy of the market DB
+#   2. merge_staging() folds the rows each finished worker touched back into the market DB,
+#      one bulk INSERT ... SELECT per table over ATTACHed staging files
+# Local workers share one IP, so each paces at 1/N of the Yahoo rate (yf_pacing.set_rate_share).
+#
+# Workers can be local processes (run_universe_and_refresh daily --shards N) or separate
+# machines that each downloaded the same snapshot (--shards N --shard-index i, then `merge`).
+
+from pathlib import Path
+import sqlite3
+import zlib
+
+from sqlalchemy import text
+
+from .compact_bars import COMPACT_MERGE_SQL, is_compact
+
+
+# SQLite's default SQLITE_MAX_ATTACHED is 10; keep one slot spare
+MAX_ATTACH_PER_PASS = 8
+
+
+def shard_of(symbol: str, shards: int) -> int:
+    """Stable across runs, processes and machines (unlike hash())."""
+    return zlib.crc32(symbol.encode("utf-8")) % shards
+
+
+def shard_symbols(symbols: list[str], shards: int, shard_index: int) -> list[str]:
+    if shards <= 1:
+        return symbols
+    if not 0 <= shard_index < shards:
+        raise ValueError(f"shard_index must be in [0, {shards}), got {shard_index}")
+    return [s for s in symbols if shard_of(s, shards) == shard_index]
+
+
+def prepare_staging(src_path: str | Path, dst_path: str | Path) -> Path:
+    """Consistent copy of the market DB for one worker (sqlite backup API, safe while in use)."""
+    dst = Path(dst_path)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    src_con = sqlite3.connect(str(src_path))
+    dst_con = sqlite3.connect(str(dst))
+    try:
+        src_con.backup(dst_con)
+    finally:
+        dst_con.close()
+        src_con.close()
+    return dst
+
+
+def start_shard_run(db, market: str, shards: int, shard_index: int) -> int:
+    row = db.execute(
+        text(
+            """
+            INSERT INTO shard_runs (market, shards, shard_index, started_at)
+            VALUES (:m, :n, :i, CURRENT_TIMESTAMP)
+            """
+        ),
+        {"m": market, "n": shards, "i": shard_index},
+    )
+    db.commit()
+    return row.lastrowid
+
+
+def finish_shard_run(db, run_id: int, rows: int) -> None:
+    db.execute(
+        text("UPDATE shard_runs SET finished_at = CURRENT_TIMESTAMP, rows = :r WHERE id = :id"),
+        {"r": rows, "id": run_id},
+    )
+    db.commit()
+
+
+# Everything below runs against the target DB with the staging file ATTACHed as {src}.
+# Params: since (the worker's started_at), shards, shard_index.
+_MERGE_SQL = (
+    (
+        "daily_bars",
+        """
+        INSERT INTO daily_bars (symbol, date, open, high, low, close, adj_close, volume, source,
+                                created_at, updated_at)
+        SELECT symbol, date, open, high, low, close, adj_close, volume, source, created_at, updated_at
+        FROM {src}.daily_bars WHERE updated_at >= :since
+        ON CONFLICT(symbol, date) DO UPDATE SET
+            open = excluded.open,
+            high = excluded.high,
+            low = excluded.low,
+            close = excluded.close,
+            adj_close = excluded.adj_close,
+            volume = excluded.volume,
+            source = excluded.source,
+            updated_at = excluded.updated_at
+        """,
+    ),
+    # the worker owns its shard's failure state outright
+    (
+        "symbol_failures",
+        "DELETE FROM symbol_failures WHERE shard_of(symbol, :shards) = :shard_index",
+    ),
+    (
+        "symbol_failures",
+        """
+        INSERT INTO symbol_failures SELECT * FROM {src}.symbol_failures
+        WHERE shard_of(symbol, :shards) = :shard_index
+        """,
+    ),
+    (
+        "symbols",
+        """
+        UPDATE symbols SET
+            is_active = (SELECT t.is_active FROM {src}.symbols t WHERE t.symbol = symbols.symbol),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE shard_of(symbol, :shards) = :shard_index
+          AND is_active IS NOT (SELECT t.is_active FROM {src}.symbols t WHERE t.symbol = symbols.symbol)
+          AND EXISTS (SELECT 1 FROM {src}.symbols t WHERE t.symbol = symbols.symbol)
+        """,
+    ),
+    # events that existed before the run keep their id in the copy; new ones get a fresh id
+    (
+        "corporate_action_events",
+        """
+        UPDATE corporate_action_events SET
+            state = (SELECT t.state FROM {src}.corporate_action_events t WHERE t.id = corporate_action_events.id),
+            reloaded_at = (SELECT t.reloaded_at FROM {src}.corporate_action_events t
+                           WHERE t.id = corporate_action_events.id)
+        WHERE id IN (SELECT id FROM {src}.corporate_action_events
+                     WHERE detected_at < :since AND reloaded_at >= :since)
+        """,
+    ),
+    (
+        "corporate_action_events",
+        """
+        INSERT INTO corporate_action_events (symbol, kind, ref_date, close_ratio, adj_ratio, state,
+                                             detected_at, reloaded_at)
+        SELECT symbol, kind, ref_date, close_ratio, adj_ratio, state, detected_at, reloaded_at
+        FROM {src}.corporate_action_events WHERE detected_at >= :since
+        """,
+    ),
+    (
+        "bar_quarantine",
+        """
+        INSERT INTO bar_quarantine (symbol, date, open, high, low, close, adj_close, volume, source,
+                                    reason, times_seen, first_seen_at, last_seen_at)
+        SELECT symbol, date, open, high, low, close, adj_close, volume, source,
+               reason, times_seen, first_seen_at, last_seen_at
+        FROM {src}.bar_quarantine WHERE last_seen_at >= :since
+        ON CONFLICT(symbol, date) DO UPDATE SET
+            open = excluded.open,
+            high = excluded.high,
+            low = excluded.low,
+            close = excluded.close,
+            adj_close = excluded.adj_close,
+            volume = excluded.volume,
+            source = excluded.source,
+            reason = excluded.reason,
+            times_seen = excluded.times_seen,
+            last_seen_at = excluded.last_seen_at
+        """,
+    ),
+    (
+        "refresh_checkpoints",
+        """
+        INSERT INTO refresh_checkpoints (market, mode, shard_index, budget_s, stopped_early, batches, rows,
+                                         remaining, remaining_symbols, started_at, finished_at)
+        SELECT market, mode, shard_index, budget_s, stopped_early, batches, rows,
+               remaining, remaining_symbols, started_at, finished_at
+        FROM {src}.refresh_checkpoints WHERE finished_at >= :since
+        """,
+    ),
+    # shards share Yahoo's limits: keep the most conservative operating point (lowest
+    # batch_size / sleep_s) any shard saved this run
+    (
+        "pacing_state",
+        """
+        INSERT INTO pacing_state (key, batch_size, sleep_s, successes, throttles, updated_at)
+        SELECT key, batch_size, sleep_s, successes, throttles, updated_at
+        FROM {src}.pacing_state WHERE updated_at >= :since
+        ON CONFLICT(key) DO UPDATE SET
+            batch_size = excluded.batch_size,
+            sleep_s = excluded.sleep_s,
+            successes = excluded.successes,
+            throttles = excluded.throttles,
+            updated_at = excluded.updated_at
+        WHERE pacing_state.updated_at < :since
+           OR excluded.batch_size / excluded.sleep_s < pacing_state.batch_size / pacing_state.sleep_s
+        """,
+    ),
+)
+
+
+def _finished_run(cur, alias: str):
+    return cur.execute(
+        f"""
+        SELECT shards, shard_index, started_at FROM {alias}.shard_runs
+        WHERE finished_at IS NOT NULL ORDER BY id DESC LIMIT 1
+        """
+    ).fetchone()
+
+
+def merge_staging(db, staging_paths: list[str | Path]) -> dict[str, int]:
+    """
+    Fold finished shard staging DBs into the DB behind `db`.
+    Up to MAX_ATTACH_PER_PASS files are merged per transaction; staging files without a
+    finished shard_runs row are skipped (counted in "skipped").
+    Returns row counts per table plus "merged"/"skipped" file counts.
+    """
+    totals = {"merged": 0, "skipped": 0}
+    conn = db.get_bind().raw_connection()
+    conn.driver_connection.create_function("shard_of", 2, shard_of, deterministic=True)
+    cur = conn.cursor()
+    # staging files are copies of this DB, so they share its daily_bars layout
+    merge_sql = COMPACT_MERGE_SQL + _MERGE_SQL[1:] if is_compact(cur) else _MERGE_SQL
+
+    try:
+        paths = [Path(p) for p in staging_paths]
+        for g in range(0, len(paths), MAX_ATTACH_PER_PASS):
+            group = paths[g:g + MAX_ATTACH_PER_PASS]
+            aliases = []
+            for k, p in enumerate(group):
+                alias = f"shard{k}"
+                cur.execute(f"ATTACH DATABASE ? AS {alias}", (str(p),))
+                aliases.append((alias, p))
+
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                for alias, p in aliases:
+                    run = _finished_run(cur, alias)
+                    if run is None:
+                        print(f"[merge] skip {p.name}: no finished shard run")
+                        totals["skipped"] += 1
+                        continue
+
+                    shards, shard_index, since = run
+                    params = {"since": since, "shards": shards, "shard_index": shard_index}
+                    for table, sql in merge_sql:
+                        cur.execute(sql.format(src=alias), params)
+                        totals[table] = totals.get(table, 0) + max(cur.rowcount, 0)
+                    totals["merged"] += 1
+                    print(f"[merge] {p.name}: shard {shard_index}/{shards} since {since}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                for alias, _ in aliases:
+                    cur.execute(f"DETACH DATABASE {alias}")
+    finally:
+        cur.close()
+        conn.close()
+
+    return totals
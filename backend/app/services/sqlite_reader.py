@@ -0,0 +1,112 @@
+# backend/app/services/sqlite_reader.py
+#
+# Small pool of read-only raw sqlite3 connections for the hot API read paths
+# (price_service.get_prices_from_db / get_price_columns). Each connection is opened with
+# mode=ro plus the api PRAGMA profile from db.py, and keeps sqlite3's per-connection statement
+# cache, so a constant SQL string is prepared once per connection and then only re-bound.
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from ..db import apply_pragmas
+from .compact_bars import is_compact
+
+
+READ_POOL_SIZE = int(os.getenv("READ_POOL_SIZE", "8"))
+
+_lock = threading.Lock()
+_pools: dict[str, "ReadPool"] = {}
+
+
+class ReadConnection:
+    """One pooled connection plus what the readers need to know about its DB."""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(
+            f"file:{path}?mode=ro", uri=True, check_same_thread=False, cached_statements=64
+        )
+        apply_pragmas(self.conn, "api")
+        self.compact = is_compact(self.conn)
+
+    def execute(self, sql: str, params=()):
+        return self.conn.execute(sql, params)
+
+    def close(self):
+        self.conn.close()
+
+
+class ReadPool:
+    """
+    LIFO pool (recently used connections have warm page caches). Checkouts beyond `size`
+    open a temporary connection instead of waiting.
+    """
+
+    def __init__(self, path: str, size: int = READ_POOL_SIZE):
+        self.path = path
+        self.size = max(1, size)
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=self.size)
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        try:
+            rc = self._idle.get_nowait()
+        except queue.Empty:
+            rc = ReadConnection(self.path)
+        try:
+            yield rc
+        except Exception:
+            rc.close()  # don't hand a connection in an unknown state to the next request
+            raise
+        else:
+            if self.closed:
+                rc.close()
+                return
+            try:
+                self._idle.put_nowait(rc)
+            except queue.Full:
+                rc.close()
+
+    def dispose(self):
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def sqlite_path(db) -> str | None:
+    """File behind a Session/Engine, or None when it is not an on-disk SQLite DB."""
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    url = bind.url
+    if not url.drivername.startswith("sqlite") or url.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(url.database)
+
+
+def get_read_pool(path: str) -> ReadPool:
+    pool = _pools.get(path)
+    if pool is None:
+        with _lock:
+            pool = _pools.setdefault(path, ReadPool(path))
+    return pool
+
+
+def dispose_read_pool(path: str) -> None:
+    """Close a retired snapshot's connections (db.EngineGeneration.dispose)."""
+    with _lock:
+        pool = _pools.pop(path, None)
+    if pool is not None:
+        pool.dispose()
+
+
+def dispose_read_pools() -> None:
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for p in pools:
+        p.dispose()
@@ -0,0 +1,144 @@
+# backend/app/services/symbol_health.py
+
+from sqlalchemy import func, select, text
+
+from ..models import SymbolFailure
+from .backfill_progress import UNMAPPABLE_MSG, batch_coverage
+from .price_loader import _is_rate_limit_msg
+
+
+# Empty for this many daily runs in a row -> symbols.is_active = False
+DEACTIVATE_AFTER_EMPTY_RUNS = 5
+
+# Retry schedule after an empty run: base * 2^(n-1) hours, capped at base * 32
+# (20h -> next daily run, then 40h, 80h, ... ~27 days)
+RETRY_BASE_HOURS = 20
+
+
+# Params: (symbol, last_error, base_hours, base_hours)
+RECORD_EMPTY_SQL = """
+INSERT INTO symbol_failures (symbol, consecutive_empty, consecutive_errors, total_failures,
+                             last_error, last_failure_at, next_retry_at, updated_at)
+VALUES (?, 1, 0, 1, ?, CURRENT_TIMESTAMP, datetime('now', '+' || ? || ' hours'), CURRENT_TIMESTAMP)
+ON CONFLICT(symbol) DO UPDATE SET
+    consecutive_empty = symbol_failures.consecutive_empty + 1,
+    consecutive_errors = 0,
+    total_failures = symbol_failures.total_failures + 1,
+    last_error = excluded.last_error,
+    last_failure_at = CURRENT_TIMESTAMP,
+    next_retry_at = datetime('now', '+' || (? * (1 << min(symbol_failures.consecutive_empty, 5))) || ' hours'),
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+# Batch-level / rate-limit errors say nothing about the symbol: count them, no retry delay.
+# Params: (symbol, last_error)
+RECORD_ERROR_SQL = """
+INSERT INTO symbol_failures (symbol, consecutive_empty, consecutive_errors, total_failures,
+                             last_error, last_failure_at, updated_at)
+VALUES (?, 0, 1, 1, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+ON CONFLICT(symbol) DO UPDATE SET
+    consecutive_errors = symbol_failures.consecutive_errors + 1,
+    total_failures = symbol_failures.total_failures + 1,
+    last_error = excluded.last_error,
+    last_failure_at = CURRENT_TIMESTAMP,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+CLEAR_SQL = "DELETE FROM symbol_failures WHERE symbol = ?"
+
+# Params: (symbol, threshold)
+DEACTIVATE_SQL = """
+UPDATE symbols SET is_active = 0, updated_at = CURRENT_TIMESTAMP
+WHERE symbol = ?1 AND is_active = 1
+  AND (SELECT consecutive_empty FROM symbol_failures f WHERE f.symbol = ?1) >= ?2
+"""
+
+MARK_DEACTIVATED_SQL = """
+UPDATE symbol_failures SET deactivated_at = CURRENT_TIMESTAMP
+WHERE symbol = ?1 AND deactivated_at IS NULL AND consecutive_empty >= ?2
+"""
+
+
+def classify_batch(item: dict) -> tuple[list[str], list[tuple[str, str]], list[tuple[str, str]]]:
+    """
+    Split one pipeline item into (ok, empty, errored) symbols.
+    Returns ok symbols and (symbol, message) pairs for empty / errored ones.
+    Unmappable symbols (no Yahoo ticker) count as empty: they back off and are eventually
+    deactivated instead of being retried every run.
+    """
+    unmappable = set(item.get("unmappable") or ())
+    empty = [(s, UNMAPPABLE_MSG) for s in item["symbols"] if s in unmappable]
+    symbols = [s for s in item["symbols"] if s not in unmappable]
+
+    if item.get("error") is not None:
+        msg = str(item["error"])[:500]
+        return [], empty, [(s, msg) for s in symbols]
+
+    covered = batch_coverage(item.get("cols") or {})
+    yf_errors = item.get("yf_errors") or {}
+
+    ok, errored = [], []
+    for s in symbols:
+        if s in covered:
+            ok.append(s)
+            continue
+        msg = yf_errors.get(s, "no data returned")[:500]
+        if _is_rate_limit_msg(msg):
+            errored.append((s, msg))
+        else:
+            empty.append((s, msg))
+    return ok, empty, errored
+
+
+def make_failure_hook(deactivate_after: int = DEACTIVATE_AFTER_EMPTY_RUNS, base_hours: int = RETRY_BASE_HOURS):
+    """
+    on_batch hook for the daily refresh: records per-symbol outcomes in symbol_failures
+    (same transaction as the bars) and deactivates symbols empty for `deactivate_after` runs.
+    """
+    stats = {"ok": 0, "empty": 0, "errors": 0}
+
+    def _hook(writer, item):
+        ok, empty, errored = classify_batch(item)
+        writer.execute_many(CLEAR_SQL, [(s,) for s in ok])
+        writer.execute_many(RECORD_EMPTY_SQL, [(s, m, base_hours, base_hours) for s, m in empty])
+        writer.execute_many(RECORD_ERROR_SQL, errored)
+
+        if empty and deactivate_after:
+            params = [(s, deactivate_after) for s, _ in empty]
+            writer.execute_many(DEACTIVATE_SQL, params)
+            writer.execute_many(MARK_DEACTIVATED_SQL, params)
+
+        stats["ok"] += len(ok)
+        stats["empty"] += len(empty)
+        stats["errors"] += len(errored)
+
+    _hook.stats = stats
+    return _hook
+
+
+def due_symbols(db, symbols: list[str]) -> list[str]:
+    """
+    Drop symbols whose retry time hasn't come yet (order preserved).
+    """
+    try:
+        rows = db.execute(
+            select(SymbolFailure.symbol).where(SymbolFailure.next_retry_at > func.current_timestamp())
+        ).all()
+    except Exception:
+        return symbols  # old snapshot without the table
+    waiting = {r[0] for r in rows}
+    return [s for s in symbols if s not in waiting]
+
+
+def failure_summary(db) -> dict[str, int]:
+    row = db.execute(
+        text(
+            """
+            SELECT COUNT(*),
+                   SUM(CASE WHEN next_retry_at > CURRENT_TIMESTAMP THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN deactivated_at IS NOT NULL THEN 1 ELSE 0 END)
+            FROM symbol_failures
+            """
+        )
+    ).fetchone()
+    return {"tracked": row[0] or 0, "waiting": row[1] or 0, "deactivated": row[2] or 0}
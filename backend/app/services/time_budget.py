@@ -0,0 +1,142 @@
+# backend/app/services/time_budget.py
+#
+# Wall-clock budget for the daily refresh (run_universe_and_refresh daily --time-budget MIN).
+# The CI job is killed hard at its timeout, which loses in-flight work and leaves no time for
+# the snapshot upload. With a budget, the download pipeline measures how long a batch takes
+# (EWMA of the time between batch starts) and stops taking new batches once the next one would
+# not fit before the deadline. In-flight batches are still written and committed, Yahoo
+# back-off sleeps never run past the deadline, and a refresh_checkpoints row records what
+# was left over for the next run.
+
+import time
+from datetime import datetime
+
+from sqlalchemy import func, select
+
+from ..models import RefreshCheckpoint
+
+
+# seconds kept free before the deadline for the final commit/summary
+DEFAULT_RESERVE_S = 60.0
+
+# a new batch starts only if margin x the typical batch time is left
+BATCH_MARGIN = 1.5
+EWMA_ALPHA = 0.3
+
+
+class DeadlineReached(Exception):
+    """A batch gave up (e.g. a back-off sleep would cross the deadline)."""
+
+
+class RunBudget:
+    """
+    deadline is epoch seconds (time.time()), so spawned market/shard workers share it.
+    """
+
+    def __init__(self, deadline: float, reserve_s: float = DEFAULT_RESERVE_S, margin: float = BATCH_MARGIN):
+        self.deadline = deadline
+        self.started = time.time()
+        self.reserve_s = reserve_s
+        self.margin = margin
+        self.batch_s: float | None = None
+        self.batches = 0
+        self.stopped_early = False
+        self.skipped: list[str] = []
+        self._last_start: float | None = None
+
+    @classmethod
+    def from_minutes(cls, minutes: float, **kwargs) -> "RunBudget":
+        return cls(time.time() + minutes * 60, **kwargs)
+
+    def remaining(self) -> float:
+        return self.deadline - self.reserve_s - time.time()
+
+    def begin(self) -> None:
+        """New pipeline run: the gap since the previous one is not a batch time."""
+        self._last_start = None
+
+    def can_start(self) -> bool:
+        """Called before each batch; False from the first batch that would not fit on."""
+        if self.stopped_early:
+            return False
+
+        now = time.time()
+        if self._last_start is not None:
+            dt = now - self._last_start
+            self.batch_s = dt if self.batch_s is None else EWMA_ALPHA * dt + (1 - EWMA_ALPHA) * self.batch_s
+
+        if self.remaining() <= (self.batch_s or 0.0) * self.margin:
+            self.stop(f"{self.remaining():.0f}s left, batch ~{self.batch_s or 0:.1f}s")
+            return False
+
+        self._last_start = now
+        self.batches += 1
+        return True
+
+    def allows_sleep(self, seconds: float) -> bool:
+        return self.remaining() > seconds
+
+    def stop(self, reason: str) -> None:
+        """No further batches: the deadline is (about to be) reached."""
+        if not self.stopped_early:
+            self.stopped_early = True
+            print(f"[budget] stopping: {reason}")
+
+    def summary(self) -> str:
+        return (
+            f"remaining={max(self.remaining(), 0):.0f}s batches={self.batches} "
+            f"batch_s={self.batch_s or 0:.1f} stopped_early={self.stopped_early} skipped={len(self.skipped)}"
+        )
+
+
+def save_checkpoint(
+    db,
+    market: str,
+    mode: str,
+    started_at: datetime,
+    rows: int,
+    budget: RunBudget | None = None,
+    shard_index: int | None = None,
+) -> None:
+    skipped = list(dict.fromkeys(budget.skipped)) if budget is not None else []
+    db.add(
+        RefreshCheckpoint(
+            market=market,
+            mode=mode,
+            shard_index=shard_index,
+            budget_s=(budget.deadline - budget.started) if budget is not None else None,
+            stopped_early=bool(budget is not None and budget.stopped_early),
+            batches=budget.batches if budget is not None else 0,
+            rows=rows,
+            remaining=len(skipped),
+            remaining_symbols=",".join(skipped) or None,
+            started_at=started_at,
+            finished_at=datetime.utcnow(),
+        )
+    )
+    db.commit()
+
+
+def resume_symbols(db, market: str) -> list[str]:
+    """
+    Symbols the latest run (all of its shards) left unfetched when it hit its budget.
+    """
+    try:
+        latest = db.execute(
+            select(func.max(RefreshCheckpoint.started_at)).where(RefreshCheckpoint.market == market)
+        ).scalar()
+        if latest is None:
+            return []
+        rows = db.execute(
+            select(RefreshCheckpoint.remaining_symbols)
+            .where(RefreshCheckpoint.market == market)
+            .where(RefreshCheckpoint.remaining_symbols.isnot(None))
+            .where(RefreshCheckpoint.finished_at >= latest)
+        ).all()
+    except Exception:
+        return []  # old snapshot without the table
+
+    out: list[str] = []
+    for (syms,) in rows:
+        out.extend(s for s in (syms or "").split(",") if s)
+    return list(dict.fromkeys(out))
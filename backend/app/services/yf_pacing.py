@@ -0,0 +1,127 @@
+# backend/app/services/yf_pacing.py
+
+from datetime import datetime
+
+from ..models import PacingState
+
+
+# Processes of this machine refreshing concurrently against Yahoo (local --shards N). Each one
+# paces at 1/RATE_SHARE of the persisted rate, so together they stay at what one process would send.
+RATE_SHARE = 1
+
+
+def set_rate_share(n: int) -> None:
+    global RATE_SHARE
+    RATE_SHARE = max(1, int(n))
+
+
+class PacingController:
+    """
+    AIMD controller for Yahoo batch downloads.
+
+    - success  -> batch_size += add_batch, sleep_s -= sub_sleep   (additive probe)
+    - throttle -> batch_size *= cut,       sleep_s *= 1 / cut     (multiplicative back-off)
+
+    `last_good` is the operating point of the most recent successful batch; that's what gets
+    persisted, so the next run starts where this one was known to work.
+
+    rate_share > 1 stretches every sleep (and its bounds) by that factor; persisted() divides
+    it back out, so the stored state is always a single process's rate.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        sleep_s: float,
+        min_batch: int = 1,
+        max_batch: int = 100,
+        min_sleep: float = 0.25,
+        max_sleep: float = 60.0,
+        add_batch: int = 1,
+        sub_sleep: float = 0.1,
+        cut: float = 0.5,
+        rate_share: int = 1,
+    ):
+        self.rate_share = max(1, int(rate_share))
+        sleep_s, min_sleep, max_sleep = (x * self.rate_share for x in (sleep_s, min_sleep, max_sleep))
+        self.min_batch, self.max_batch = min_batch, max_batch
+        self.min_sleep, self.max_sleep = min_sleep, max_sleep
+        self.add_batch, self.sub_sleep, self.cut = add_batch, sub_sleep, cut
+
+        self.batch_size = self._clamp_batch(batch_size)
+        self.sleep_s = self._clamp_sleep(sleep_s)
+        self.last_good = (self.batch_size, self.sleep_s)
+
+        self.successes = 0
+        self.throttles = 0
+
+    def _clamp_batch(self, n) -> int:
+        return int(max(self.min_batch, min(self.max_batch, int(n))))
+
+    def _clamp_sleep(self, s) -> float:
+        return float(max(self.min_sleep, min(self.max_sleep, float(s))))
+
+    def on_success(self):
+        self.successes += 1
+        self.last_good = (self.batch_size, self.sleep_s)
+        self.batch_size = self._clamp_batch(self.batch_size + self.add_batch)
+        self.sleep_s = self._clamp_sleep(self.sleep_s - self.sub_sleep)
+
+    def on_throttle(self):
+        self.throttles += 1
+        self.batch_size = self._clamp_batch(self.batch_size * self.cut)
+        self.sleep_s = self._clamp_sleep(self.sleep_s / self.cut)
+        # never resume above the point that just got throttled
+        lb, ls = self.last_good
+        self.last_good = (min(lb, self.batch_size), max(ls, self.sleep_s))
+
+    def current_sleep(self) -> float:
+        return self.sleep_s
+
+    def persisted(self) -> tuple[int, float]:
+        """last_good as a single process's operating point."""
+        batch_size, sleep_s = self.last_good
+        return batch_size, sleep_s / self.rate_share
+
+    def summary(self) -> str:
+        return (
+            f"batch={self.batch_size} sleep={self.sleep_s:.2f}s last_good={self.last_good[0]}/{self.last_good[1]:.2f}s "
+            f"ok={self.successes} throttled={self.throttles}"
+        )
+
+
+def load_pacer(db, key: str, batch_size: int, sleep_s: float, **bounds) -> PacingController:
+    """
+    Controller seeded from the persisted operating point for `key` (e.g. "backfill", "daily"),
+    or from the caller's defaults on first run.
+    """
+    try:
+        row = db.get(PacingState, key)
+    except Exception:
+        row = None  # table missing on an old snapshot -> defaults
+
+    if row is not None:
+        batch_size, sleep_s = row.batch_size, row.sleep_s
+        print(f"[pacing] {key}: resuming at batch={batch_size} sleep={sleep_s:.2f}s")
+    if RATE_SHARE > 1:
+        print(f"[pacing] {key}: sharing the rate with {RATE_SHARE - 1} other process(es)")
+
+    return PacingController(batch_size, sleep_s, rate_share=RATE_SHARE, **bounds)
+
+
+def save_pacer(db, key: str, pacer: PacingController) -> None:
+    batch_size, sleep_s = pacer.persisted()
+    try:
+        row = db.get(PacingState, key)
+        if row is None:
+            row = PacingState(key=key)
+            db.add(row)
+        row.batch_size = int(batch_size)
+        row.sleep_s = float(sleep_s)
+        row.successes = (row.successes or 0) + pacer.successes
+        row.throttles = (row.throttles or 0) + pacer.throttles
+        row.updated_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[pacing] could not persist state for {key}: {e}")
@@ -0,0 +1,208 @@
+# backend/app/symbol_usage.py
+#
+# Per-symbol view counts for refresh prioritization.
+# /api/prices, /api/indicators and /api/fundamentals call record_view() for symbols they found
+# data for; counts are buffered in memory and flushed to a small SQLite file (usage.db) every
+# USAGE_FLUSH_SECONDS, so a page view never waits on a write. The daily job orders its symbols by
+# these counts (most viewed first), so a run cut short by rate limits or the workflow timeout
+# still covers what people look at.
+#
+# Lives in its own DB file: the market DBs are replaced by the daily R2 snapshot. With
+# USAGE_R2_KEY set, the API process also uploads a gzipped copy, which the daily workflow
+# downloads next to the market DBs.
+
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from .db import DATA_DIR
+
+
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", str(DATA_DIR / "usage.db"))
+USAGE_FLUSH_SECONDS = float(os.getenv("USAGE_FLUSH_SECONDS", "30"))
+# Distinct (market, symbol) keys buffered between flushes; views of new keys beyond it are dropped
+USAGE_MAX_PENDING = int(os.getenv("USAGE_MAX_PENDING", "5000"))
+
+# R2 upload of the usage DB (API side); empty key = disabled
+USAGE_R2_KEY = os.getenv("USAGE_R2_KEY", "")
+USAGE_UPLOAD_HOURS = float(os.getenv("USAGE_UPLOAD_HOURS", "6"))
+
+_pending: Counter = Counter()
+_pending_lock = threading.Lock()
+_flusher: threading.Thread | None = None
+_flusher_lock = threading.Lock()
+
+
+# ============================================================
+# DB helpers
+# ============================================================
+def _db_connect(path: str = USAGE_DB_PATH) -> sqlite3.Connection:
+    dirp = os.path.dirname(path)
+    if dirp:
+        os.makedirs(dirp, exist_ok=True)
+    return sqlite3.connect(path, timeout=30)
+
+
+def init_usage_db() -> None:
+    con = _db_connect()
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("""
+    CREATE TABLE IF NOT EXISTS symbol_views (
+      market          TEXT NOT NULL,
+      symbol          TEXT NOT NULL,
+      views           INTEGER NOT NULL DEFAULT 0,
+      first_viewed_at TEXT NOT NULL,
+      last_viewed_at  TEXT NOT NULL,
+      PRIMARY KEY (market, symbol)
+    );
+    """)
+    con.commit()
+    con.close()
+
+
+def _now_iso() -> str:
+    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def _norm_market(market: str) -> str:
+    m = (market or "US").strip().upper()
+    return "INDIA" if m in {"INDIA", "IN", "IND", "NSE"} else "US"
+
+
+# ============================================================
+# Recording (API side)
+# ============================================================
+def record_view(market: str, symbol: str) -> None:
+    """
+    Count one view. In-memory only; the flusher thread writes it out.
+    Callers only record symbols the request found data for, so typos and probes don't add
+    rows to usage.db; USAGE_MAX_PENDING bounds the buffer between flushes.
+    """
+    sym = (symbol or "").strip().upper()
+    if not sym:
+        return
+    key = (_norm_market(market), sym)
+    with _pending_lock:
+        if key not in _pending and len(_pending) >= USAGE_MAX_PENDING:
+            return
+        _pending[key] += 1
+
+
+def flush_views() -> int:
+    """Write buffered counts in one transaction. Returns the number of symbols written."""
+    with _pending_lock:
+        batch = dict(_pending)
+        _pending.clear()
+    if not batch:
+        return 0
+
+    now = _now_iso()
+    con = _db_connect()
+    try:
+        with con:
+            con.executemany(
+                """
+                INSERT INTO symbol_views (market, symbol, views, first_viewed_at, last_viewed_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(market, symbol) DO UPDATE SET
+                    views = symbol_views.views + excluded.views,
+                    last_viewed_at = excluded.last_viewed_at
+                """,
+                [(m, s, n, now, now) for (m, s), n in batch.items()],
+            )
+    except Exception:
+        # put the counts back; the next flush retries
+        with _pending_lock:
+            _pending.update(batch)
+        raise
+    finally:
+        con.close()
+    return len(batch)
+
+
+def upload_usage_snapshot() -> None:
+    """Gzip a consistent copy of usage.db and upload it to R2 under USAGE_R2_KEY."""
+    from .utils.r2_sync import upload_file_to_r2
+
+    tmp_db = USAGE_DB_PATH + ".snapshot"
+    tmp_gz = tmp_db + ".gz"
+    src = _db_connect()
+    dst = sqlite3.connect(tmp_db)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    try:
+        with open(tmp_db, "rb") as fin, gzip.open(tmp_gz, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout)
+        upload_file_to_r2(
+            bucket=os.environ.get("R2_BUCKET", "intrinsic-value-db"),
+            key=USAGE_R2_KEY,
+            local_path=tmp_gz,
+        )
+        print(f"[usage] uploaded {USAGE_R2_KEY}")
+    finally:
+        for p in (tmp_db, tmp_gz):
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def _flusher_loop() -> None:
+    last_upload = time.monotonic()
+    while True:
+        time.sleep(USAGE_FLUSH_SECONDS)
+        try:
+            flush_views()
+            if USAGE_R2_KEY and time.monotonic() - last_upload >= USAGE_UPLOAD_HOURS * 3600:
+                last_upload = time.monotonic()
+                upload_usage_snapshot()
+        except Exception as e:
+            print(f"[usage] flush/upload failed: {e}")
+
+
+def start_usage_flusher() -> None:
+    """Start the background flusher once (idempotent)."""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is not None:
+            return
+        init_usage_db()
+        _flusher = threading.Thread(target=_flusher_loop, name="usage-flusher", daemon=True)
+        _flusher.start()
+    print(f"[usage] recording views -> {USAGE_DB_PATH} (flush every {USAGE_FLUSH_SECONDS:.0f}s)")
+
+
+# ============================================================
+# Reading (daily job side)
+# ============================================================
+def load_view_counts(market: str, path: str | None = None) -> dict[str, int]:
+    """
+    {symbol: views} for one market. Missing file/table (e.g. the API never uploaded one) -> {},
+    which leaves the refresh order alphabetical.
+    """
+    path = path or USAGE_DB_PATH
+    if not os.path.exists(path):
+        return {}
+    con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30)
+    try:
+        rows = con.execute(
+            "SELECT symbol, views FROM symbol_views WHERE market = ?", (_norm_market(market),)
+        ).fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        con.close()
+    return {s: int(v) for s, v in rows}
+
+
+def by_popularity(symbols: list[str], views: dict[str, int]) -> list[str]:
+    """Most viewed first; ties (incl. never viewed) keep their incoming order."""
+    if not views:
+        return list(symbols)
+    return sorted(symbols, key=lambda s: -views.get(s, 0))
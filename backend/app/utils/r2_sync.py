@@ -118,13 +118,14 @@ def sync_latest_db_from_r2(
     local_db_filename: str,
     delete_gz_after: bool = True,
     use_etag_cache: bool = True,
+    daily_guard: bool = True,
 ) -> Tuple[bool, str]:
     """
     Downloads R2 object (gz), extracts to .db, overwrites local .db (atomically),
     and deletes the temp gz.
     Skips download if:
       - ETag matches cached ETag (normal case), OR
-      - we already downloaded today (extra guard)
+      - we already downloaded today (extra guard; daily_guard=False for periodic polling)
     """
     client = _s3_client()
 
@@ -155,7 +156,7 @@ def sync_latest_db_from_r2(
 
         # 2) Secondary skip condition: already downloaded today (even if restarted)
         #    (useful if you restart many times; assumes only one refresh/day)
-        if last_downloaded_on == today and local_db.exists():
+        if daily_guard and last_downloaded_on == today and local_db.exists():
             return (False, f"Already downloaded today ({today}); skipping → {local_db.name}")
 
         # download to UNIQUE temp (do NOT replace stable .gz)
@@ -185,9 +186,18 @@ def sync_latest_db_from_r2(
         _release_lock(lock_file)
 
 
-def sync_all_latest_dbs(local_data_dir: str = "./backend/data") -> None:
+def upload_file_to_r2(*, bucket: str, key: str, local_path: str) -> None:
+    """
+    Upload one local file (e.g. a gzipped usage.db snapshot) to R2.
+    """
+    client = _s3_client()
+    client.upload_file(str(local_path), bucket, key)
+
+
+def sync_all_latest_dbs(local_data_dir: str = "./backend/data", daily_guard: bool = True) -> None:
     """
     Pull both IN & US from R2 to your local backend/data folder.
+    A running API switches to a newly installed snapshot without a restart (db.refresh_engines).
     """
     bucket = os.environ.get("R2_BUCKET", "intrinsic-value-db")
 
@@ -201,6 +211,7 @@ def sync_all_latest_dbs(local_data_dir: str = "./backend/data") -> None:
         local_db_filename="stockapp-us.db",
         delete_gz_after=True,
         use_etag_cache=True,
+        daily_guard=daily_guard,
     )
 
     updated_in, msg_in = sync_latest_db_from_r2(
@@ -210,7 +221,25 @@ def sync_all_latest_dbs(local_data_dir: str = "./backend/data") -> None:
         local_db_filename="stockapp-in.db",
         delete_gz_after=True,
         use_etag_cache=True,
+        daily_guard=daily_guard,
     )
 
     print("[R2 SYNC]", msg_us)
     print("[R2 SYNC]", msg_in)
+
+    # columnar read cache for /api/prices + /api/indicators; rebuilt in the background for every
+    # new snapshot (and whenever the .db changed since the last build), routes read SQLite meanwhile
+    from ..db import get_engine_by_market, refresh_engines
+    from ..services.price_cache import ensure_price_cache_background
+
+    for market, name, updated in (("US", "stockapp-us.db", updated_us), ("INDIA", "stockapp-in.db", updated_in)):
+        # a new snapshot is read from the installed file; otherwise go through the path the
+        # live engines use (the hot-swap version link), so WAL locking covers the export
+        db_path = Path(local_data_dir) / name if updated else get_engine_by_market(market).url.database
+        try:
+            ensure_price_cache_background(market, db_path, force=updated)
+        except Exception as e:
+            print(f"[R2 SYNC] price cache build failed for {name}: {e} (routes fall back to SQLite)")
+
+    if updated_us or updated_in:
+        refresh_engines()  # no-op unless the API enabled hot swap
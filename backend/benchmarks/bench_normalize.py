@@ -0,0 +1,151 @@
+# backend/benchmarks/bench_normalize.py
+#
+# Compare the columnar yfinance normalizer against the old xs()/iterrows() path.
+#
+#   cd backend
+#   python -m benchmarks.bench_normalize --tickers 50 --days 2500
+#
+# Also checks both paths produce identical rows for both MultiIndex orientations.
+
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app.services.price_loader import _as_py_date, _normalize_yf_df, _normalize_yf_columns
+
+
+def _legacy_normalize_yf_df(df: pd.DataFrame, yf_to_orig: dict[str, str]) -> list[dict]:
+    """
+    Verbatim copy of the pre-columnar _normalize_yf_df (reference implementation).
+    """
+    rows: list[dict] = []
+    if df is None or df.empty:
+        return rows
+
+    def _row(orig_sym: str, d: date, r: pd.Series, cols) -> dict:
+        return {
+            "symbol": orig_sym,
+            "date": d,
+            "open": float(r["Open"]) if "Open" in cols and pd.notna(r.get("Open")) else None,
+            "high": float(r["High"]) if "High" in cols and pd.notna(r.get("High")) else None,
+            "low": float(r["Low"]) if "Low" in cols and pd.notna(r.get("Low")) else None,
+            "close": float(r["Close"]) if "Close" in cols and pd.notna(r.get("Close")) else None,
+            "adj_close": float(r["Adj Close"]) if "Adj Close" in cols and pd.notna(r.get("Adj Close")) else None,
+            "volume": int(r["Volume"]) if "Volume" in cols and pd.notna(r.get("Volume")) else None,
+            "source": "yfinance",
+        }
+
+    if isinstance(df.columns, pd.MultiIndex):
+        lvl0 = df.columns.get_level_values(0)
+        lvl1 = df.columns.get_level_values(1)
+
+        tickers = set(yf_to_orig.keys())
+        tickers_in_lvl0 = len(tickers.intersection(set(lvl0))) > 0
+        tickers_in_lvl1 = len(tickers.intersection(set(lvl1))) > 0
+
+        if tickers_in_lvl1 and not tickers_in_lvl0:
+            tickers_in_df = set(lvl1)
+            for yf_sym, orig_sym in yf_to_orig.items():
+                if yf_sym not in tickers_in_df:
+                    continue
+                sub = df.xs(yf_sym, axis=1, level=1, drop_level=True)
+                cols = sub.columns
+                for idx, r in sub.iterrows():
+                    rows.append(_row(orig_sym, _as_py_date(idx), r, cols))
+            return rows
+
+        if tickers_in_lvl0:
+            tickers_in_df = set(lvl0)
+            for yf_sym, orig_sym in yf_to_orig.items():
+                if yf_sym not in tickers_in_df:
+                    continue
+                sub = df.xs(yf_sym, axis=1, level=0, drop_level=True)
+                cols = sub.columns
+                for idx, r in sub.iterrows():
+                    rows.append(_row(orig_sym, _as_py_date(idx), r, cols))
+            return rows
+
+        return rows
+
+    orig_sym = next(iter(yf_to_orig.values()), None)
+    if not orig_sym:
+        return rows
+
+    cols = df.columns
+    for idx, r in df.iterrows():
+        rows.append(_row(orig_sym, _as_py_date(idx), r, cols))
+    return rows
+
+
+def make_frame(n_tickers: int, n_days: int, ticker_first: bool = True, nan_frac: float = 0.02, seed: int = 7):
+    """
+    Synthetic yf.download(group_by="ticker") style frame with some NaN holes.
+    """
+    rng = np.random.default_rng(seed)
+    idx = pd.bdate_range(end="2025-01-31", periods=n_days, name="Date")
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+    data = {}
+    for t in tickers:
+        close = 100 + rng.standard_normal(n_days).cumsum()
+        block = {
+            "Open": close + rng.standard_normal(n_days) * 0.5,
+            "High": close + 1.0,
+            "Low": close - 1.0,
+            "Close": close,
+            "Adj Close": close * 0.98,
+            "Volume": rng.integers(1_000, 5_000_000, n_days).astype(float),
+        }
+        holes = rng.random(n_days) < nan_frac
+        for f in fields:
+            col = block[f].copy()
+            col[holes] = np.nan
+            key = (t, f) if ticker_first else (f, t)
+            data[key] = col
+
+    df = pd.DataFrame(data, index=idx)
+    df.columns = pd.MultiIndex.from_tuples(df.columns)
+    return df, {t: t for t in tickers}
+
+
+def _time(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=50)
+    ap.add_argument("--days", type=int, default=2500)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    for ticker_first in (True, False):
+        df, mapping = make_frame(args.tickers, args.days, ticker_first=ticker_first)
+        orient = "(ticker, field)" if ticker_first else "(field, ticker)"
+
+        legacy = _legacy_normalize_yf_df(df, mapping)
+        assert _normalize_yf_df(df, mapping) == legacy, f"row mismatch for {orient}"
+
+        t_old = _time(_legacy_normalize_yf_df, df, mapping, repeat=args.repeat)
+        t_new = _time(_normalize_yf_columns, df, mapping, repeat=args.repeat)
+        t_rows = _time(_normalize_yf_df, df, mapping, repeat=args.repeat)
+
+        n = len(legacy)
+        print(
+            f"{orient:16s} rows={n:>9,d} | iterrows {t_old:7.3f}s ({n / t_old:>12,.0f} rows/s)"
+            f" | columnar {t_new:7.3f}s ({n / t_new:>12,.0f} rows/s)"
+            f" | columnar+dicts {t_rows:7.3f}s | speedup x{t_old / t_new:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
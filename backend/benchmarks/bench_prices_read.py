@@ -0,0 +1,153 @@
+# backend/benchmarks/bench_prices_read.py
+#
+# Latency of the /api/prices read path: the old ORM get_prices_from_db against the raw
+# read-only path (row dicts and numpy columns) and the memory-mapped price cache.
+#
+#   cd backend
+#   python -m benchmarks.bench_prices_read --symbols 200 --days 6000
+#   python -m benchmarks.bench_prices_read --compact          # same, on the compact layout
+#
+# Builds a throwaway DB in a temp dir and checks every path returns identical rows.
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+import app.models  # noqa: F401  (registers the tables on Base)
+from app.db import Base, get_session_for_file
+from app.models import PriceDaily
+from app.services import price_cache
+from app.services.bar_writer import BulkBarWriter
+from app.services.compact_bars import migrate as migrate_compact
+from app.services.price_service import get_price_columns, get_prices_from_db
+from app.services.sqlite_reader import dispose_read_pools
+
+LIMITS = (380, 800, 5000)
+
+
+def _legacy_get_prices_from_db(db, symbol: str, limit: int = 1000):
+    """
+    Verbatim copy of the ORM get_prices_from_db (reference implementation).
+    """
+    rows = (
+        db.query(PriceDaily)
+        .filter(PriceDaily.symbol == symbol)
+        .order_by(PriceDaily.date.desc())
+        .limit(limit)
+        .all()
+    )
+    rows = list(reversed(rows))
+
+    def clean(x):
+        if x is None:
+            return None
+        if isinstance(x, float) and pd.isna(x):
+            return None
+        return x
+
+    return [
+        {
+            "date": r.date.isoformat(),
+            "open": clean(r.open),
+            "high": clean(r.high),
+            "low": clean(r.low),
+            "close": clean(r.close),
+            "volume": clean(r.volume),
+        }
+        for r in rows
+    ]
+
+
+def make_db(path: Path, n_symbols: int, n_days: int, seed: int = 7) -> list[str]:
+    """Synthetic daily_bars with a few NULL holes; returns the symbols."""
+    rng = random.Random(seed)
+    db = get_session_for_file(path)
+    Base.metadata.create_all(db.get_bind())
+
+    symbols = [f"S{i:04d}" for i in range(n_symbols)]
+    first = date(2000, 1, 3)
+    with BulkBarWriter(db, commit_every=500_000, tune=True, label="bench") as w:
+        for s in symbols:
+            cols = {c: [] for c in ("symbol", "date", "open", "high", "low", "close", "adj_close", "volume", "source")}
+            px = 100.0
+            for i in range(n_days):
+                px = max(1.0, px + rng.gauss(0, 1))
+                hole = rng.random() < 0.01
+                cols["symbol"].append(s)
+                cols["date"].append(first + timedelta(days=i))
+                for c in ("open", "high", "low", "close", "adj_close"):
+                    cols[c].append(None if hole else px)
+                cols["volume"].append(None if hole else rng.randint(1_000, 5_000_000))
+                cols["source"].append("bench")
+            w.write(cols)
+    db.close()
+    db.get_bind().dispose()
+    return symbols
+
+
+def _time_ms(fn, symbols: list[str], repeat: int) -> tuple[float, float]:
+    """(median, p95) milliseconds per call over `repeat` calls on random symbols."""
+    rng = random.Random(1)
+    samples = []
+    for _ in range(repeat):
+        s = rng.choice(symbols)
+        t0 = time.perf_counter()
+        fn(s)
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=200)
+    ap.add_argument("--days", type=int, default=6000)
+    ap.add_argument("--repeat", type=int, default=200)
+    ap.add_argument("--compact", action="store_true", help="migrate the DB to the compact layout first")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        t0 = time.perf_counter()
+        symbols = make_db(path, args.symbols, args.days)
+        print(f"built {args.symbols} x {args.days} bars in {time.perf_counter() - t0:.1f}s")
+
+        db = get_session_for_file(path)
+        if args.compact:
+            print(f"compact: {migrate_compact(db.get_bind())}")
+        price_cache.PRICE_CACHE_DIR = Path(tmp) / "price_cache"
+        price_cache.build_price_cache("US", path)
+
+        for s in symbols[:3]:
+            ref = _legacy_get_prices_from_db(db, s, limit=5000)
+            assert get_prices_from_db(db, s, limit=5000) == ref, f"row mismatch for {s}"
+            assert price_cache.columns_to_rows(get_price_columns(db, s, limit=5000)) == ref, f"column mismatch for {s}"
+            assert price_cache.columns_to_rows(price_cache.cached_columns("US", s, limit=5000)) == ref
+
+        paths = {
+            "orm (old)": lambda s, n: _legacy_get_prices_from_db(db, s, limit=n),
+            "raw rows": lambda s, n: get_prices_from_db(db, s, limit=n),
+            "raw columns": lambda s, n: get_price_columns(db, s, limit=n),
+            "cache rows": lambda s, n: price_cache.columns_to_rows(price_cache.cached_columns("US", s, limit=n)),
+            "cache columns": lambda s, n: price_cache.cached_columns("US", s, limit=n),
+        }
+        layout = "compact" if args.compact else "legacy"
+        for n in LIMITS:
+            for name, fn in paths.items():
+                med, p95 = _time_ms(lambda s: fn(s, n), symbols, args.repeat)
+                print(f"{layout:7s} rows={n:>5d} {name:14s} median {med:8.3f} ms  p95 {p95:8.3f} ms")
+
+        db.close()
+        db.get_bind().dispose()
+        dispose_read_pools()
+        price_cache._loaded.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# backend/tests/conftest.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import app.models  # noqa: F401  (registers the tables on Base)
+from app.db import Base, get_session_for_file
+from app.services import price_loader
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on a fresh market DB file."""
+    session = get_session_for_file(tmp_path / "market.db")
+    Base.metadata.create_all(session.get_bind())
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+def fake_download(tickers, start=None, end=None, **kwargs):
+    """yf.download(group_by="ticker") stand-in: 5 business days of bars per ticker."""
+    idx = pd.bdate_range(end="2025-01-31", periods=5, name="Date")
+    data = {}
+    for t in tickers:
+        for field, value in (("Open", 10.0), ("High", 11.0), ("Low", 9.0), ("Close", 10.5), ("Adj Close", 10.4)):
+            data[(t, field)] = np.full(len(idx), value)
+        data[(t, "Volume")] = np.full(len(idx), 1000.0)
+    df = pd.DataFrame(data, index=idx)
+    df.columns = pd.MultiIndex.from_tuples(df.columns)
+    return df
+
+
+@pytest.fixture
+def yf_stub(monkeypatch):
+    """No network: yf.download returns fake_download's frame, pacing sleeps are skipped."""
+    calls = []
+
+    def _download(*args, **kwargs):
+        calls.append(kwargs.get("tickers"))
+        return fake_download(**kwargs)
+
+    monkeypatch.setattr(price_loader.yf, "download", _download)
+    monkeypatch.setattr(price_loader.time, "sleep", lambda s: None)
+    return calls
@@ -0,0 +1,49 @@
+# backend/tests/test_backfill_progress.py
+
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import select
+
+from app.models import BackfillProgress
+from app.services import price_loader
+from app.services.backfill_progress import pending_symbols, progress_params, record_batch
+from app.services.price_loader import backfill_symbols
+
+
+def _progress(db) -> dict[str, tuple]:
+    rows = db.execute(select(BackfillProgress.symbol, BackfillProgress.state, BackfillProgress.attempts)).all()
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def _throttled(*args, **kwargs):
+    raise Exception("429 Too Many Requests")
+
+
+def test_batch_errors_do_not_use_up_attempts(db, yf_stub, monkeypatch):
+    monkeypatch.setattr(price_loader.yf, "download", _throttled)
+    for _ in range(4):  # more runs than max_attempts
+        backfill_symbols(db, ["AAA"], years=1, sleep_s=0.0, adaptive=False, on_batch=record_batch)
+
+    assert _progress(db) == {"AAA": ("retry", 0)}
+    assert pending_symbols(db, ["AAA"], date.today()) == ["AAA"]
+
+
+def test_empty_symbol_uses_up_attempts(db, yf_stub, monkeypatch):
+    monkeypatch.setattr(price_loader.yf, "download", lambda *a, **k: pd.DataFrame())
+    for _ in range(3):
+        backfill_symbols(db, ["AAA"], years=1, sleep_s=0.0, adaptive=False, on_batch=record_batch)
+
+    assert _progress(db) == {"AAA": ("empty", 3)}
+    assert pending_symbols(db, ["AAA"], date.today()) == []
+
+
+def test_throttled_symbol_is_retry_not_empty():
+    item = {
+        "symbols": ["AAA", "BBB"],
+        "start": date(2024, 1, 1),
+        "cols": {},
+        "yf_errors": {"AAA": "YFRateLimitError('Too Many Requests. Rate limited.')"},
+    }
+    states = {p[0]: p[1] for p in progress_params(item)}
+    assert states == {"AAA": "retry", "BBB": "empty"}
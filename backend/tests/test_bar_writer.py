@@ -0,0 +1,76 @@
+# backend/tests/test_bar_writer.py
+
+import pytest
+from sqlalchemy import text
+
+from app.services.bar_writer import INSERT_MISSING_BARS_SQL, BulkBarWriter
+from app.services.compact_bars import migrate as migrate_compact
+
+
+def _bars(rows):
+    """[(symbol, date, close)] -> column dict (open/high/low follow close, fixed volume)."""
+    cols = {c: [] for c in ("symbol", "date", "open", "high", "low", "close", "adj_close", "volume", "source")}
+    for sym, day, close in rows:
+        for c, v in (("symbol", sym), ("date", day), ("open", close), ("high", close), ("low", close),
+                     ("close", close), ("adj_close", close), ("volume", 100), ("source", "yahoo")):
+            cols[c].append(v)
+    return cols
+
+
+FIRST = [("AAA", "2025-01-02", 10.0), ("AAA", "2025-01-03", 11.0), ("BBB", "2025-01-02", 20.0)]
+SECOND = [
+    ("AAA", "2025-01-02", 10.0),  # unchanged
+    ("AAA", "2025-01-03", 11.5),  # late fix
+    ("BBB", "2025-01-02", 20.0),  # unchanged
+    ("BBB", "2025-01-03", 21.0),  # new
+]
+
+
+def _counts(w) -> tuple[int, int, int, int]:
+    return w.rows, w.inserted, w.updated, w.unchanged
+
+
+@pytest.fixture(params=[False, True], ids=["legacy", "compact"])
+def seeded(db, request):
+    with BulkBarWriter(db) as w:
+        w.write(_bars(FIRST))
+    assert _counts(w) == (3, 3, 0, 0)
+    if request.param:
+        db.close()
+        migrate_compact(db.get_bind())
+    # age the stored bars so an untouched row is recognizable
+    table = "bars_compact" if request.param else "daily_bars"
+    old = "0" if request.param else "'2000-01-01 00:00:00'"
+    db.execute(text(f"UPDATE {table} SET updated_at = {old}"))
+    db.commit()
+    return db
+
+
+def _closes(db) -> dict[tuple[str, str], tuple[float, bool]]:
+    rows = db.execute(text("SELECT symbol, date, close, updated_at > '2001-01-01' FROM daily_bars"))
+    return {(r[0], r[1]): (r[2], bool(r[3])) for r in rows}
+
+
+def test_counts_inserted_updated_unchanged(seeded):
+    with BulkBarWriter(seeded) as w:
+        w.write(_bars(SECOND))
+    assert _counts(w) == (4, 1, 1, 2)
+
+    assert _closes(seeded) == {
+        ("AAA", "2025-01-02"): (10.0, False),  # identical re-download: not rewritten
+        ("AAA", "2025-01-03"): (11.5, True),
+        ("BBB", "2025-01-02"): (20.0, False),
+        ("BBB", "2025-01-03"): (21.0, True),
+    }
+
+    with BulkBarWriter(seeded) as w:
+        w.write(_bars(SECOND))
+    assert _counts(w) == (4, 0, 0, 4)
+
+
+def test_insert_only_writer_counts(seeded):
+    with BulkBarWriter(seeded, upsert_sql=INSERT_MISSING_BARS_SQL) as w:
+        w.write(_bars(SECOND))
+    assert _counts(w) == (4, 1, 0, 3)
+    assert _closes(seeded)[("AAA", "2025-01-03")] == (11.0, False)
+
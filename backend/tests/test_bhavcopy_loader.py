@@ -0,0 +1,35 @@
+# backend/tests/test_bhavcopy_loader.py
+
+import pytest
+from sqlalchemy import text
+
+from app.services.bar_writer import BulkBarWriter
+from app.services.bhavcopy_loader import ingest_bhavcopy
+from app.services.compact_bars import migrate as migrate_compact
+
+BHAVCOPY = """SYMBOL,SERIES,OPEN,HIGH,LOW,CLOSE,TOTTRDQTY,TIMESTAMP
+RELIANCE,EQ,2900,2950,2880,2940,100000,02-JAN-2025
+RELIANCE,EQ,2940,2990,2930,2980,120000,03-JAN-2025
+"""
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_bhavcopy_only_fills_missing_bars(db, tmp_path, compact):
+    yahoo = {  # adjusted bar already stored for 2025-01-02
+        "symbol": ["RELIANCE.NS"], "date": ["2025-01-02"], "open": [1450.0], "high": [1475.0],
+        "low": [1440.0], "close": [1470.0], "adj_close": [1465.0], "volume": [200000], "source": ["yahoo"],
+    }
+    with BulkBarWriter(db) as w:
+        w.write(yahoo)
+    if compact:
+        migrate_compact(db.get_bind())
+
+    path = tmp_path / "cm03JAN2025bhav.csv"
+    path.write_text(BHAVCOPY)
+    ingest_bhavcopy(db, path)
+
+    rows = db.execute(text("SELECT date, close, adj_close, source FROM daily_bars ORDER BY date")).all()
+    assert [tuple(r) for r in rows] == [
+        ("2025-01-02", 1470.0, 1465.0, "yahoo"),
+        ("2025-01-03", 2980.0, None, "bhavcopy"),
+    ]
@@ -0,0 +1,86 @@
+# backend/tests/test_compact_bars.py
+
+import pytest
+from sqlalchemy import text
+
+from app.services.bar_writer import BulkBarWriter
+from app.services.compact_bars import db_is_compact, migrate
+
+BARS = {
+    "symbol": ["AAA", "AAA", "BRK.B", "BRK.B"],
+    "date": ["2025-01-02", "2025-01-03", "2025-01-02", "2025-01-03"],
+    "open": [10.0, None, 400.0, 401.0],
+    "high": [11.0, None, 405.0, 406.0],
+    "low": [9.0, None, 395.0, 396.0],
+    "close": [10.5, None, 402.0, 403.0],
+    "adj_close": [10.4, None, None, 403.0],
+    "volume": [1000, None, 250, 260],
+    "source": ["yahoo", "yahoo", "flatfile", None],
+}
+
+ROWS_SQL = """
+SELECT symbol, date, open, high, low, close, adj_close, volume, source, updated_at
+FROM daily_bars ORDER BY symbol, date
+"""
+
+
+def _rows(db) -> list[tuple]:
+    return [tuple(r) for r in db.execute(text(ROWS_SQL))]
+
+
+def _indexes(db) -> set[str]:
+    rows = db.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'daily_bars'"))
+    return {r[0] for r in rows}
+
+
+def test_migrate_and_revert_round_trip(db):
+    with BulkBarWriter(db) as w:
+        w.write(BARS)
+    before, indexes = _rows(db), _indexes(db)
+    db.close()
+
+    stats = migrate(db.get_bind())
+    assert stats == {"bars": 4, "symbols": 2, "sources": 2}
+    assert db_is_compact(db)
+    assert _rows(db) == before
+    db.close()
+    with pytest.raises(ValueError):
+        migrate(db.get_bind())
+
+    assert migrate(db.get_bind(), revert=True) == {"bars": 4}
+    assert not db_is_compact(db)
+    assert _rows(db) == before
+    assert _indexes(db) == indexes
+    leftovers = db.execute(
+        text("SELECT name FROM sqlite_master WHERE name IN ('bars_compact', 'bar_symbols', 'bar_sources')")
+    ).all()
+    assert leftovers == []
+
+
+def test_view_triggers_insert_fill_and_delete(db):
+    with BulkBarWriter(db) as w:
+        w.write(BARS)
+    db.close()
+    migrate(db.get_bind())
+
+    insert = text(
+        """
+        INSERT INTO daily_bars (symbol, date, open, high, low, close, adj_close, volume, source)
+        VALUES (:symbol, :date, :open, NULL, NULL, :close, NULL, :volume, :source)
+        """
+    )
+    # new symbol and source through the view
+    db.execute(insert, {"symbol": "CCC", "date": "2025-01-06", "open": 5.0, "close": 5.5, "volume": 10, "source": "bhavcopy"})
+    # existing bar: non-NULL values win, NULLs keep what is stored
+    db.execute(insert, {"symbol": "AAA", "date": "2025-01-02", "open": None, "close": 12.0, "volume": None, "source": None})
+    db.execute(text("DELETE FROM daily_bars WHERE symbol = 'BRK.B' AND date = '2025-01-03'"))
+    db.commit()
+
+    got = {
+        (r[0], r[1]): r[2:]
+        for r in db.execute(text("SELECT symbol, date, open, high, close, adj_close, volume, source FROM daily_bars"))
+    }
+    assert got[("CCC", "2025-01-06")] == (5.0, None, 5.5, None, 10, "bhavcopy")
+    assert got[("AAA", "2025-01-02")] == (10.0, 11.0, 12.0, 10.4, 1000, "yahoo")
+    assert ("BRK.B", "2025-01-03") not in got
+    assert len(got) == 4
@@ -0,0 +1,53 @@
+# backend/tests/test_flatfile_importer.py
+
+import pytest
+from sqlalchemy import text
+
+from app.services import flatfile_importer
+from app.services.flatfile_importer import import_flat_files
+
+CSV = """date,ticker,open,high,low,close,volume
+2025-01-02,000123,10,11,9,10.5,1000
+2025-01-03,000123,10.5,11.5,10,11,1200
+2025-01-02,000456,20,21,19,20.5,500
+"""
+
+
+def _symbols(db) -> list[str]:
+    return [r[0] for r in db.execute(text("SELECT DISTINCT symbol FROM daily_bars ORDER BY symbol"))]
+
+
+def _indexes(db) -> set[str]:
+    rows = db.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'daily_bars'"))
+    return {r[0] for r in rows}
+
+
+def test_symbol_column_keeps_leading_zeros(db, tmp_path):
+    path = tmp_path / "eod.csv"
+    path.write_text(CSV)
+
+    totals = import_flat_files(db, path, market=None)
+    assert totals == {"rows": 3, "rejected": 0, "files": 1}
+    assert _symbols(db) == ["000123", "000456"]
+
+
+def test_failed_deferred_load_commits_nothing_and_restores_indexes(db, tmp_path, monkeypatch):
+    path = tmp_path / "eod.csv"
+    path.write_text(CSV)
+    before = _indexes(db)
+
+    real = flatfile_importer.normalize_chunk
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(flatfile_importer, "normalize_chunk", flaky)
+    with pytest.raises(OSError):
+        import_flat_files(db, path, market=None, chunk_rows=1, commit_every=None, defer_indexes=True)
+
+    assert _symbols(db) == []  # the uncommitted first chunk was rolled back
+    assert _indexes(db) == before
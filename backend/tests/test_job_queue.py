@@ -0,0 +1,62 @@
+# backend/tests/test_job_queue.py
+
+import pytest
+
+from app import job_queue
+
+
+@pytest.fixture
+def queue_db(tmp_path, monkeypatch):
+    """Fresh jobs.db; start_workers() is a no-op (no worker threads in tests)."""
+    monkeypatch.setattr(job_queue, "JOBS_DB_PATH", str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_queue, "_workers", [object()])
+    job_queue.init_jobs_db()
+
+
+def _expire_lease(job_id: int) -> None:
+    con = job_queue._db_connect()
+    con.execute("UPDATE refresh_jobs SET heartbeat_at = '2000-01-01T00:00:00Z' WHERE id = ?", (job_id,))
+    con.close()
+
+
+def test_restart_requeues_job_with_expired_lease(queue_db):
+    job, _ = job_queue.enqueue("refresh", "US", "AAPL")
+    claimed = job_queue._claim_next()
+    assert claimed["id"] == job["id"] and job_queue.get_job(job["id"])["owner"] == job_queue.OWNER_ID
+
+    # the owning process died and stopped heartbeating; the next one must run it again
+    _expire_lease(job["id"])
+    job_queue._recover_and_prune()
+    assert job_queue.get_job(job["id"])["state"] == "queued"
+    assert job_queue._claim_next()["id"] == job["id"]
+
+
+def test_restart_leaves_live_owners_job_running(queue_db, monkeypatch):
+    job, _ = job_queue.enqueue("refresh", "US", "AAPL")
+    job_queue._claim_next()
+
+    # a second process sharing jobs.db starts up while the first still runs the job
+    monkeypatch.setattr(job_queue, "OWNER_ID", "other-host:1:abcd")
+    job_queue._recover_and_prune()
+    assert job_queue.get_job(job["id"])["state"] == "running"
+    assert job_queue._claim_next() is None
+    assert job_queue._heartbeat() == 0  # only the owner extends the lease
+
+
+def test_heartbeat_keeps_lease_alive(queue_db):
+    job, _ = job_queue.enqueue("rebuild", "US", "MSFT")
+    job_queue._claim_next()
+    _expire_lease(job["id"])
+
+    assert job_queue._heartbeat() == 1
+    job_queue._recover_and_prune()
+    assert job_queue.get_job(job["id"])["state"] == "running"
+
+
+def test_restart_keeps_finished_jobs(queue_db):
+    job, _ = job_queue.enqueue("refresh", "US", "MSFT")
+    job_queue._claim_next()
+    job_queue._finish(job["id"], "done", rows=3)
+
+    job_queue._recover_and_prune()
+    assert job_queue.get_job(job["id"])["state"] == "done"
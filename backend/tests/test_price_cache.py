@@ -0,0 +1,69 @@
+# backend/tests/test_price_cache.py
+
+import threading
+
+import pytest
+
+from app.services import price_cache
+from app.services.bar_writer import BulkBarWriter
+
+
+@pytest.fixture
+def cache_env(db, tmp_path, monkeypatch):
+    """Market DB with two symbols; empty cache dir and in-memory cache state."""
+    monkeypatch.setattr(price_cache, "PRICE_CACHE_DIR", tmp_path / "price_cache")
+    monkeypatch.setattr(price_cache, "PRICE_CACHE_ENABLED", True)
+    monkeypatch.setattr(price_cache, "_loaded", {})
+    monkeypatch.setattr(price_cache, "_dirty", {})
+    monkeypatch.setattr(price_cache, "_building", set())
+
+    cols = {
+        "symbol": ["AAA", "AAA", "BBB"], "date": ["2025-01-02", "2025-01-03", "2025-01-02"],
+        "close": [10.0, 11.0, 20.0], "source": ["yahoo"] * 3,
+    }
+    with BulkBarWriter(db) as w:
+        w.write(cols)
+    db.get_bind().dispose()
+    return tmp_path / "market.db"
+
+
+def test_marks_before_first_load_are_kept(cache_env):
+    price_cache.build_price_cache("US", cache_env)
+    price_cache.mark_dirty("US", "AAA")  # on-demand job ran before any request loaded the cache
+
+    assert price_cache.cached_columns("US", "AAA") is None
+    assert price_cache.cached_columns("US", "BBB")["close"].tolist() == [20.0]
+
+
+def test_newer_version_clears_only_older_marks(cache_env):
+    price_cache.build_price_cache("US", cache_env)
+    price_cache.mark_dirty("US", "AAA")
+    assert price_cache.cached_columns("US", "AAA") is None
+
+    price_cache.build_price_cache("US", cache_env)  # exported after the write: has it
+    price_cache.mark_dirty("US", "BBB")
+    assert price_cache.cached_columns("US", "AAA")["close"].tolist() == [10.0, 11.0]
+    assert price_cache.cached_columns("US", "BBB") is None
+
+
+def test_background_build_serves_sqlite_until_current(cache_env, monkeypatch):
+    price_cache.build_price_cache("US", cache_env)
+    assert price_cache.cached_columns("US", "AAA") is not None
+
+    gate = threading.Event()
+    real_build = price_cache.build_price_cache
+
+    def slow_build(*args, **kwargs):
+        gate.wait(5)
+        return real_build(*args, **kwargs)
+
+    monkeypatch.setattr(price_cache, "build_price_cache", slow_build)
+    t = price_cache.ensure_price_cache_background("US", cache_env, force=True)
+    assert t is not None
+    assert price_cache.cached_columns("US", "AAA") is None  # stale version retired
+    assert price_cache.ensure_price_cache_background("US", cache_env, force=True) is None  # one build at a time
+    gate.set()
+    t.join(5)
+
+    assert price_cache.cached_columns("US", "AAA")["close"].tolist() == [10.0, 11.0]
+    assert price_cache.ensure_price_cache_background("US", cache_env) is None  # current now
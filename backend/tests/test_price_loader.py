@@ -0,0 +1,65 @@
+# backend/tests/test_price_loader.py
+
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.models import DailyBar
+from app.services.bar_writer import BulkBarWriter
+from app.services.price_loader import backfill_symbols, refresh_incremental, reload_history
+from app.services.refresh_planner import build_plan
+from app.services.time_budget import RunBudget
+
+
+def _bars(db) -> int:
+    return db.execute(select(func.count()).select_from(DailyBar)).scalar()
+
+
+def test_backfill_symbols_writes_bars(db, yf_stub):
+    n = backfill_symbols(db, ["AAA", "BBB"], years=1, batch_size=5, sleep_s=0.0)
+    assert n == 10
+    assert _bars(db) == 10
+    assert yf_stub
+
+
+def test_backfill_symbols_respects_budget(db, yf_stub):
+    budget = RunBudget(time.time() - 1)  # deadline already passed
+    n = backfill_symbols(db, ["AAA", "BBB"], years=1, sleep_s=0.0, budget=budget)
+    assert n == 0
+    assert not yf_stub
+    assert budget.stopped_early and set(budget.skipped) == {"AAA", "BBB"}
+
+
+def test_reload_history_respects_budget(db, yf_stub):
+    budget = RunBudget(time.time() - 1)
+    assert reload_history(db, ["AAA"], budget=budget) == 0
+    assert not yf_stub
+    assert budget.skipped == ["AAA"]
+
+    assert reload_history(db, ["AAA"], sleep_s=0.0) == 5
+
+
+def _seed_bar(db, symbol: str, day: date):
+    cols = {"symbol": [symbol], "date": [day], "close": [10.0], "source": ["yahoo"]}
+    with BulkBarWriter(db) as w:
+        w.write(cols)
+
+
+def test_incremental_interleaves_buckets_by_rank(db, yf_stub):
+    today = date.today()
+    _seed_bar(db, "BBB", today - timedelta(days=3))  # own start-date bucket, ranked 2nd
+
+    refresh_incremental(
+        db, ["AAA", "BBB", "CCC", "DDD"], batch_size=1, sleep_s=0.0, adaptive=False, expected_last=today
+    )
+    assert yf_stub == [["AAA"], ["BBB"], ["CCC"], ["DDD"]]
+
+
+def test_plan_interleaves_buckets_by_rank(db):
+    now = datetime(2025, 1, 31, 23, 0)  # Friday, after the US close settles
+    _seed_bar(db, "BBB", date(2025, 1, 28))
+
+    plan = build_plan(db, "US", ["AAA", "BBB", "CCC"], batch_size=1, now_utc=now)
+    assert [r[0] for r in plan["requests"]] == ["AAA", "BBB", "CCC"]
+    assert plan["buckets"] == 2 and plan["estimated_requests"] == 3
@@ -0,0 +1,111 @@
+# backend/tests/test_price_service.py
+
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from app.db import Base, get_session_for_file
+from app.models import PriceDaily
+from app.services.bar_writer import BulkBarWriter
+from app.services.compact_bars import migrate as migrate_compact
+from app.services.price_service import _to_float, upsert_prices
+
+STORED = {
+    "symbol": ["AAA"] * 3,
+    "date": ["2025-01-02", "2025-01-03", "2025-01-06"],
+    "open": [10.0, None, 12.0],
+    "high": [11.0, 11.5, None],
+    "low": [9.0, None, 11.0],
+    "close": [10.5, 11.0, None],
+    "volume": [1000, None, 900],
+    "source": ["yahoo"] * 3,
+}
+
+# overlaps with different values (must not overwrite), fills NULLs, adds a date, and has a
+# row without close (skipped)
+DOWNLOAD = pd.DataFrame(
+    {
+        "date": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-06", "2025-01-07", "2025-01-08"]),
+        "open": [99.0, 10.8, 99.0, 13.0, 14.0],
+        "high": [99.0, 99.0, 12.5, 13.5, 14.5],
+        "low": [99.0, 10.6, 99.0, 12.5, 13.5],
+        "close": [99.0, 99.0, 12.2, 13.2, None],
+        "volume": [99.0, 1100.0, 99.0, 1300.0, 1400.0],
+    }
+)
+
+ROWS_SQL = "SELECT date, open, high, low, close, volume FROM daily_bars WHERE symbol = 'AAA' ORDER BY date"
+
+
+def _legacy_upsert_prices(db, symbol: str, df: pd.DataFrame) -> int:
+    """The per-row ORM upsert_prices this replaced (reference implementation)."""
+    n = 0
+    for row in df.to_dict(orient="records"):
+        d = row.get("date")
+        vals = {c: _to_float(row.get(c)) for c in ("open", "high", "low", "close", "volume")}
+        if d is None or vals["close"] is None:
+            continue
+        existing = db.query(PriceDaily).filter(PriceDaily.symbol == symbol, PriceDaily.date == d).first()
+        if not existing:
+            db.add(PriceDaily(symbol=symbol, date=d, **vals))
+            n += 1
+            continue
+        changed = False
+        for c, v in vals.items():
+            cur = getattr(existing, c)
+            if (cur is None or (isinstance(cur, float) and pd.isna(cur))) and v is not None:
+                setattr(existing, c, v)
+                changed = True
+        n += changed
+    db.commit()
+    return n
+
+
+def _seed(db):
+    with BulkBarWriter(db) as w:
+        w.write(STORED)
+
+
+def _rows(db) -> list[tuple]:
+    return [
+        (r[0], *(None if v is None else float(v) for v in r[1:]))
+        for r in db.execute(text(ROWS_SQL))
+    ]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_upsert_prices_matches_per_row_fill(db, tmp_path, compact):
+    ref = get_session_for_file(tmp_path / "reference.db")
+    Base.metadata.create_all(ref.get_bind())
+    _seed(ref)
+    legacy_df = DOWNLOAD.assign(date=DOWNLOAD["date"].dt.date)
+    expected_n = _legacy_upsert_prices(ref, "AAA", legacy_df)
+    expected = _rows(ref)
+    ref.close()
+    ref.get_bind().dispose()
+
+    _seed(db)
+    if compact:
+        db.close()
+        migrate_compact(db.get_bind())
+
+    assert upsert_prices(db, "AAA", DOWNLOAD) == expected_n == 3
+    assert _rows(db) == expected
+    assert expected == [
+        ("2025-01-02", 10.0, 11.0, 9.0, 10.5, 1000.0),
+        ("2025-01-03", 10.8, 11.5, 10.6, 11.0, 1100.0),
+        ("2025-01-06", 12.0, 12.5, 11.0, 12.2, 900.0),
+        ("2025-01-07", 13.0, 13.5, 12.5, 13.2, 1300.0),
+    ]
+
+    # nothing left to fill: a repeat download writes nothing
+    assert upsert_prices(db, "AAA", DOWNLOAD) == 0
+    assert _rows(db) == expected
+
+
+def test_upsert_prices_ignores_empty_input(db):
+    assert upsert_prices(db, "AAA", pd.DataFrame()) == 0
+    assert upsert_prices(db, "AAA", pd.DataFrame({"date": [date(2025, 1, 2)], "close": [None]})) == 0
+    assert _rows(db) == []
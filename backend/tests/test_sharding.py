@@ -0,0 +1,93 @@
+# backend/tests/test_sharding.py
+
+import pytest
+from sqlalchemy import text
+
+from app.db import get_session_for_file
+from app.services.bar_writer import BulkBarWriter
+from app.services.compact_bars import migrate as migrate_compact
+from app.services.sharding import finish_shard_run, merge_staging, prepare_staging, start_shard_run
+from app.services.yf_pacing import PacingController, save_pacer
+
+OLD = "2020-01-01 00:00:00"
+
+
+def _bars(symbols, close, day="2025-01-02"):
+    n = len(symbols)
+    return {"symbol": symbols, "date": [day] * n, "close": [close] * n, "source": ["yahoo"] * n}
+
+
+def _age_everything(db, compact: bool):
+    """Pretend the target's rows were written long before any shard run started."""
+    if compact:
+        db.execute(text("UPDATE bars_compact SET updated_at = CAST(strftime('%s', :t) AS INTEGER)"), {"t": OLD})
+    else:
+        db.execute(text("UPDATE daily_bars SET updated_at = :t"), {"t": OLD})
+    db.execute(text("UPDATE pacing_state SET updated_at = :t"), {"t": OLD})
+    db.commit()
+
+
+def _run_shard(path, shard_index: int, symbols, pacing: tuple[int, float]):
+    db = get_session_for_file(path)
+    try:
+        run_id = start_shard_run(db, "US", 2, shard_index)
+        with BulkBarWriter(db) as w:
+            w.write(_bars(symbols, 20.0, day="2025-01-03"))
+        pacer = PacingController(*pacing)
+        pacer.on_success()
+        save_pacer(db, "daily", pacer)
+        finish_shard_run(db, run_id, len(symbols))
+    finally:
+        db.close()
+        db.get_bind().dispose()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_merge_folds_in_only_rows_touched_by_finished_runs(db, tmp_path, compact):
+    with BulkBarWriter(db) as w:
+        w.write(_bars(["AAA", "BBB"], 10.0))
+    save_pacer(db, "daily", PacingController(30, 1.0))
+    if compact:
+        migrate_compact(db.get_bind())
+    _age_everything(db, compact)
+    src = db.get_bind().url.database
+
+    paths = [prepare_staging(src, tmp_path / f"shard{i}.db") for i in range(3)]
+    _run_shard(paths[0], 0, ["AAA"], pacing=(40, 1.0))
+    _run_shard(paths[1], 1, ["BBB"], pacing=(10, 2.0))  # throttled harder: slowest rate wins
+
+    # an untouched copied row edited in place keeps its old updated_at: not part of the run
+    stale = get_session_for_file(paths[1])
+    if compact:
+        stale.execute(text(
+            """
+            UPDATE bars_compact SET close = 99.0, updated_at = CAST(strftime('%s', :t) AS INTEGER)
+            WHERE symbol_id = (SELECT id FROM bar_symbols WHERE symbol = 'AAA')
+            """
+        ), {"t": OLD})
+    else:
+        stale.execute(text("UPDATE daily_bars SET close = 99.0, updated_at = :t WHERE symbol = 'AAA'"), {"t": OLD})
+    stale.commit()
+    stale.close()
+    stale.get_bind().dispose()
+
+    db.close()
+    totals = merge_staging(db, paths)  # paths[2] never finished a run
+
+    assert totals["merged"] == 2 and totals["skipped"] == 1
+    assert totals["daily_bars"] == 2
+    rows = db.execute(text("SELECT symbol, date, close FROM daily_bars ORDER BY symbol, date")).all()
+    assert [tuple(r) for r in rows] == [
+        ("AAA", "2025-01-02", 10.0), ("AAA", "2025-01-03", 20.0),
+        ("BBB", "2025-01-02", 10.0), ("BBB", "2025-01-03", 20.0),
+    ]
+    pacing = db.execute(text("SELECT batch_size, sleep_s FROM pacing_state WHERE key = 'daily'")).one()
+    assert tuple(pacing) == (10, 2.0)
+
+
+def test_rate_share_stretches_sleep_but_persists_single_rate():
+    pacer = PacingController(20, 1.0, rate_share=3)
+    assert pacer.sleep_s == 3.0 and pacer.min_sleep == 0.75
+
+    pacer.on_throttle()
+    assert pacer.persisted() == (10, 2.0)
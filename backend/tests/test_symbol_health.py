@@ -0,0 +1,38 @@
+# backend/tests/test_symbol_health.py
+
+from sqlalchemy import select
+
+from app.models import BackfillProgress, SymbolFailure
+from app.services.backfill_progress import UNMAPPABLE_MSG, record_batch
+from app.services.price_loader import backfill_symbols, refresh_recent
+from app.services.symbol_health import due_symbols, make_failure_hook
+
+
+def _failures(db) -> dict[str, str]:
+    return dict(db.execute(select(SymbolFailure.symbol, SymbolFailure.last_error)).all())
+
+
+def test_all_unmappable_batch_is_recorded(db, yf_stub):
+    hook = make_failure_hook()
+    refresh_recent(db, ["FOO.W", "BAR.U"], batch_size=5, sleep_s=0.0, on_batch=hook)
+
+    assert not yf_stub  # nothing to ask Yahoo for
+    assert _failures(db) == {"FOO.W": UNMAPPABLE_MSG, "BAR.U": UNMAPPABLE_MSG}
+    assert hook.stats["empty"] == 2
+    assert due_symbols(db, ["FOO.W", "BAR.U", "AAA"]) == ["AAA"]  # backing off, not retried next run
+
+
+def test_mixed_batch_records_unmappable_and_clears_ok(db, yf_stub):
+    hook = make_failure_hook()
+    refresh_recent(db, ["AAA", "FOO.W"], batch_size=5, sleep_s=0.0, on_batch=hook)
+
+    assert yf_stub == [["AAA"]]
+    assert _failures(db) == {"FOO.W": UNMAPPABLE_MSG}
+    assert hook.stats["ok"] == 1
+
+
+def test_backfill_progress_records_unmappable(db, yf_stub):
+    backfill_symbols(db, ["FOO.W"], years=1, sleep_s=0.0, on_batch=record_batch)
+
+    row = db.execute(select(BackfillProgress.state, BackfillProgress.last_error)).one()
+    assert tuple(row) == ("failed", UNMAPPABLE_MSG)
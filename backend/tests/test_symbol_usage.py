@@ -0,0 +1,13 @@
+# backend/tests/test_symbol_usage.py
+
+from app import symbol_usage
+
+
+def test_record_view_caps_pending_symbols(monkeypatch):
+    monkeypatch.setattr(symbol_usage, "_pending", symbol_usage.Counter())
+    monkeypatch.setattr(symbol_usage, "USAGE_MAX_PENDING", 2)
+
+    for sym in ("AAA", "BBB", "JUNK1", "JUNK2", "aaa"):
+        symbol_usage.record_view("US", sym)
+
+    assert symbol_usage._pending == {("US", "AAA"): 2, ("US", "BBB"): 1}
@@ -0,0 +1,37 @@
+# backend/tests/test_time_budget.py
+
+import time
+from datetime import datetime
+
+from app.services import price_loader
+from app.services.price_loader import refresh_recent
+from app.services.time_budget import RunBudget, resume_symbols, save_checkpoint
+
+
+def _throttled(*args, **kwargs):
+    raise Exception("429 Too Many Requests")
+
+
+def test_deadline_in_backoff_is_resumed_next_run(db, yf_stub, monkeypatch):
+    monkeypatch.setattr(price_loader.yf, "download", _throttled)
+    started = datetime.utcnow()
+    budget = RunBudget(time.time() + 10, reserve_s=0)  # first back-off (>= 20s) can't fit
+
+    # one batch = the run's last batch: can_start() never gets to notice the deadline
+    n = refresh_recent(db, ["AAA", "BBB"], batch_size=5, sleep_s=0.0, adaptive=False, budget=budget)
+    assert n == 0
+    assert budget.stopped_early
+    assert sorted(budget.skipped) == ["AAA", "BBB"]
+
+    save_checkpoint(db, "US", "window", started, n, budget=budget)
+    assert sorted(resume_symbols(db, "US")) == ["AAA", "BBB"]
+
+
+def test_finished_run_leaves_nothing_to_resume(db, yf_stub):
+    started = datetime.utcnow()
+    budget = RunBudget(time.time() + 600)
+    refresh_recent(db, ["AAA"], batch_size=5, sleep_s=0.0, adaptive=False, budget=budget)
+    assert not budget.stopped_early
+
+    save_checkpoint(db, "US", "window", started, 5, budget=budget)
+    assert resume_symbols(db, "US") == []